@@ -4,7 +4,7 @@ from pathlib import Path
 
 import httpx
 import yaml
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 from .prompts import ANALYSIS_PROMPT
 
@@ -25,6 +25,20 @@ def create_client() -> OpenAI:
     return OpenAI(api_key=api_key, http_client=http_client)
 
 
+def create_async_client(base_url: str = None) -> AsyncOpenAI:
+    """初始化异步 OpenAI 客户端（分块并发总结使用）
+    
+    Args:
+        base_url: OpenAI 兼容服务地址，None=从配置 openai.base_url 读取，未配置时使用官方地址
+    """
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("请设置 OPENAI_API_KEY 环境变量")
+    base_url = base_url or load_config().get("openai", {}).get("base_url")
+    http_client = httpx.AsyncClient(proxy=None)
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+
+
 def analyse_user(context: str) -> str:
     """单次调用生成完整报告"""
     config = load_config()
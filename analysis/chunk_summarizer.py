@@ -0,0 +1,283 @@
+"""分块与第一轮总结（map 阶段）"""
+import asyncio
+import logging
+from dataclasses import replace
+from typing import Callable, Iterable, Iterator
+
+from openai import AsyncOpenAI
+
+from common.profiling import span
+
+from .llm_cache import LLMCache
+from .loader import Post, build_context
+from .prompts import CHUNK_SUMMARY_PROMPT, MERGE_PROMPT
+from .tokens import OTHER_CHARS_PER_TOKEN, estimate_tokens, post_tokens, truncate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 最终汇总为每条摘要添加的段落标题（### 第 N 段）和分隔符的 token 余量
+_REDUCE_HEADER_TOKENS = 10
+
+
+def _split_post(post: Post, max_tokens: int) -> list[Post]:
+    """超长文章按 token 切成多段，每段连同标题和文档头的估算不超过 max_tokens
+    
+    按 token 而不是按字符均分：中英文混排时字符数与 token 数不成比例。
+    """
+    budget = max_tokens - post_tokens(replace(post, content=""))
+    parts, remaining = [], post.content
+    while remaining:
+        # 每个字符至少 1/OTHER_CHARS_PER_TOKEN token，只需在这么长的前缀内查找截断位置；
+        # 标题本身就超出预算时每段至少取一个字符，保证能切完
+        window = remaining[:int(max(budget, 1) * OTHER_CHARS_PER_TOKEN) + 1]
+        piece = truncate_tokens(window, budget) or remaining[:1]
+        parts.append(replace(post, content=piece))
+        remaining = remaining[len(piece):]
+    return parts
+
+
+def iter_chunks(posts: Iterable[Post], max_tokens: int) -> Iterator[list[Post]]:
+    """按原有顺序（时间顺序）将文章装入分块并逐块产出，每块估算 token 不超过 max_tokens"""
+    current, current_tokens = [], 0
+    for post in posts:
+        tokens = post_tokens(post)
+        parts = _split_post(post, max_tokens) if tokens > max_tokens else [post]
+        for part in parts:
+            tokens = post_tokens(part)
+            if current and current_tokens + tokens > max_tokens:
+                yield current
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += tokens
+    if current:
+        yield current
+
+
+def chunk_posts(posts: Iterable[Post], max_tokens: int) -> list[list[Post]]:
+    """iter_chunks 的列表形式"""
+    return list(iter_chunks(posts, max_tokens))
+
+
+# 分期键：created_at 前缀长度
+_PERIOD_PREFIX = {"month": 7, "year": 4}
+
+
+def iter_chunks_by_period(posts: Iterable[Post], max_tokens: int, period: str = "month") -> Iterator[list[Post]]:
+    """先按时期（月/年）分组再按 token 分块，逐块产出
+    
+    分块边界只取决于本时期内的文章，新增或修改的文章只影响所在时期的分块，
+    其他分块的输入不变，摘要可从缓存复用。period 为 none 时退化为 iter_chunks。
+    """
+    prefix = _PERIOD_PREFIX.get(period)
+    if prefix is None:
+        yield from iter_chunks(posts, max_tokens)
+        return
+    
+    group, group_key = [], None
+    for post in posts:
+        key = str(post.created_at or "")[:prefix]
+        if group and key != group_key:
+            yield from iter_chunks(group, max_tokens)
+            group = []
+        group.append(post)
+        group_key = key
+    if group:
+        yield from iter_chunks(group, max_tokens)
+
+
+def chunk_posts_by_period(posts: Iterable[Post], max_tokens: int, period: str = "month") -> list[list[Post]]:
+    """iter_chunks_by_period 的列表形式"""
+    return list(iter_chunks_by_period(posts, max_tokens, period))
+
+
+def chunk_period(chunk: list[Post]) -> str:
+    """分块覆盖的日期范围，如 2024-01-03 至 2024-01-28"""
+    first, last = str(chunk[0].created_at or "")[:10], str(chunk[-1].created_at or "")[:10]
+    return first if first == last else f"{first} 至 {last}"
+
+
+def group_texts(texts: list[str], max_tokens: int) -> list[list[str]]:
+    """按顺序将文本分组，每组估算 token 不超过 max_tokens（单条超限时单独成组）"""
+    groups = []
+    current, current_tokens = [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _request_params(openai_cfg: dict, max_tokens: int = None) -> tuple[str, dict]:
+    model = openai_cfg.get("model", "gpt-5-nano")
+    params = {
+        "temperature": openai_cfg.get("temperature", 0.3),
+        "max_tokens": max_tokens or openai_cfg.get("max_tokens", 8192),
+    }
+    return model, params
+
+
+async def complete(
+    client: AsyncOpenAI,
+    template: str,
+    fields: dict,
+    openai_cfg: dict,
+    max_tokens: int = None,
+    cache: LLMCache = None,
+) -> str:
+    """按模板单次对话补全，提供 cache 时相同模板、参数和输入直接返回缓存结果"""
+    model, params = _request_params(openai_cfg, max_tokens)
+    key = None
+    if cache is not None:
+        key = LLMCache.make_key(template, fields, model, params)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    with span("analysis.llm") as s:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": template.format(**fields)}],
+            **params,
+        )
+        content = response.choices[0].message.content or ""
+        s.add_bytes(len(content.encode("utf-8")))
+    if cache is not None and content:
+        cache.set(key, model, content)
+    return content
+
+
+async def complete_stream(
+    client: AsyncOpenAI,
+    template: str,
+    fields: dict,
+    openai_cfg: dict,
+    on_delta: Callable[[str], None],
+    max_tokens: int = None,
+    cache: LLMCache = None,
+) -> str:
+    """流式补全，每收到一段输出调用 on_delta，返回完整内容；缓存命中时一次性回调全文"""
+    model, params = _request_params(openai_cfg, max_tokens)
+    key = None
+    if cache is not None:
+        key = LLMCache.make_key(template, fields, model, params)
+        cached = cache.get(key)
+        if cached is not None:
+            on_delta(cached)
+            return cached
+    
+    parts = []
+    with span("analysis.llm_stream") as s:
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": template.format(**fields)}],
+            stream=True,
+            **params,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_delta(delta)
+        content = "".join(parts)
+        s.add_bytes(len(content.encode("utf-8")))
+    
+    if cache is not None and content:
+        cache.set(key, model, content)
+    return content
+
+
+async def _gather_limited(coros: list, concurrency: int, on_done: Callable[[int, int], None] = None) -> list:
+    """并发执行，同时在途不超过 concurrency，结果保持输入顺序"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+    
+    async def run(coro):
+        nonlocal done
+        async with semaphore:
+            result = await coro
+        done += 1
+        if on_done:
+            on_done(done, len(coros))
+        return result
+    
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+async def summarize_chunks(
+    client: AsyncOpenAI,
+    chunks: Iterable[list[Post]],
+    openai_cfg: dict,
+    concurrency: int = 4,
+    max_tokens: int = 1500,
+    on_done: Callable[[int, int | None], None] = None,
+    cache: LLMCache = None,
+) -> list[str]:
+    """并发总结各分块，返回与分块顺序一致的摘要列表
+    
+    在途请求达到 concurrency 时先等待空位再取下一块，chunks 为生成器时内存中只保留在途的分块。
+    on_done 的总数在 chunks 不是列表时为 None。
+    """
+    total = len(chunks) if isinstance(chunks, list) else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+    
+    async def run(chunk: list[Post]) -> str:
+        nonlocal done
+        try:
+            fields = {"period": chunk_period(chunk), "context": build_context(chunk)}
+            result = await complete(client, CHUNK_SUMMARY_PROMPT, fields, openai_cfg, max_tokens, cache)
+        finally:
+            semaphore.release()
+        done += 1
+        if on_done:
+            on_done(done, total)
+        return result
+    
+    tasks = []
+    try:
+        for chunk in chunks:
+            await semaphore.acquire()
+            tasks.append(asyncio.create_task(run(chunk)))
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def merge_summaries(
+    client: AsyncOpenAI,
+    summaries: list[str],
+    openai_cfg: dict,
+    max_input_tokens: int,
+    concurrency: int = 4,
+    max_tokens: int = 1500,
+    cache: LLMCache = None,
+) -> list[str]:
+    """摘要总量超过 max_input_tokens 时逐层合并，直到可放入一次汇总请求
+    
+    每组只剩一条、无法再合并时，把各条摘要截断到平均份额，保证最终汇总不超过 max_input_tokens。
+    """
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > max_input_tokens:
+        groups = group_texts(summaries, max_input_tokens)
+        if len(groups) == len(summaries):
+            break
+        coros = [
+            complete(client, MERGE_PROMPT, {"summaries": "\n\n---\n\n".join(group)}, openai_cfg, max_tokens, cache)
+            for group in groups
+        ]
+        summaries = await _gather_limited(coros, concurrency)
+    
+    total = estimate_tokens("\n\n".join(summaries))
+    if total > max_input_tokens:
+        share = max(1, max_input_tokens // len(summaries) - _REDUCE_HEADER_TOKENS)
+        logger.warning(f"摘要约 {total} tokens 无法再合并，截断为每条 {share} tokens 后汇总")
+        summaries = [truncate_tokens(summary, share) for summary in summaries]
+    return summaries
@@ -0,0 +1,93 @@
+"""按 token 预算和优先级挑选文章组成上下文"""
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from common.profiling import timed
+
+from .loader import Post, build_context
+from .tokens import estimate_tokens, post_tokens
+
+DEFAULT_WEIGHTS = {"recency": 1.0, "length": 1.0, "engagement": 1.0, "symbols": 1.0}
+
+
+@dataclass
+class ContextSelection:
+    context: str
+    tokens: int
+    selected: list[Post] = field(default_factory=list)
+    dropped: list[Post] = field(default_factory=list)
+
+
+def _parse_date(value) -> datetime | None:
+    try:
+        return datetime.fromisoformat(str(value)[:19])
+    except ValueError:
+        return None
+
+
+def score_posts(
+    posts: list[Post],
+    weights: dict[str, float] = None,
+    half_life_days: float = 180,
+    long_post_tokens: int = 2000,
+) -> list[float]:
+    """计算每篇文章的优先级分数
+    
+    - recency: 按距最新文章的天数指数衰减（半衰期 half_life_days）
+    - length: 长文（long_post）满分，其余按 token 数对数增长
+    - engagement: log(点赞 + 2×评论) 相对全体最大值
+    - symbols: 提及标的的稀有度之和（被越少文章提及的标的越重要），保证标的覆盖面
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    dates = [_parse_date(post.created_at) for post in posts]
+    newest = max((d for d in dates if d), default=None)
+    engagement = [math.log1p(post.like_count + 2 * post.comment_count) for post in posts]
+    max_engagement = max(engagement, default=0) or 1
+    symbol_counts = Counter(symbol for post in posts for symbol in set(post.symbols))
+    
+    scores = []
+    for post, date, engaged in zip(posts, dates, engagement):
+        age_days = (newest - date).total_seconds() / 86400 if newest and date else half_life_days * 4
+        recency = 0.5 ** (age_days / half_life_days)
+        if post.type == "long_post":
+            length = 1.0
+        else:
+            length = min(1.0, math.log1p(estimate_tokens(post.content)) / math.log1p(long_post_tokens))
+        coverage = min(1.0, sum(1 / symbol_counts[s] for s in set(post.symbols)))
+        scores.append(
+            weights["recency"] * recency
+            + weights["length"] * length
+            + weights["engagement"] * engaged / max_engagement
+            + weights["symbols"] * coverage
+        )
+    return scores
+
+
+@timed("analysis.budget")
+def build_budgeted_context(
+    posts: list[Post],
+    budget_tokens: int,
+    weights: dict[str, float] = None,
+    half_life_days: float = 180,
+) -> ContextSelection:
+    """按优先级从高到低装入预算内的文章，输出时恢复原有的时间顺序
+    
+    放不下的文章跳过并继续尝试后续较短的文章，跳过的文章记录在 dropped 中。
+    """
+    scores = score_posts(posts, weights, half_life_days)
+    order = sorted(range(len(posts)), key=lambda i: scores[i], reverse=True)
+    
+    used = 0
+    keep = set()
+    for i in order:
+        post = posts[i]
+        tokens = post_tokens(post)
+        if used + tokens <= budget_tokens:
+            keep.add(i)
+            used += tokens
+    
+    selected = [post for i, post in enumerate(posts) if i in keep]
+    dropped = [post for i, post in enumerate(posts) if i not in keep]
+    return ContextSelection(build_context(selected), used, selected, dropped)
@@ -0,0 +1,203 @@
+"""近似重复文章检测：SimHash 指纹 + 分段 LSH 索引
+
+转发、轻度改写和跨栏目重复的文章合并为簇，每簇只保留一篇代表进入上下文。
+64 位指纹按汉明距离阈值 d 切成 d + 1 段，距离不超过 d 的两篇至少有一段完全相同（抽屉原理），
+只需比较同段桶内的候选，几十万篇也不用两两比较。
+"""
+import hashlib
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from common.profiling import timed
+
+from .loader import Post
+
+FINGERPRINT_BITS = 64
+
+# 去掉空白、标点和链接后按字符 n-gram 计算指纹
+_URL_RE = re.compile(r"https?://\S+")
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+# 64 个计数器打包进一个大整数，每个占 32 位：逐字节查表展开哈希位，整数加法一次累加全部位
+_LANE = 32
+_LANE_MASK = (1 << _LANE) - 1
+_SPREAD = [
+    [sum(1 << (_LANE * (8 * j + k)) for k in range(8) if v >> k & 1) for v in range(256)]
+    for j in range(8)
+]
+
+
+def normalize_text(text: str) -> str:
+    """小写并去掉链接、空白和标点"""
+    return _NON_WORD_RE.sub("", _URL_RE.sub("", text.lower()))
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """计算 64 位 SimHash 指纹，特征为归一化文本的字符 n-gram，按出现次数加权"""
+    normalized = normalize_text(text)
+    if len(normalized) <= shingle:
+        grams = Counter([normalized]) if normalized else Counter()
+    else:
+        grams = Counter(normalized[i:i + shingle] for i in range(len(normalized) - shingle + 1))
+    
+    t0, t1, t2, t3, t4, t5, t6, t7 = _SPREAD
+    lanes = 0
+    weight = 0
+    for gram, count in grams.items():
+        d = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+        lanes += (t0[d[0]] | t1[d[1]] | t2[d[2]] | t3[d[3]] | t4[d[4]] | t5[d[5]] | t6[d[6]] | t7[d[7]]) * count
+        weight += count
+    
+    fingerprint = 0
+    for i in range(FINGERPRINT_BITS):
+        if ((lanes >> (_LANE * i)) & _LANE_MASK) * 2 > weight:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+@dataclass
+class DuplicateCluster:
+    """一组近似重复的文章：representative 为保留的代表，duplicates 为 (被合并的文章, 与代表的汉明距离)"""
+    representative: Path
+    duplicates: list[tuple[Path, int]] = field(default_factory=list)
+
+
+class SimHashIndex:
+    """指纹分段索引，逐篇 add 后由 clusters 输出重复簇"""
+    
+    def __init__(self, max_distance: int = 3, min_length: int = 20):
+        """
+        Args:
+            max_distance: 汉明距离不超过该值视为近似重复
+            min_length: 归一化后短于该长度的文章只按全文完全相同判重（短文本指纹不稳定）
+        """
+        self.max_distance = max_distance
+        self.min_length = min_length
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [
+            (i * width, (1 << (FINGERPRINT_BITS - i * width if i == bands - 1 else width)) - 1)
+            for i in range(bands)
+        ]
+        self._keys: list[Path] = []
+        self._lengths: list[int] = []
+        self._created: list[str] = []
+        self._fingerprints: list[int] = []
+        self._exact: dict[tuple, list[int]] = defaultdict(list)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def add(self, key: Path, text: str, created_at: str = ""):
+        normalized = normalize_text(text)
+        if len(normalized) < self.min_length:
+            group = ("text", hashlib.sha1(normalized.encode("utf-8")).digest())
+            fingerprint = None
+        else:
+            fingerprint = simhash(text)
+            group = ("simhash", fingerprint)
+        self._exact[group].append(len(self._keys))
+        self._keys.append(key)
+        self._lengths.append(len(normalized))
+        self._created.append(str(created_at or ""))
+        self._fingerprints.append(fingerprint)
+    
+    def add_post(self, post: Post):
+        self.add(post.path, f"{post.title or ''}\n{post.content}", post.created_at)
+    
+    def clusters(self) -> list[DuplicateCluster]:
+        """返回包含两篇及以上文章的簇，按代表的添加顺序排列"""
+        parent = list(range(len(self._keys)))
+        
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        
+        def union(a: int, b: int):
+            a, b = find(a), find(b)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+        
+        # 指纹或短文本完全相同的先合并，LSH 只处理不同的指纹
+        distinct = []
+        for (kind, value), members in self._exact.items():
+            for member in members[1:]:
+                union(members[0], member)
+            if kind == "simhash":
+                distinct.append((value, members[0]))
+        
+        if self.max_distance > 0:
+            for shift, mask in self._bands:
+                buckets = defaultdict(list)
+                for fingerprint, member in distinct:
+                    buckets[(fingerprint >> shift) & mask].append((fingerprint, member))
+                for bucket in buckets.values():
+                    for i, (fp_a, a) in enumerate(bucket):
+                        for fp_b, b in bucket[i + 1:]:
+                            if hamming_distance(fp_a, fp_b) <= self.max_distance:
+                                union(a, b)
+        
+        groups = defaultdict(list)
+        for i in range(len(self._keys)):
+            groups[find(i)].append(i)
+        
+        clusters = []
+        for root in sorted(groups):
+            members = groups[root]
+            if len(members) < 2:
+                continue
+            # 保留最完整（最长）的版本，同样长时保留最早发布的
+            rep = min(members, key=lambda i: (-self._lengths[i], self._created[i], i))
+            duplicates = [(self._keys[i], self._distance(rep, i)) for i in members if i != rep]
+            clusters.append(DuplicateCluster(self._keys[rep], duplicates))
+        return clusters
+    
+    def _distance(self, a: int, b: int) -> int:
+        fp_a, fp_b = self._fingerprints[a], self._fingerprints[b]
+        if fp_a is None or fp_b is None:
+            return 0
+        return hamming_distance(fp_a, fp_b)
+
+
+@timed("analysis.dedup")
+def find_duplicates(posts: Iterable[Post], max_distance: int = 3, min_length: int = 20) -> list[DuplicateCluster]:
+    """扫描文章返回重复簇，只保留指纹不保留正文，可直接传入 iter_user_posts"""
+    index = SimHashIndex(max_distance, min_length)
+    for post in posts:
+        index.add_post(post)
+    return index.clusters()
+
+
+def duplicate_paths(clusters: list[DuplicateCluster]) -> set[Path]:
+    """所有被合并（不进入上下文）的文章路径"""
+    return {path for cluster in clusters for path, _ in cluster.duplicates}
+
+
+def dedupe_posts(
+    posts: list[Post], max_distance: int = 3, min_length: int = 20
+) -> tuple[list[Post], list[DuplicateCluster]]:
+    """合并近似重复文章，返回 (保留的文章（原顺序）, 重复簇)"""
+    clusters = find_duplicates(posts, max_distance, min_length)
+    dropped = duplicate_paths(clusters)
+    return [post for post in posts if post.path not in dropped], clusters
+
+
+def write_cluster_report(clusters: list[DuplicateCluster], path: Path):
+    """写出重复簇报告（Markdown）"""
+    merged = sum(len(cluster.duplicates) for cluster in clusters)
+    lines = [f"# 近似重复文章\n\n共 {len(clusters)} 簇，合并 {merged} 篇\n"]
+    for i, cluster in enumerate(clusters, 1):
+        lines.append(f"## 簇 {i}\n\n- 保留: {cluster.representative.name}")
+        for dup, distance in cluster.duplicates:
+            lines.append(f"- 合并: {dup.name}（距离 {distance}）")
+        lines.append("")
+    Path(path).write_text("\n".join(lines), encoding="utf-8")
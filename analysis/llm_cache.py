@@ -0,0 +1,73 @@
+"""LLM 输出缓存：按提示词模板、模型参数与输入内容寻址"""
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """以 (模板哈希, 模型, 参数, 输入哈希) 为键的补全结果缓存（SQLite 存储）
+    
+    内容寻址、不设过期：模板、模型参数或输入任一变化都会得到新键，
+    未变化的分块摘要在重复分析时直接复用。
+    """
+    
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.hits = 0
+        self.misses = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+    
+    @classmethod
+    def from_settings(cls, settings: dict) -> "LLMCache | None":
+        """按 settings.yaml 的 analysis.cache 段创建，未启用时返回 None"""
+        cfg = settings.get("analysis", {}).get("cache", {})
+        if not cfg.get("enabled", False):
+            return None
+        return cls(cfg.get("path", "cache/llm.sqlite"))
+    
+    @staticmethod
+    def make_key(template: str, fields: dict, model: str, params: dict) -> str:
+        inputs = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        raw = json.dumps(
+            [_sha256(template), model, params, _sha256(inputs)], sort_keys=True, ensure_ascii=False
+        )
+        return _sha256(raw)
+    
+    def get(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT output FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+    
+    def set(self, key: str, model: str, output: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO completions (key, model, output, created_at) VALUES (?, ?, ?, ?)",
+            (key, model, output, time.time()),
+        )
+        self._conn.commit()
+    
+    def clear(self):
+        self._conn.execute("DELETE FROM completions")
+        self._conn.commit()
+    
+    def close(self):
+        self._conn.close()
@@ -1,8 +1,27 @@
 """文章加载与上下文拼接"""
+import json
+import os
+import pickle
+import re
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
 import frontmatter
 
+from common.profiling import span, timed
+from storage.post_index import INDEX_FILENAME, PostIndex, read_post_file
+from storage.segment_store import SegmentStore
+
+from .tokens import estimate_tokens
+
+# 解析结果快照：data/{nickname}/posts.cache.pkl，格式变化时递增版本号使旧快照失效
+PARSE_CACHE_FILENAME = "posts.cache.pkl"
+PARSE_CACHE_VERSION = 1
+
+# crawler.tasks._render_markdown 输出的 frontmatter 行：key: 值
+_FM_LINE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*): (.+)")
+_FM_INT = re.compile(r"-?(?:0|[1-9][0-9]*)")
+
 
 @dataclass
 class Post:
@@ -12,36 +31,290 @@ class Post:
     created_at: str
     url: str
     content: str
+    type: str = ""
+    like_count: int = 0
+    comment_count: int = 0
+    symbols: list[str] = field(default_factory=list)
 
 
-def load_user_posts(nickname: str, data_dir: Path = Path("data")) -> list[Post]:
-    """加载用户所有文章"""
-    posts_dir = data_dir / nickname / "posts"
-    if not posts_dir.exists():
-        raise FileNotFoundError(f"用户目录不存在: {posts_dir}")
+@timed("analysis.load")
+def load_user_posts(
+    nickname: str,
+    data_dir: Path = Path("data"),
+    since: str = None,
+    until: str = None,
+    types: list[str] = None,
+    use_cache: bool = True,
+) -> list[Post]:
+    """加载用户文章
     
+    用户目录下存在 index.sqlite 时按索引筛选，只解析命中的文件；否则遍历目录。
+    解析结果按 (路径, mtime, 大小) 缓存到 posts.cache.pkl，未变化的文件不再重复解析 YAML。
+    保存在分段存储（segments/）中的文章直接从分段解码，与 .md 文件可以混合存在。
+    
+    Args:
+        since: 起始时间（含），如 "2024-01-01"
+        until: 截止时间（不含）
+        types: 文章类型，如 ["long_post"]
+        use_cache: 是否使用解析缓存
+    """
+    posts_dir, md_files, filtered = _list_post_files(nickname, data_dir, since, until, types)
+    
+    cache_path = posts_dir.parent / PARSE_CACHE_FILENAME
+    cache = _read_parse_cache(cache_path) if use_cache else {}
+    changed = False
+    
+    store = SegmentStore(posts_dir.parent) if SegmentStore.exists(posts_dir.parent) else None
     posts = []
-    for md_file in sorted(posts_dir.glob("*.md")):
-        post = frontmatter.load(md_file)
-        posts.append(Post(
-            path=md_file,
-            id=post.metadata.get("id", 0),
-            title=post.metadata.get("title"),
-            created_at=post.metadata.get("created_at", ""),
-            url=post.metadata.get("url", ""),
-            content=post.content.strip(),
-        ))
+    try:
+        for md_file in md_files:
+            record = store.get_by_filename(md_file.name) if store else None
+            if record is not None:
+                metadata, content = _split_record(record)
+            else:
+                stat = md_file.stat()
+                entry = cache.get(md_file.name)
+                if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                    metadata, content = parse_post_file(md_file)
+                    entry = (stat.st_mtime_ns, stat.st_size, metadata, content)
+                    cache[md_file.name] = entry
+                    changed = True
+                metadata, content = entry[2], entry[3]
+            
+            if filtered and not _match_filters(metadata, since, until, types):
+                continue
+            posts.append(_make_post(md_file, metadata, content))
+    finally:
+        if store:
+            store.close()
+    
+    if use_cache:
+        # 全量遍历时顺便清理已删除文件的条目
+        if not (since or until or types):
+            names = {f.name for f in md_files}
+            stale = [name for name in cache if name not in names]
+            for name in stale:
+                del cache[name]
+            changed = changed or bool(stale)
+        if changed:
+            _write_parse_cache(cache_path, cache)
     return posts
 
 
-def build_context(posts: list[Post]) -> str:
-    """拼接所有文章为单个上下文"""
-    parts = []
-    for post in posts:
+def iter_user_posts(
+    nickname: str,
+    data_dir: Path = Path("data"),
+    since: str = None,
+    until: str = None,
+    types: list[str] = None,
+) -> Iterator[Post]:
+    """逐篇读取用户文章，内存中只保留当前一篇
+    
+    筛选规则与 load_user_posts 相同。不读取解析快照（快照会把全部正文载入内存），
+    依赖 parse_post_file 的快速解析。用户目录不存在时立即抛出 FileNotFoundError。
+    """
+    posts_dir, md_files, filtered = _list_post_files(nickname, data_dir, since, until, types)
+    
+    def generate():
+        store = SegmentStore(posts_dir.parent) if SegmentStore.exists(posts_dir.parent) else None
+        try:
+            for md_file in md_files:
+                record = store.get_by_filename(md_file.name) if store else None
+                metadata, content = _split_record(record) if record is not None else parse_post_file(md_file)
+                if filtered and not _match_filters(metadata, since, until, types):
+                    continue
+                yield _make_post(md_file, metadata, content)
+        finally:
+            if store:
+                store.close()
+    
+    return generate()
+
+
+def _list_post_files(
+    nickname: str, data_dir: Path, since: str, until: str, types: list[str]
+) -> tuple[Path, list[Path], bool]:
+    """列出待读取的文件，返回 (posts 目录, 文件列表, 是否仍需按 frontmatter 筛选)"""
+    posts_dir = data_dir / nickname / "posts"
+    has_segments = SegmentStore.exists(posts_dir.parent)
+    if not posts_dir.exists() and not has_segments:
+        raise FileNotFoundError(f"用户目录不存在: {posts_dir}")
+    
+    if (posts_dir.parent / INDEX_FILENAME).exists():
+        stored = set()
+        if has_segments:
+            with SegmentStore(posts_dir.parent) as store:
+                stored = set(store.filenames())
+        md_files = []
+        with PostIndex(posts_dir.parent) as index:
+            # 不经抓取写入的文件（手动添加、从备份恢复、建索引失败的那次抓取）先补进索引
+            indexed = set(index.filenames())
+            for md_file in sorted(posts_dir.glob("*.md")):
+                if md_file.name not in indexed:
+                    post = read_post_file(md_file)
+                    if post.get("id"):
+                        index.upsert(post, md_file.name, commit=False)
+            index.commit()
+            for row in index.query(since, until, types):
+                md_file = posts_dir / row["filename"]
+                if row["filename"] in stored or md_file.exists():
+                    md_files.append(md_file)
+                else:
+                    # 文件已被手动删除：从索引中移除，不影响其余文章的加载
+                    index.remove(row["id"])
+        return posts_dir, md_files, False
+    
+    names = {f.name for f in posts_dir.glob("*.md")}
+    if has_segments:
+        with SegmentStore(posts_dir.parent) as store:
+            names.update(store.filenames())
+    return posts_dir, [posts_dir / name for name in sorted(names)], bool(since or until or types)
+
+
+def _split_record(post: dict) -> tuple[dict, str]:
+    """分段存储中的 post 字典转为与解析 .md 文件相同的 (metadata, 正文)"""
+    metadata = {key: value for key, value in post.items() if key != "content_text"}
+    metadata["title"] = post.get("title") or None
+    content = post.get("content_text") or ""
+    if metadata["title"]:
+        content = f"# {metadata['title']}\n\n{content}"
+    return metadata, content.strip()
+
+
+def _make_post(md_file: Path, metadata: dict, content: str) -> Post:
+    return Post(
+        path=md_file,
+        id=metadata.get("id", 0),
+        title=metadata.get("title"),
+        created_at=metadata.get("created_at", ""),
+        url=metadata.get("url", ""),
+        content=content,
+        type=metadata.get("type") or "",
+        like_count=metadata.get("like_count") or 0,
+        comment_count=metadata.get("comment_count") or 0,
+        symbols=metadata.get("symbols") or [],
+    )
+
+
+def parse_post_file(path: Path) -> tuple[dict, str]:
+    """解析文章文件，返回 (metadata, 正文)
+    
+    本项目写出的固定格式走快速解析，其余情况回退到 python-frontmatter。
+    """
+    with span("analysis.parse") as s:
+        text = path.read_text(encoding="utf-8")
+        if s:
+            s.add_bytes(len(text.encode("utf-8")))
+        parsed = _parse_frontmatter_fast(text)
+        if parsed is not None:
+            return parsed
+        doc = frontmatter.loads(text)
+        return doc.metadata, doc.content.strip()
+
+
+def _parse_frontmatter_fast(text: str) -> tuple[dict, str] | None:
+    """按 _render_markdown 的扁平格式逐行解析，遇到格式之外的内容返回 None
+    
+    支持的值：~、双引号字符串（仅含 \\" 转义）、JSON 列表、十进制整数。
+    """
+    if not text.startswith("---\n"):
+        return None
+    end = text.find("\n---\n", 3)
+    if end < 0:
+        return None
+    
+    metadata = {}
+    for line in text[4:end].split("\n"):
+        match = _FM_LINE.fullmatch(line)
+        if not match:
+            return None
+        key, raw = match.groups()
+        if raw == "~":
+            value = None
+        elif raw[0] == '"':
+            if len(raw) < 2 or raw[-1] != '"':
+                return None
+            inner = raw[1:-1]
+            rest = inner.replace('\\"', "")
+            # 其他转义或裸引号按 YAML 规则解释，交给通用解析
+            if "\\" in rest or '"' in rest:
+                return None
+            value = inner.replace('\\"', '"')
+        elif raw[0] == "[":
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                return None
+            if not isinstance(value, list):
+                return None
+        elif _FM_INT.fullmatch(raw):
+            value = int(raw)
+        else:
+            return None
+        metadata[key] = value
+    
+    return metadata, text[end + 5:].strip()
+
+
+def _read_parse_cache(path: Path) -> dict:
+    """读取解析快照，{文件名: (mtime_ns, size, metadata, content)}，损坏或版本不符返回空"""
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != PARSE_CACHE_VERSION:
+        return {}
+    return data["entries"]
+
+
+def _write_parse_cache(path: Path, entries: dict):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": PARSE_CACHE_VERSION, "entries": entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _match_filters(metadata: dict, since: str, until: str, types: list[str]) -> bool:
+    created_at = str(metadata.get("created_at") or "")
+    if since and created_at < since:
+        return False
+    if until and created_at >= until:
+        return False
+    if types and metadata.get("type") not in types:
+        return False
+    return True
+
+
+_CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+def iter_context(posts: Iterable[Post]) -> Iterator[str]:
+    """逐篇生成上下文片段，依次拼接即为 build_context 的结果"""
+    for i, post in enumerate(posts):
         header = f"[文档: {post.path.name}]"
         if post.title:
             header += f"\n标题: {post.title}"
         header += f"\n日期: {post.created_at}"
         header += f"\n链接: {post.url}"
-        parts.append(f"{header}\n\n{post.content}")
-    return "\n\n---\n\n".join(parts)
+        separator = _CONTEXT_SEPARATOR if i else ""
+        yield f"{separator}{header}\n\n{post.content}"
+
+
+def build_context(posts: Iterable[Post]) -> str:
+    """拼接所有文章为单个上下文"""
+    return "".join(iter_context(posts))
+
+
+def write_context(posts: Iterable[Post], path: Path) -> tuple[int, int]:
+    """将上下文逐篇写入文件，返回 (文章数, 估算 token 数)"""
+    count = tokens = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for part in iter_context(posts):
+            with span("analysis.context_write") as s:
+                if s:
+                    s.add_bytes(len(part.encode("utf-8")))
+                f.write(part)
+                tokens += estimate_tokens(part)
+            count += 1
+    return count, tokens
@@ -0,0 +1,137 @@
+"""分析流水线：上下文可一次放下时单次调用，否则分块并发总结后汇总（map-reduce）"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Iterable
+
+from openai import AsyncOpenAI
+
+from common.profiling import timed
+
+from .analyser import create_async_client, load_config
+from .chunk_summarizer import (
+    complete,
+    complete_stream,
+    iter_chunks_by_period,
+    merge_summaries,
+    summarize_chunks,
+)
+from .llm_cache import LLMCache
+from .loader import Post, build_context, iter_context
+from .prompts import ANALYSIS_PROMPT, REDUCE_PROMPT
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def _analysis_settings(settings: dict) -> dict:
+    cfg = settings.get("analysis", {})
+    return {
+        "single_call_tokens": cfg.get("single_call_tokens", 100000),
+        "chunk_tokens": cfg.get("chunk_tokens", 8000),
+        "chunk_period": cfg.get("chunk_period", "month"),
+        "summary_max_tokens": cfg.get("summary_max_tokens", 1500),
+        "concurrency": cfg.get("concurrency", 4),
+    }
+
+
+def _post_source(posts: list[Post] | Callable[[], Iterable[Post]]) -> Callable[[], Iterable[Post]]:
+    """统一为可重复调用的文章来源，每次调用返回一个新的迭代器"""
+    if callable(posts):
+        return posts
+    return lambda: posts
+
+
+@timed("analysis.pipeline")
+async def analyse_posts_async(
+    posts: list[Post] | Callable[[], Iterable[Post]],
+    client: AsyncOpenAI = None,
+    settings: dict = None,
+    concurrency: int = None,
+    on_progress: Callable[[str, int, int], None] = None,
+    cache: LLMCache = None,
+    use_cache: bool = True,
+    on_delta: Callable[[str], None] = None,
+    context_file: str | Path = None,
+    context_tokens: int = None,
+) -> str:
+    """生成投资画像报告
+    
+    Args:
+        posts: 文章列表，或每次调用返回新迭代器的函数（如 lambda: iter_user_posts(...)）；
+            后者按需从磁盘读取，整个语料不会同时驻留内存
+        client: 共享的 AsyncOpenAI，None=自动创建并在结束时关闭
+        settings: 配置字典，None=读取 config/settings.yaml
+        concurrency: 同时进行的总结请求数，None=从配置 analysis.concurrency 读取
+        on_progress: 进度回调 (阶段, 已完成, 总数)，阶段为 single / map / reduce
+        cache: LLM 输出缓存，None=按配置 analysis.cache 创建
+        use_cache: 是否使用 LLM 输出缓存
+        on_delta: 提供时最终报告以流式生成，每收到一段输出即回调
+        context_file: 已由 write_context 写好的上下文文件，单次调用时直接读取而不再拼接
+        context_tokens: 上下文的估算 token 数，None=遍历一遍文章计算
+    """
+    settings = settings or load_config()
+    openai_cfg = settings.get("openai", {})
+    cfg = _analysis_settings(settings)
+    concurrency = concurrency or cfg["concurrency"]
+    
+    own_client = client is None
+    if own_client:
+        client = create_async_client(openai_cfg.get("base_url"))
+    own_cache = cache is None and use_cache
+    if own_cache:
+        cache = LLMCache.from_settings(settings)
+    elif not use_cache:
+        cache = None
+    
+    async def final_call(template: str, fields: dict) -> str:
+        if on_delta:
+            return await complete_stream(client, template, fields, openai_cfg, on_delta, cache=cache)
+        return await complete(client, template, fields, openai_cfg, cache=cache)
+    
+    source = _post_source(posts)
+    try:
+        if context_tokens is None:
+            context_tokens = sum(estimate_tokens(piece) for piece in iter_context(source()))
+        if context_tokens <= cfg["single_call_tokens"]:
+            if context_file:
+                context = Path(context_file).read_text(encoding="utf-8")
+            else:
+                context = build_context(source())
+            report = await final_call(ANALYSIS_PROMPT, {"context": context})
+            if on_progress:
+                on_progress("single", 1, 1)
+            return report
+        
+        def on_chunk_done(done: int, total: int | None):
+            if on_progress:
+                on_progress("map", done, total)
+        
+        # 分块边遍历边生成，在途请求满时暂停读取
+        chunks = iter_chunks_by_period(source(), cfg["chunk_tokens"], cfg["chunk_period"])
+        if not callable(posts):
+            # 文章已在内存中，分块列表可给出总数
+            chunks = list(chunks)
+        logger.info(f"上下文约 {context_tokens} tokens，超出单次调用上限，分块总结")
+        summaries = await summarize_chunks(
+            client, chunks, openai_cfg, concurrency, cfg["summary_max_tokens"], on_done=on_chunk_done, cache=cache,
+        )
+        summaries = await merge_summaries(
+            client, summaries, openai_cfg, cfg["single_call_tokens"], concurrency, cfg["summary_max_tokens"], cache,
+        )
+        
+        parts = [f"### 第 {i + 1} 段\n\n{summary}" for i, summary in enumerate(summaries)]
+        report = await final_call(REDUCE_PROMPT, {"summaries": "\n\n".join(parts)})
+        if on_progress:
+            on_progress("reduce", 1, 1)
+        return report
+    finally:
+        if own_client:
+            await client.close()
+        if own_cache and cache is not None:
+            cache.close()
+
+
+def analyse_posts(posts: list[Post] | Callable[[], Iterable[Post]], **kwargs) -> str:
+    """analyse_posts_async 的同步入口"""
+    return asyncio.run(analyse_posts_async(posts, **kwargs))
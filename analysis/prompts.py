@@ -1,14 +1,7 @@
 """提示词模板"""
 
-ANALYSIS_PROMPT = """你是一位资深投资分析师。请根据以下雪球用户的全部发言，生成一份投资画像报告。
-
-要求：
-1. 分析内容需基于用户实际发言，不做过度推断
-2. 报告中需引用原始文档（使用 [文档: xxx.md] 格式）
-3. 使用 Markdown 格式输出
-
-报告结构：
-## 投资者简介
+# 最终报告结构（单次分析与分块汇总共用）
+REPORT_SECTIONS = """## 投资者简介
 简要概述该用户的投资风格和特点
 
 ## 投资风格
@@ -29,9 +22,61 @@ ANALYSIS_PROMPT = """你是一位资深投资分析师。请根据以下雪球
 
 ## 引用文档
 列出报告引用的原始文档及其关键观点
+"""
+
+ANALYSIS_PROMPT = """你是一位资深投资分析师。请根据以下雪球用户的全部发言，生成一份投资画像报告。
 
+要求：
+1. 分析内容需基于用户实际发言，不做过度推断
+2. 报告中需引用原始文档（使用 [文档: xxx.md] 格式）
+3. 使用 Markdown 格式输出
+
+报告结构：
+""" + REPORT_SECTIONS + """
 ---
 
 用户发言内容：
 
 {context}"""
+
+CHUNK_SUMMARY_PROMPT = """你是一位资深投资分析师。以下是某雪球用户在 {period} 期间按时间顺序的一段发言。
+请提炼这一时段的要点，供后续汇总成完整的投资画像。
+
+要求：
+1. 只基于原文，不做过度推断
+2. 每条要点后注明来源文档（使用 [文档: xxx.md] 格式）
+3. 使用 Markdown 输出，包含以下小节：
+   - 时段观点：这一时段的主要投资观点
+   - 风格信号：价值/成长/短线/趋势等风格线索
+   - 方法信号：估值、基本面、技术面等分析方法线索
+   - 提及标的：股票及用户的核心判断
+
+---
+
+发言内容：
+
+{context}"""
+
+MERGE_PROMPT = """以下是同一雪球用户连续多个时段的发言摘要。请合并为一份更紧凑的摘要，
+保留各时段的关键观点、风格与方法信号、提及标的和 [文档: xxx.md] 引用，按时间顺序组织。
+
+---
+
+{summaries}"""
+
+REDUCE_PROMPT = """你是一位资深投资分析师。以下是某雪球用户全部发言按时间分段提炼的摘要。
+请综合所有时段，生成一份投资画像报告。
+
+要求：
+1. 分析内容需基于摘要中的用户观点，不做过度推断
+2. 保留摘要中的原始文档引用（使用 [文档: xxx.md] 格式）
+3. 注意观点随时间的变化
+4. 使用 Markdown 格式输出
+
+报告结构：
+""" + REPORT_SECTIONS + """
+---
+
+分段摘要：
+
+{summaries}"""
@@ -1,15 +1,60 @@
 """报告生成与保存"""
+import os
 from datetime import datetime
 from pathlib import Path
 
+from common.profiling import span
+
+
+def report_path(nickname: str, reports_dir: Path = Path("reports")) -> Path:
+    """报告路径 reports/{nickname}_{date}.md"""
+    date_str = datetime.now().strftime("%Y%m%d")
+    return reports_dir / f"{nickname}_{date_str}.md"
+
+
+def _report_header(nickname: str) -> str:
+    return f"# {nickname} 投资画像报告\n\n生成时间: {datetime.now().isoformat()}\n\n---\n\n"
+
 
 def save_report(nickname: str, content: str, reports_dir: Path = Path("reports")) -> Path:
     """保存报告到 reports/{nickname}_{date}.md"""
-    reports_dir.mkdir(exist_ok=True)
-    date_str = datetime.now().strftime("%Y%m%d")
-    filename = f"{nickname}_{date_str}.md"
-    report_path = reports_dir / filename
+    with ReportWriter(nickname, reports_dir) as writer:
+        writer.write(content)
+    return writer.path
+
+
+class ReportWriter:
+    """流式写入报告
+    
+    内容逐段写入同目录的 .part 临时文件并立即刷盘，正常结束时原子替换为正式报告；
+    生成中途失败时保留 .part 文件中已输出的部分（尚无输出时删除）。
+    """
+    
+    def __init__(self, nickname: str, reports_dir: Path = Path("reports")):
+        self.nickname = nickname
+        self.path = report_path(nickname, reports_dir)
+        self.tmp_path = self.path.with_name(self.path.name + ".part")
+        self._file = None
+        self.written = 0
+    
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+        self._file.write(_report_header(self.nickname))
+        return self
+    
+    def write(self, text: str):
+        self.written += len(text)
+        with span("analysis.report_write") as s:
+            if s:
+                s.add_bytes(len(text.encode("utf-8")))
+            self._file.write(text)
+            self._file.flush()
     
-    header = f"# {nickname} 投资画像报告\n\n生成时间: {datetime.now().isoformat()}\n\n---\n\n"
-    report_path.write_text(header + content, encoding="utf-8")
-    return report_path
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        elif not self.written:
+            self.tmp_path.unlink(missing_ok=True)
+        return False
@@ -0,0 +1,43 @@
+"""Token 数估算"""
+
+# 按 gpt-4o 分词器校准的保守估计：中日韩字符约 1 token/字，其余约 4 字符/token
+CJK_TOKENS_PER_CHAR = 1.0
+OTHER_CHARS_PER_TOKEN = 4.0
+
+# build_context 为每篇文章添加的文档头、分隔符的 token 余量
+POST_OVERHEAD_TOKENS = 40
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本 token 数
+    
+    用 UTF-8 字节数与字符数之差估计多字节字符数量（中文 3 字节），无需逐字判断。
+    """
+    if not text:
+        return 0
+    extra_bytes = len(text.encode("utf-8")) - len(text)
+    wide = extra_bytes // 2
+    narrow = len(text) - wide
+    return int(wide * CJK_TOKENS_PER_CHAR + narrow / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def post_tokens(post) -> int:
+    """一篇文章（analysis.loader.Post）放入 build_context 上下文后的估算 token 数
+    
+    分块（chunk_summarizer）和按预算挑选（context_builder）共用，两者的估算保持一致。
+    """
+    return estimate_tokens(post.title or "") + estimate_tokens(post.content) + POST_OVERHEAD_TOKENS
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """截断文本使估算 token 数不超过 max_tokens（按字符二分查找截断位置）"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""抓取基准：对本地替身服务（fake_xueqiu.py）运行 crawl_user_to_markdown 及其异步版本
+
+报告每个场景的篇/秒、请求/秒、限速等待和重试时间，不访问 xueqiu.com。
+
+用法: python benchmarks/bench_crawl.py [--pages 20] [--scenario 基线] [--latency 0.05 --error-rate 0.05 ...]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import yaml
+
+from benchmarks.fake_xueqiu import NICKNAME, FakeConfig, FakeXueqiuServer
+from crawler.async_client import AsyncXueqiuClient
+from crawler.client import XueqiuClient
+from crawler.tasks import crawl_user_to_markdown, crawl_user_to_markdown_async
+
+
+@dataclass
+class Scenario:
+    """一个基准场景：替身服务行为 + 抓取端配置
+    
+    Attributes:
+        concurrency: None=同步抓取，否则为异步引擎的预取页数
+        adaptive: rate_limit.adaptive 配置，None=固定随机间隔
+    """
+    name: str
+    server: FakeConfig
+    concurrency: int | None = None
+    min_interval: float = 0.0
+    max_interval: float = 0.0
+    max_attempts: int = 3
+    base_delay: float = 0.05
+    backend: str = "markdown"
+    adaptive: dict | None = None
+
+
+def default_scenarios(pages: int) -> list[Scenario]:
+    base = FakeConfig(pages=pages)
+    slow = replace(base, latency=0.02)
+    return [
+        Scenario("基线", base),
+        Scenario("基线 (分段存储)", base, backend="segments"),
+        Scenario("延迟 20ms", slow),
+        Scenario("延迟 20ms 异步 x4", slow, concurrency=4),
+        Scenario("10% 5xx", replace(base, error_rate=0.1)),
+        Scenario("限速 10-20ms", base, min_interval=0.01, max_interval=0.02),
+        Scenario("限速 10-20ms 异步 x4", slow, concurrency=4, min_interval=0.01, max_interval=0.02),
+        Scenario("自适应 10-20ms 5% 5xx", replace(base, error_rate=0.05), min_interval=0.01, max_interval=0.02,
+                 adaptive={"enabled": True, "floor": 0.002, "ceiling": 1.0, "increase": 5, "decrease": 0.5}),
+    ]
+
+
+def write_config_dir(root: Path, server_url: str, scenario: Scenario) -> Path:
+    """生成指向替身服务的 config 目录"""
+    config_dir = root / "config"
+    config_dir.mkdir(parents=True, exist_ok=True)
+    rate_limit = {"min_interval": scenario.min_interval, "max_interval": scenario.max_interval}
+    if scenario.adaptive:
+        # 每个场景从配置的初始间隔开始学习，不读写仓库的 cache/rate_limits.json
+        rate_limit["adaptive"] = {**scenario.adaptive, "state": str(root / "rate_limits.json")}
+    settings = {
+        "http": {"base_url": server_url, "timeout": 10, "user_agent": "bench"},
+        "rate_limit": rate_limit,
+        "retry": {"max_attempts": scenario.max_attempts, "base_delay": scenario.base_delay},
+        "crawl": {"page_size": scenario.server.page_size, "mode": "timeline", "concurrency": scenario.concurrency or 4},
+        "storage": {"backend": scenario.backend},
+    }
+    (config_dir / "settings.yaml").write_text(yaml.safe_dump(settings, allow_unicode=True), encoding="utf-8")
+    (config_dir / "cookies.json").write_text(json.dumps({"xq_a_token": "bench"}), encoding="utf-8")
+    return config_dir
+
+
+def run_scenario(scenario: Scenario, root: Path) -> dict:
+    """启动替身服务并抓取一遍，返回结果汇总"""
+    root.mkdir(parents=True, exist_ok=True)
+    with FakeXueqiuServer(scenario.server) as server:
+        config_dir = write_config_dir(root, server.url, scenario)
+        out_root = root / "data"
+        start = time.perf_counter()
+        if scenario.concurrency:
+            stats, metrics = asyncio.run(_crawl_async(config_dir, out_root, scenario.concurrency))
+        else:
+            XueqiuClient.reset_instance()
+            client = XueqiuClient(config_dir)
+            client.cache = None
+            try:
+                stats = crawl_user_to_markdown(NICKNAME, out_root, mode="timeline")
+            finally:
+                XueqiuClient.reset_instance()
+            metrics = client.metrics
+        elapsed = time.perf_counter() - start
+        served = sum(server.requests.values())
+        injected_errors = server.errors
+    
+    totals = metrics.summary()["totals"]
+    posts = stats["new_count"] + stats["update_count"] + stats["skip_count"]
+    return {
+        "scenario": scenario.name,
+        "posts": posts,
+        "errors": stats["error_count"],
+        "elapsed": elapsed,
+        "posts_per_second": posts / elapsed,
+        "requests": served,
+        "requests_per_second": served / elapsed,
+        "injected_5xx": injected_errors,
+        "retries": totals["retries"],
+        "rate_limit_wait": totals["rate_limit_wait_seconds"],
+        "retry_wait": totals["retry_wait_seconds"],
+    }
+
+
+async def _crawl_async(config_dir: Path, out_root: Path, concurrency: int):
+    async with AsyncXueqiuClient(config_dir) as client:
+        client.cache = None
+        stats = await crawl_user_to_markdown_async(
+            NICKNAME, out_root, mode="timeline", client=client, concurrency=concurrency,
+        )
+        return stats, client.metrics
+
+
+def print_results(results: list[dict]):
+    print(f"{'场景':<24} {'篇数':>6} {'耗时(s)':>8} {'篇/s':>8} {'请求':>6} {'请求/s':>8} {'注入5xx':>7} {'重试':>5} "
+          f"{'限速等待(s)':>11} {'退避(s)':>8}")
+    for r in results:
+        print(f"{r['scenario']:<24} {r['posts']:>6} {r['elapsed']:>8.2f} {r['posts_per_second']:>8.0f} "
+              f"{r['requests']:>6} {r['requests_per_second']:>8.1f} {r['injected_5xx']:>7} {r['retries']:>5} "
+              f"{r['rate_limit_wait']:>11.2f} {r['retry_wait']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取基准（本地替身服务）")
+    parser.add_argument("--pages", type=int, default=20, help="时间线页数 (default: 20，每页 20 篇)")
+    parser.add_argument("--scenario", action="append", help="只运行指定名称的默认场景，可重复")
+    parser.add_argument("--latency", type=float, help="自定义场景：每个请求的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="自定义场景：503 比例")
+    parser.add_argument("--min-interval", type=float, default=0.0, help="自定义场景：限速下限（秒）")
+    parser.add_argument("--max-interval", type=float, default=0.0, help="自定义场景：限速上限（秒）")
+    parser.add_argument("-c", "--concurrency", type=int, help="自定义场景：异步预取页数（不指定为同步）")
+    parser.add_argument("--json", help="另存结果为 JSON，便于比较不同版本")
+    args = parser.parse_args()
+    
+    custom = args.latency is not None or args.error_rate or args.min_interval or args.max_interval or args.concurrency
+    if custom:
+        server = FakeConfig(pages=args.pages, latency=args.latency or 0.0, error_rate=args.error_rate)
+        scenarios = [Scenario("自定义", server, args.concurrency, args.min_interval, args.max_interval)]
+    else:
+        scenarios = default_scenarios(args.pages)
+        if args.scenario:
+            scenarios = [s for s in scenarios if s.name in args.scenario]
+    
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, scenario in enumerate(scenarios):
+            results.append(run_scenario(scenario, Path(tmp) / str(i)))
+    print_results(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
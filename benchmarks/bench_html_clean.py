@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""HTML 清洗基准：长篇专栏 HTML 上比较旧的多轮 re.sub 与 crawler.html_clean
+
+用法: python benchmarks/bench_html_clean.py [--paragraphs 400] [--rounds 50]
+"""
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.html_clean import clean_html
+
+
+def legacy_clean_html(html):
+    """原 user_api._clean_html 实现，作为对照"""
+    if not html:
+        return ""
+    text = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r"<style[^>]*>.*?</style>", "", text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.IGNORECASE)
+    text = re.sub(r"</p>", "\n\n", text, flags=re.IGNORECASE)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">")
+    text = text.replace("&amp;", "&").replace("&quot;", '"')
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def make_column_html(paragraphs: int) -> str:
+    """仿雪球专栏正文：段落、加粗、股票链接、图片和实体"""
+    parts = []
+    for i in range(paragraphs):
+        parts.append(
+            f'<p>第 {i} 段：<b>估值</b>与&nbsp;现金流，'
+            f'<a href="https://xueqiu.com/S/SH600519" target="_blank">$贵州茅台(SH600519)$</a> '
+            f'市盈率 &lt; 30 &amp; ROE &gt; 20%。<br/>'
+            f'<img src="https://xqimg.imedao.com/{i}.png" class="ke_img">&quot;长期&quot;持有。</p>'
+        )
+    return "".join(parts)
+
+
+def timed(label: str, fn, html: str, rounds: int, repeat: int = 5):
+    """取 repeat 轮中最快的一轮，减少机器抖动的影响"""
+    elapsed = min(timeit.repeat(lambda: fn(html), number=rounds, repeat=repeat))
+    mb = len(html.encode("utf-8")) * rounds / 1024 / 1024
+    print(f"{label:<20} {elapsed * 1000 / rounds:>8.2f} ms/篇  {mb / elapsed:>8.1f} MB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML 清洗基准")
+    parser.add_argument("--paragraphs", type=int, default=400, help="每篇段落数 (default: 400)")
+    parser.add_argument("--rounds", type=int, default=50, help="每轮重复次数 (default: 50)")
+    args = parser.parse_args()
+    
+    html = make_column_html(args.paragraphs)
+    assert clean_html(html) == legacy_clean_html(html)
+    print(f"HTML 大小: {len(html.encode('utf-8')) / 1024:.0f} KB")
+    timed("legacy (多轮 re.sub)", legacy_clean_html, html, args.rounds)
+    timed("clean_html", clean_html, html, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""文章加载基准：在合成语料上比较 python-frontmatter 与快速解析
+
+用法: python benchmarks/bench_loader.py [--files 50000]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import frontmatter
+
+from analysis.loader import load_user_posts, parse_post_file
+from crawler.tasks import _make_filename, _render_markdown
+
+
+def make_corpus(root: Path, count: int) -> Path:
+    """生成 count 篇与抓取输出格式一致的文章"""
+    posts_dir = root / "bench_user" / "posts"
+    posts_dir.mkdir(parents=True)
+    rng = random.Random(0)
+    for i in range(count):
+        post = {
+            "id": 100000000 + i,
+            "user_id": 123456,
+            "nickname": "基准用户",
+            "created_at": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T10:00:00",
+            "url": f"https://xueqiu.com/123456/{100000000 + i}",
+            "type": rng.choice(["long_post", "status"]),
+            "title": f"第 {i} 篇 \"观点\"" if i % 3 else None,
+            "like_count": rng.randint(0, 500),
+            "comment_count": rng.randint(0, 100),
+            "repost_count": rng.randint(0, 50),
+            "symbols": ["SH600519", "SZ000858"][: i % 3],
+            "content_text": "这是一段用于基准测试的正文。" * rng.randint(5, 80),
+        }
+        (posts_dir / _make_filename(post)).write_text(_render_markdown(post), encoding="utf-8")
+    return posts_dir
+
+
+def timed(label: str, fn, count: int):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:>8.2f}s  {count / elapsed:>10.0f} 篇/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文章加载基准")
+    parser.add_argument("--files", type=int, default=50000, help="合成文章数 (default: 50000)")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        print(f"生成 {args.files} 篇文章...")
+        posts_dir = make_corpus(root, args.files)
+        files = sorted(posts_dir.glob("*.md"))
+        
+        timed("读取文件 (I/O 基线)", lambda: [f.read_text(encoding="utf-8") for f in files], len(files))
+        timed("python-frontmatter", lambda: [frontmatter.load(f) for f in files], len(files))
+        timed("parse_post_file", lambda: [parse_post_file(f) for f in files], len(files))
+        timed("load_user_posts (无缓存)", lambda: load_user_posts("bench_user", root, use_cache=False), len(files))
+        load_user_posts("bench_user", root)
+        timed("load_user_posts (缓存命中)", lambda: load_user_posts("bench_user", root), len(files))
+
+
+if __name__ == "__main__":
+    main()
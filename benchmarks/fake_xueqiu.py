@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""本地雪球替身服务：合成 user_timeline.json、/v4/user/profile/ 和用户搜索响应
+
+抓取基准和测试用它代替 xueqiu.com，可配置页数、每页条数、响应延迟、5xx 比例和登录跳转。
+抓取端把 settings.yaml 的 http.base_url 指向 server.url 即可。
+
+用法: python benchmarks/fake_xueqiu.py [--pages 50] [--latency 0.05] [--error-rate 0.05] [--port 8765]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+USER_ID = 1000001
+NICKNAME = "基准用户"
+
+_PARAGRAPH = "公司的护城河来自品牌和渠道，估值需要结合长期自由现金流来看。"
+
+
+@dataclass
+class FakeConfig:
+    """替身服务行为
+    
+    Attributes:
+        pages: 时间线总页数
+        page_size: 每页条数，应与抓取端 crawl.page_size 一致
+        latency: 每个请求的固定延迟（秒）
+        jitter: 在 latency 之上叠加的均匀随机延迟上限（秒）
+        error_rate: 接口请求返回 503 的比例
+        login_after: 第 N 个接口请求之后全部 302 跳转到登录页（模拟 cookies 失效），None=不跳转
+        long_ratio: 长文（带标题，column 模式会保留）的比例
+        paragraphs: 每篇正文的段落数
+        seed: 随机种子，相同配置下错误和延迟序列可复现
+    """
+    pages: int = 10
+    page_size: int = 20
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    login_after: int | None = None
+    long_ratio: float = 0.5
+    paragraphs: int = 8
+    seed: int = 0
+
+
+def make_status(index: int, config: FakeConfig) -> dict:
+    """第 index 篇（0 为最新）的 timeline status"""
+    rng = random.Random(config.seed * 1_000_003 + index)
+    is_long = rng.random() < config.long_ratio
+    body = "".join(f"<p>{_PARAGRAPH}第 {i + 1} 段，编号 {index}。$贵州茅台(SH600519)$</p>" for i in range(config.paragraphs))
+    return {
+        "id": 900_000_000 - index,
+        "user": {"id": USER_ID, "screen_name": NICKNAME},
+        "title": f"基准文章 {index}" if is_long else "",
+        "text": body,
+        "mark": 1 if is_long else 0,
+        # 每篇间隔一小时，最新一篇为 2024-06-01
+        "created_at": 1717171200000 - index * 3_600_000,
+        "like_count": rng.randint(0, 500),
+        "reply_count": rng.randint(0, 50),
+        "retweet_count": rng.randint(0, 20),
+        "view_count": rng.randint(0, 10000),
+    }
+
+
+class FakeXueqiuServer:
+    """在后台线程运行的替身服务，可作为上下文管理器使用"""
+    
+    def __init__(self, config: FakeConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.requests = Counter()
+        self.errors = 0
+        self.redirects = 0
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._api_requests = 0
+        self._pages = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "FakeXueqiuServer":
+        # 轮询间隔短一些，stop 不必等满默认的 0.5 秒
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *args):
+        self.stop()
+    
+    @property
+    def total_posts(self) -> int:
+        return self.config.pages * self.config.page_size
+    
+    def _page_body(self, page: int, count: int) -> bytes:
+        key = (page, count)
+        body = self._pages.get(key)
+        if body is None:
+            start = (page - 1) * count
+            end = min(start + count, self.total_posts) if page <= self.config.pages else start
+            statuses = [make_status(i, self.config) for i in range(start, end)]
+            body = json.dumps({"statuses": statuses, "maxPage": self.config.pages, "page": page},
+                              ensure_ascii=False).encode("utf-8")
+            self._pages[key] = body
+        return body
+    
+    def _decide(self, path: str) -> tuple[str, float]:
+        """记录请求并决定响应方式：ok / error / login，返回 (方式, 延迟)"""
+        with self._lock:
+            self.requests[path] += 1
+            delay = self.config.latency + (self._rng.uniform(0, self.config.jitter) if self.config.jitter else 0.0)
+            if path.startswith("/login"):
+                return "ok", 0.0
+            self._api_requests += 1
+            if self.config.login_after is not None and self._api_requests > self.config.login_after:
+                self.redirects += 1
+                return "login", delay
+            if self.config.error_rate and self._rng.random() < self.config.error_rate:
+                self.errors += 1
+                return "error", delay
+            return "ok", delay
+    
+    def _respond(self, path: str, query: dict) -> tuple[int, bytes, str]:
+        if path == "/statuses/user_timeline.json":
+            page = int(query.get("page", ["1"])[0])
+            count = int(query.get("count", [str(self.config.page_size)])[0])
+            return 200, self._page_body(page, count), "application/json"
+        if path.startswith("/v4/user/profile/"):
+            if path.rsplit("/", 1)[-1] != str(USER_ID):
+                return 200, json.dumps({"error_description": "用户不存在"}).encode(), "application/json"
+            return 200, json.dumps({"user": self._user()}, ensure_ascii=False).encode("utf-8"), "application/json"
+        if path == "/query/v1/search/user.json":
+            users = [self._user()] if query.get("q", [""])[0] == NICKNAME else []
+            return 200, json.dumps({"list": users}, ensure_ascii=False).encode("utf-8"), "application/json"
+        if path.startswith("/login"):
+            return 200, "<html>登录</html>".encode("utf-8"), "text/html; charset=utf-8"
+        return 404, b"{}", "application/json"
+    
+    def _user(self) -> dict:
+        return {
+            "id": USER_ID,
+            "screen_name": NICKNAME,
+            "description": "本地替身服务生成的用户",
+            "followers_count": 1234,
+            "status_count": self.total_posts,
+        }
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                action, delay = server._decide(parts.path)
+                if delay:
+                    time.sleep(delay)
+                if action == "login":
+                    self.send_response(302)
+                    self.send_header("Location", f"/login?next={parts.path}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if action == "error":
+                    status, body, content_type = 503, b"", "text/plain"
+                else:
+                    status, body, content_type = server._respond(parts.path, parse_qs(parts.query))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地雪球替身服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="额外的随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument("--login-after", type=int, help="第 N 个请求后跳转登录页")
+    args = parser.parse_args()
+    
+    config = FakeConfig(args.pages, args.page_size, args.latency, args.jitter, args.error_rate, args.login_after)
+    server = FakeXueqiuServer(config, port=args.port)
+    print(f"替身服务: {server.url}（用户 {NICKNAME} / {USER_ID}，{server.total_posts} 篇），Ctrl+C 退出")
+    print(f"在 settings.yaml 中设置 http.base_url: {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
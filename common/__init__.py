@@ -0,0 +1 @@
+"""crawler 与 analysis 共用的工具模块"""
@@ -0,0 +1,271 @@
+"""分阶段性能剖析：轻量 span 计时，crawl_user.py / analyse_user.py --profile 启用
+
+    with span("crawl.render") as s:
+        text = render(post)
+        if s:
+            s.add_bytes(len(text.encode("utf-8")))
+
+未启用时 span 返回共享的空对象（布尔值为假，可跳过只为统计而做的计算），开销只有一次函数调用。启用后按名称累计墙钟时间、调用次数、
+字节数和 RSS 高水位，结束时打印分阶段耗时表；可同时导出 cProfile（.prof）或 speedscope（.json）文件。
+span 可嵌套，父阶段的时间包含子阶段；并发协程中的 span 按各自的任务分轨记录。
+"""
+import asyncio
+import cProfile
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+def _max_rss() -> int | None:
+    """进程 RSS 高水位（字节）"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _track() -> str:
+    """当前 span 所在的轨道：asyncio 任务名或线程名"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return task.get_name()
+    return threading.current_thread().name
+
+
+class SpanStats:
+    """单个阶段的累计统计"""
+    
+    __slots__ = ("calls", "wall", "max", "bytes", "peak_rss", "rss_growth")
+    
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.peak_rss = 0
+        self.rss_growth = 0
+
+
+class Span:
+    """进行中的计时区间"""
+    
+    __slots__ = ("profiler", "name", "bytes", "_start", "_rss", "_track")
+    
+    def __init__(self, profiler: "Profiler", name: str, nbytes: int = 0):
+        self.profiler = profiler
+        self.name = name
+        self.bytes = nbytes
+    
+    def add_bytes(self, nbytes: int):
+        self.bytes += nbytes
+    
+    def __enter__(self):
+        self._rss = _max_rss()
+        self._start = time.perf_counter()
+        if self.profiler.events is not None:
+            self._track = _track()
+            self.profiler._event(self._track, "O", self.name, self._start)
+        return self
+    
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        if self.profiler.events is not None:
+            self.profiler._event(self._track, "C", self.name, end)
+        self.profiler._record(self.name, end - self._start, self.bytes, self._rss, _max_rss())
+        return False
+
+
+class _NoopSpan:
+    """未启用剖析时的空 span"""
+    
+    __slots__ = ()
+    
+    def __bool__(self):
+        return False
+    
+    def add_bytes(self, nbytes: int):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Profiler:
+    """span 统计的收集器，record_events=True 时额外记录开闭事件用于导出 speedscope"""
+    
+    def __init__(self, record_events: bool = False):
+        self.stats: dict[str, SpanStats] = {}
+        self.events: dict[str, list] | None = {} if record_events else None
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+    
+    def _record(self, name: str, elapsed: float, nbytes: int, rss_before: int | None, rss_after: int | None):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = SpanStats()
+            stats.calls += 1
+            stats.wall += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.bytes += nbytes
+            if rss_after is not None:
+                stats.peak_rss = max(stats.peak_rss, rss_after)
+                stats.rss_growth += rss_after - rss_before
+    
+    def _event(self, track: str, kind: str, name: str, at: float):
+        with self._lock:
+            self.events.setdefault(track, []).append((kind, name, at))
+    
+    def report(self) -> str:
+        """按总耗时降序的分阶段耗时表"""
+        total = time.perf_counter() - self.started
+        lines = [
+            f"{'阶段':<24} {'调用':>7} {'总耗时(s)':>10} {'占比':>6} {'平均(ms)':>9} {'最长(ms)':>9} "
+            f"{'字节':>10} {'RSS峰值(MB)':>11} {'RSS增长(MB)':>11}"
+        ]
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].wall):
+            lines.append(
+                f"{name:<24} {stats.calls:>7} {stats.wall:>10.3f} {stats.wall / total:>6.1%} "
+                f"{stats.wall / stats.calls * 1000:>9.2f} {stats.max * 1000:>9.2f} {_format_bytes(stats.bytes):>10} "
+                f"{stats.peak_rss / 1024 / 1024:>11.1f} {stats.rss_growth / 1024 / 1024:>11.1f}"
+            )
+        lines.append(f"总耗时 {total:.3f}s（嵌套阶段的时间同时计入父阶段）")
+        return "\n".join(lines)
+    
+    def to_speedscope(self, name: str = "xueqiu_analyse") -> dict:
+        """speedscope 文件格式（evented），每个线程或 asyncio 任务一条轨道"""
+        frames = []
+        frame_index = {}
+        profiles = []
+        for track, events in (self.events or {}).items():
+            converted = []
+            for kind, span_name, at in events:
+                if span_name not in frame_index:
+                    frame_index[span_name] = len(frames)
+                    frames.append({"name": span_name})
+                converted.append({"type": kind, "frame": frame_index[span_name], "at": at - self.started})
+            profiles.append({
+                "type": "evented",
+                "name": track,
+                "unit": "seconds",
+                "startValue": converted[0]["at"],
+                "endValue": converted[-1]["at"],
+                "events": converted,
+            })
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "xueqiu_analyse",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+
+_profiler: Profiler | None = None
+
+
+def span(name: str, nbytes: int = 0):
+    """计时区间，未启用剖析时为空操作"""
+    if _profiler is None:
+        return _NOOP
+    return Span(_profiler, name, nbytes)
+
+
+def timed(name: str):
+    """把整个函数（含协程函数）计为一个 span 的装饰器"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(record_events: bool = False) -> Profiler:
+    global _profiler
+    _profiler = Profiler(record_events)
+    return _profiler
+
+
+def disable() -> Profiler | None:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def is_enabled() -> bool:
+    return _profiler is not None
+
+
+@contextmanager
+def session(enabled: bool = True, output: str | Path = None, title: str = "xueqiu_analyse"):
+    """命令行的剖析会话：结束（含异常退出）时打印分阶段耗时表并写出剖析文件
+    
+    Args:
+        output: .json 写 speedscope 格式的 span 时间线，其他扩展名写 cProfile 统计（pstats / snakeviz 可读）
+    """
+    if not enabled and not output:
+        yield None
+        return
+    
+    output = Path(output) if output else None
+    speedscope = output is not None and output.suffix == ".json"
+    profiler = enable(record_events=speedscope)
+    cprofile = cProfile.Profile() if output is not None and not speedscope else None
+    if cprofile:
+        cprofile.enable()
+    try:
+        yield profiler
+    finally:
+        if cprofile:
+            cprofile.disable()
+        disable()
+        print("\n[profile]")
+        print(profiler.report())
+        if output is not None:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            if cprofile:
+                cprofile.dump_stats(output)
+            else:
+                output.write_text(json.dumps(profiler.to_speedscope(title), ensure_ascii=False), encoding="utf-8")
+            print(f"剖析文件: {output}")
+
+
+def _format_bytes(nbytes: int) -> str:
+    if not nbytes:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f}{unit}" if unit == "B" else f"{nbytes:.1f}{unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f}GB"
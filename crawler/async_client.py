@@ -0,0 +1,166 @@
+"""雪球异步 HTTP 客户端封装"""
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+
+from common.profiling import span
+
+from .cache import CacheMissError, ResponseCache
+from .client import CookiesExpiredError, XueqiuClient, api_base_url, default_headers, load_cookies, load_settings
+from .metrics import CrawlMetrics, endpoint_family, is_waf_response
+from .rate_limiter import AsyncRateLimiter, parse_retry_after
+
+
+class AsyncXueqiuClient:
+    """雪球异步 HTTP 客户端，封装 httpx.AsyncClient
+    
+    与 XueqiuClient 共用配置与 cookies。多个协程共享同一个实例时，
+    请求按限速器预约的时间槽依次发起，但响应可并发等待。
+    """
+    
+    BASE_URL = XueqiuClient.BASE_URL
+    LOGIN_PATHS = XueqiuClient.LOGIN_PATHS
+    
+    def __init__(
+        self,
+        config_dir: str = "config",
+        rate_limiter: AsyncRateLimiter = None,
+        transport: httpx.AsyncBaseTransport = None,
+        metrics: CrawlMetrics = None,
+    ):
+        self.config_dir = Path(config_dir)
+        self.settings = load_settings(self.config_dir)
+        self.rate_limiter = rate_limiter or AsyncRateLimiter.from_settings(self.settings)
+        self.cache = ResponseCache.from_settings(self.settings)
+        self.cache_only = False
+        self.base_url = api_base_url(self.settings)
+        self.metrics = metrics or CrawlMetrics()
+        
+        http_cfg = self.settings.get("http", {})
+        cookies = httpx.Cookies()
+        for name, value in load_cookies(self.config_dir).items():
+            cookies.set(name, value, domain=".xueqiu.com")
+        
+        self._client = httpx.AsyncClient(
+            headers=default_headers(self.settings, self.base_url),
+            cookies=cookies,
+            timeout=http_cfg.get("timeout", 30),
+            follow_redirects=True,
+            transport=transport,
+        )
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *args):
+        await self.aclose()
+    
+    async def aclose(self):
+        await self._client.aclose()
+        if self.rate_limiter.adaptive is not None:
+            self.rate_limiter.adaptive.save()
+        if self.cache:
+            self.cache.close()
+    
+    def _check_cookies_expired(self, response: httpx.Response):
+        """检测 cookies 是否失效"""
+        if any(path in response.url.path for path in self.LOGIN_PATHS):
+            raise CookiesExpiredError(
+                "Cookies 已失效，请更新 config/cookies.json"
+            )
+    
+    async def _request_with_retry(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """带重试的请求"""
+        retry_cfg = self.settings.get("retry", {})
+        max_attempts = retry_cfg.get("max_attempts", 3)
+        base_delay = retry_cfg.get("base_delay", 1.0)
+        endpoint = endpoint_family(url)
+        
+        last_exc = None
+        for attempt in range(max_attempts + 1):
+            self.metrics.observe_wait(endpoint, await self.rate_limiter.acquire(family=endpoint))
+            
+            try:
+                resp = await self._send(method, url, endpoint, **kwargs)
+                
+                self._check_cookies_expired(resp)
+                
+                if resp.status_code >= 500 or resp.status_code == 429:
+                    raise httpx.HTTPStatusError(
+                        f"Server error: {resp.status_code}", request=resp.request, response=resp
+                    )
+                
+                return resp
+            except httpx.HTTPError as e:
+                last_exc = e
+                if attempt < max_attempts:
+                    delay = base_delay * (2 ** attempt)
+                    # 429/503 带 Retry-After 时至少等到服务端给出的时间
+                    if isinstance(e, httpx.HTTPStatusError):
+                        delay = max(delay, parse_retry_after(e.response.headers.get("Retry-After")) or 0.0)
+                    self.metrics.observe_retry(endpoint, delay)
+                    await asyncio.sleep(delay)
+        
+        raise last_exc
+    
+    async def _send(self, method: str, url: str, endpoint: str, **kwargs) -> httpx.Response:
+        """发送单次请求并记录延迟、状态码和流量"""
+        start = time.perf_counter()
+        try:
+            with span("http.request") as s:
+                resp = await self._client.request(method, url, **kwargs)
+                s.add_bytes(len(resp.content))
+        except httpx.HTTPError:
+            self.metrics.observe_request(endpoint, time.perf_counter() - start)
+            raise
+        waf = is_waf_response(resp.headers.get("Content-Type", ""), resp.content)
+        self.metrics.observe_request(endpoint, time.perf_counter() - start, resp.status_code, len(resp.content), waf)
+        adaptive = self.rate_limiter.adaptive
+        if adaptive is not None:
+            login = any(path in resp.url.path for path in self.LOGIN_PATHS)
+            adaptive.on_response(
+                endpoint, resp.status_code, waf or login, parse_retry_after(resp.headers.get("Retry-After")),
+            )
+        return resp
+    
+    async def get_json(self, url: str, params: dict = None, use_cache: bool = True) -> dict | list:
+        """发送 GET 请求，返回 JSON
+        
+        Args:
+            use_cache: 是否读写响应缓存（需在 settings.yaml 启用 cache）
+        """
+        if not url.startswith("http"):
+            url = self.base_url + url
+        
+        cache = self.cache if use_cache else None
+        if cache:
+            cached = cache.get(url, params, ignore_ttl=self.cache_only)
+            if cached is not None:
+                self.metrics.observe_cache_hit(endpoint_family(url))
+                return cached
+            if self.cache_only:
+                raise CacheMissError(f"缓存未命中: {url} {params or ''}")
+        
+        resp = await self._request_with_retry("GET", url, params=params)
+        resp.raise_for_status()
+        
+        try:
+            data = resp.json()
+        except json.JSONDecodeError:
+            raise ValueError(f"响应不是有效 JSON: {resp.text[:200]}")
+        
+        if cache:
+            cache.set(url, params, data)
+        return data
+    
+    async def get_html(self, url: str, params: dict = None) -> str:
+        """发送 GET 请求，返回 HTML"""
+        if not url.startswith("http"):
+            url = self.base_url + url
+        
+        resp = await self._request_with_retry("GET", url, params=params)
+        resp.raise_for_status()
+        return resp.text
@@ -5,10 +5,18 @@ import time
 from datetime import datetime
 from pathlib import Path
 from typing import Iterator
+from urllib.parse import parse_qs, urlsplit
 
 from playwright.sync_api import sync_playwright, Page, Response
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import Stealth
 
+from common.profiling import span, timed
+
+from .client import load_settings
+from .html_clean import clean_html
+from .token_bucket import SharedTokenBucket
+
 
 # 浏览器数据目录（用于保存 WAF 验证状态）
 BROWSER_DATA_DIR = Path(__file__).parent.parent / "browser_data"
@@ -24,6 +32,10 @@ class XueqiuBrowser:
         self._playwright = None
         self._context = None
         self._page = None
+        settings = load_settings(Path("config"))
+        self.bucket = SharedTokenBucket.from_settings(settings)
+        # 专栏分页等待接口响应的超时（秒）
+        self.column_timeout = settings.get("browser", {}).get("page_timeout", 15)
     
     def __enter__(self):
         BROWSER_DATA_DIR.mkdir(exist_ok=True)
@@ -56,8 +68,24 @@ class XueqiuBrowser:
         if hasattr(self, '_stealth_ctx'):
             self._stealth_ctx.__exit__(None, None, None)
     
+    def _throttle(self):
+        """页面加载或触发分页前从本机共享令牌桶取一个令牌，与 HTTP 抓取共用预算"""
+        if self.bucket is not None:
+            self.bucket.acquire()
+    
+    def warm_up(self):
+        """访问首页完成 WAF 验证，供常驻浏览器服务预热和保活"""
+        self._throttle()
+        self._page.goto(f"{self.BASE_URL}/", timeout=30000)
+        self._page.wait_for_load_state("networkidle", timeout=15000)
+        if "滑动验证" in self._page.content():
+            print("  [!] 检测到滑动验证，请手动完成...")
+            self._page.wait_for_function("!document.body.innerText.includes('滑动验证')", timeout=120000)
+        self._close_popups()
+    
     def get_user_profile(self, user_id: str) -> dict:
         """获取用户资料"""
+        self._throttle()
         self._page.goto(f"{self.BASE_URL}/u/{user_id}")
         self._page.wait_for_load_state("networkidle")
         self._close_popups()
@@ -86,54 +114,72 @@ class XueqiuBrowser:
         return profile
     
     def iter_column_posts(self, user_id: str, max_pages: int = None) -> Iterator[dict]:
-        """迭代用户专栏文章（通过监听网络请求绕过 WAF）"""
-        captured_data = []
+        """迭代用户专栏文章（通过监听 original/timeline.json 响应绕过 WAF）
         
-        def handle_response(response: Response):
-            if "original/timeline.json" in response.url and response.status == 200:
-                try:
-                    body = response.body()
-                    text = body.decode('utf-8', errors='ignore')
-                    if text.startswith('{'):
-                        data = json.loads(text)
-                        if data.get("list"):
-                            captured_data.append(data)
-                except Exception:
-                    pass
+        每一页都等待对应页码的接口响应到达即处理，不再固定等待；
+        按响应中的 maxPage（缺失时按请求的页大小判断不满页或空页）决定是否还有下一页。
+        """
+        timeout = self.column_timeout * 1000
+        page_num = 1
+        try:
+            with span("browser.page_load"):
+                self._throttle()
+                data, size = self._wait_column_page(
+                    page_num, lambda: self._page.goto(f"{self.BASE_URL}/{user_id}/column", timeout=30000), timeout,
+                )
+        except PlaywrightTimeoutError:
+            print(f"  [!] 专栏首页 {self.column_timeout}s 内未返回数据")
+            return
         
-        self._page.on("response", handle_response)
+        while data is not None:
+            posts = data.get("list") or []
+            for item in posts:
+                yield self._parse_column_item(item, user_id)
+            
+            if not _has_next_column_page(data, page_num, len(posts), size):
+                break
+            if max_pages and page_num >= max_pages:
+                break
+            
+            page_num += 1
+            try:
+                with span("browser.wait"):
+                    self._throttle()
+                    data, size = self._wait_column_page(
+                        page_num,
+                        lambda: self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)"),
+                        timeout,
+                    )
+            except PlaywrightTimeoutError:
+                print(f"  [!] 专栏第 {page_num} 页 {self.column_timeout}s 内未返回数据，停止翻页")
+                break
+    
+    def _wait_column_page(self, page_num: int, trigger, timeout: float) -> tuple[dict | None, int | None]:
+        """执行 trigger（打开页面或滚动）并等待第 page_num 页的专栏接口响应
+        
+        Returns:
+            (响应 JSON，非 JSON（如 WAF 页）时为 None, 请求中的页大小，未带时为 None)
+        
+        Raises:
+            PlaywrightTimeoutError: timeout 毫秒内没有收到该页响应
+        """
+        def is_page(response: Response) -> bool:
+            if "original/timeline.json" not in response.url or response.status != 200:
+                return False
+            page = parse_qs(urlsplit(response.url).query).get("page")
+            return page is None or page[0] == str(page_num)
         
+        with self._page.expect_response(is_page, timeout=timeout) as info:
+            trigger()
+        response = info.value
+        query = parse_qs(urlsplit(response.url).query)
+        size = (query.get("size") or query.get("count") or [None])[0]
+        size = int(size) if size and size.isdigit() else None
         try:
-            self._page.goto(f"{self.BASE_URL}/{user_id}/column", timeout=30000)
-            self._page.wait_for_load_state("networkidle", timeout=15000)
-            time.sleep(2)
-            
-            page_num = 1
-            while True:
-                if max_pages and page_num > max_pages:
-                    break
-                
-                if not captured_data:
-                    time.sleep(2)
-                if not captured_data:
-                    break
-                
-                data = captured_data.pop(0)
-                posts = data.get("list", [])
-                if not posts:
-                    break
-                
-                for item in posts:
-                    yield self._parse_column_item(item, user_id)
-                
-                if len(posts) < 20:
-                    break
-                
-                page_num += 1
-                self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                time.sleep(2)
-        finally:
-            self._page.remove_listener("response", handle_response)
+            return json.loads(response.body().decode("utf-8", errors="ignore")), size
+        except json.JSONDecodeError:
+            print(f"  [!] 专栏第 {page_num} 页返回的不是 JSON，可能需要完成滑动验证")
+            return None, size
     
     def _parse_column_item(self, item: dict, user_id: str) -> dict:
         """解析专栏 API 返回的文章"""
@@ -143,7 +189,7 @@ class XueqiuBrowser:
             created_at = datetime.fromtimestamp(created_at / 1000).isoformat()
         
         text = item.get("description", "")
-        text = self._clean_html(text)
+        text = clean_html(text)
         
         return {
             "id": str(post_id),
@@ -156,6 +202,7 @@ class XueqiuBrowser:
             "view_count": item.get("view_count", 0),
         }
     
+    @timed("browser.full_content")
     def get_post_full_content(self, user_id: str, post_id: str) -> str:
         """获取文章全文（从专栏页面点击进入详情）"""
         full_text = []
@@ -182,6 +229,7 @@ class XueqiuBrowser:
             # 点击文章链接
             link = self._page.locator(f'a[href*="/{post_id}"]').first
             if link.is_visible(timeout=3000):
+                self._throttle()
                 link.click()
                 
                 # 等待页面加载，如果遇到 WAF 验证需要更多时间
@@ -214,21 +262,11 @@ class XueqiuBrowser:
         finally:
             self._page.remove_listener("response", handle_response)
         
-        return self._clean_html(full_text[0]) if full_text else ""
-    
-    def _clean_html(self, html: str) -> str:
-        """清理 HTML 标签"""
-        if not html:
-            return ""
-        text = re.sub(r"<br\s*/?>", "\n", html)
-        text = re.sub(r"</p>", "\n\n", text)
-        text = re.sub(r"<[^>]+>", "", text)
-        text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">")
-        text = text.replace("&amp;", "&").replace("&quot;", '"')
-        return re.sub(r"\n{3,}", "\n\n", text).strip()
+        return clean_html(full_text[0]) if full_text else ""
     
     def iter_user_posts(self, user_id: str, max_pages: int = None) -> Iterator[dict]:
         """迭代用户文章（滚动加载）"""
+        self._throttle()
         self._page.goto(f"{self.BASE_URL}/u/{user_id}")
         self._page.wait_for_load_state("networkidle")
         self._close_popups()
@@ -313,6 +351,7 @@ class XueqiuBrowser:
         """滚动加载更多"""
         old_count = self._page.evaluate("document.querySelectorAll('article').length")
         
+        self._throttle()
         self._page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
         time.sleep(2)
         
@@ -320,6 +359,21 @@ class XueqiuBrowser:
         return new_count > old_count
 
 
+def _has_next_column_page(data: dict, page_num: int, count: int, size: int | None) -> bool:
+    """根据专栏接口的分页信息判断是否还有下一页
+    
+    Args:
+        count: 本页文章数
+        size: 请求的页大小，未知时只在空页停止
+    """
+    if not count:
+        return False
+    max_page = data.get("maxPage")
+    if isinstance(max_page, int) and max_page > 0:
+        return page_num < max_page
+    return size is None or count >= size
+
+
 def crawl_user_with_browser(
     user_id: str,
     out_root: str = "./data",
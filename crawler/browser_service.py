@@ -0,0 +1,331 @@
+"""常驻浏览器服务：启动一次、保持 WAF 会话预热，供多次抓取复用
+
+服务端持有两个浏览器：
+- Playwright 持久化上下文（XueqiuBrowser），负责专栏列表
+- nodriver 浏览器，负责文章全文
+
+两者都只在各自的专属线程中访问（Playwright 同步 API 不能跨线程，nodriver 绑定事件循环）。
+客户端通过本地 TCP 连接提交任务，协议为逐行 JSON：
+
+    请求: {"op": "ping"} / {"op": "column_posts", "user_id": ...} / {"op": "full_content", "user_id": ..., "post_ids": [...]}
+    响应: 若干行 {"item": ...}，最后一行 {"done": true} 或 {"error": "..."}
+"""
+import asyncio
+import json
+import logging
+import queue
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Iterator
+
+import nodriver as uc
+
+from .browser import BROWSER_DATA_DIR, XueqiuBrowser
+from .client import load_settings
+from .metrics import is_waf_response
+from .nodriver_browser import iter_posts_full_content
+
+logger = logging.getLogger(__name__)
+
+# nodriver 使用独立的数据目录，避免与 Playwright 持久化上下文争用锁
+NODRIVER_DATA_DIR = BROWSER_DATA_DIR.parent / "browser_data_nodriver"
+
+_DONE = object()
+
+# 探测服务是否在运行时的超时（秒），服务挂起时不阻塞抓取
+PROBE_TIMEOUT = 5
+
+
+class BrowserServiceError(Exception):
+    """浏览器服务返回错误"""
+    pass
+
+
+def _service_settings() -> dict:
+    cfg = load_settings(Path("config")).get("browser_service", {})
+    return {
+        "host": cfg.get("host", "127.0.0.1"),
+        "port": cfg.get("port", 9527),
+        "keepalive": cfg.get("keepalive", 600),
+        "max_jobs": cfg.get("max_jobs", 2),
+        "timeout": cfg.get("timeout", 120),
+        "waf_timeout": cfg.get("waf_timeout", 120),
+    }
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    """允许重启后立即复用端口；处理线程随进程退出"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+async def _wait_past_waf(tab, timeout: float, interval: float = 0.5) -> bool:
+    """轮询页面直到不再是 WAF 验证页（滑块需要时间通过），超时返回 False"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        html = await tab.get_content()
+        if html and not is_waf_response("text/html", html.encode("utf-8")):
+            return True
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+
+
+class _PlaywrightWorker(threading.Thread):
+    """在专属线程中持有 XueqiuBrowser，串行执行任务"""
+    
+    def __init__(self, headless: bool):
+        super().__init__(name="playwright-worker", daemon=True)
+        self.headless = headless
+        self._jobs: queue.Queue = queue.Queue()
+        self.ready = threading.Event()
+        self.browser: XueqiuBrowser = None
+    
+    def submit(self, fn: Callable[[XueqiuBrowser], None]) -> Future:
+        future = Future()
+        self._jobs.put((fn, future))
+        return future
+    
+    def stop(self):
+        self._jobs.put(None)
+    
+    def run(self):
+        with XueqiuBrowser(headless=self.headless) as browser:
+            self.browser = browser
+            browser.warm_up()
+            self.ready.set()
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                fn, future = job
+                try:
+                    future.set_result(fn(browser))
+                except Exception as e:
+                    future.set_exception(e)
+
+
+class BrowserService:
+    """常驻浏览器服务端"""
+    
+    def __init__(self, host: str = None, port: int = None, headless: bool = False):
+        cfg = _service_settings()
+        self.host = host or cfg["host"]
+        self.port = cfg["port"] if port is None else port
+        self.keepalive = cfg["keepalive"]
+        self.waf_timeout = cfg["waf_timeout"]
+        self.headless = headless
+        self.started_at = None
+        self.jobs_done = 0
+        self._jobs_lock = threading.Lock()
+        
+        self._playwright = _PlaywrightWorker(headless)
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="nodriver-loop", daemon=True)
+        self._nodriver = None
+        self._job_slots = threading.BoundedSemaphore(cfg["max_jobs"])
+        self._server: _Server = None
+    
+    def _run_async(self, coro) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+    
+    async def _start_nodriver(self):
+        NODRIVER_DATA_DIR.mkdir(exist_ok=True)
+        browser = await uc.start(user_data_dir=str(NODRIVER_DATA_DIR), headless=self.headless)
+        # 先访问首页并等待 WAF 验证通过，之后的文章页复用该会话
+        tab = await browser.get(f"{XueqiuBrowser.BASE_URL}/")
+        if not await _wait_past_waf(tab, self.waf_timeout):
+            browser.stop()
+            raise BrowserServiceError(f"{self.waf_timeout} 秒内未通过 WAF 验证")
+        return browser
+    
+    async def _keep_warm(self):
+        """定期刷新首页，避免 WAF 会话过期"""
+        while True:
+            await asyncio.sleep(self.keepalive)
+            try:
+                tab = self._nodriver.main_tab
+                await tab.reload()
+                if not await _wait_past_waf(tab, self.waf_timeout):
+                    logger.warning("刷新后仍停留在 WAF 验证页，文章页可能被拦截")
+                self._playwright.submit(lambda browser: browser.warm_up())
+            except Exception as e:
+                logger.warning(f"刷新浏览器会话失败: {e}")
+    
+    def start(self):
+        """启动浏览器并完成预热（阻塞直到就绪）"""
+        self._loop_thread.start()
+        self._playwright.start()
+        self._nodriver = self._run_async(self._start_nodriver()).result()
+        self._playwright.ready.wait()
+        self._run_async(self._keep_warm())
+        self.started_at = time.time()
+        logger.info("浏览器已预热")
+    
+    def bind(self):
+        """监听本地端口（port=0 时由系统分配）"""
+        service = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                service._handle(self.rfile, self.wfile)
+        
+        self._server = _Server((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        logger.info(f"浏览器服务监听 {self.host}:{self.port}")
+    
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.shutdown()
+    
+    def shutdown(self):
+        if self._server:
+            self._server.server_close()
+        self._playwright.stop()
+        if self._nodriver:
+            self._nodriver.stop()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    def _handle(self, rfile, wfile):
+        def send(message: dict):
+            wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+            wfile.flush()
+        
+        try:
+            request = json.loads(rfile.readline().decode("utf-8"))
+            op = request.get("op")
+            if op == "ping":
+                send({"item": {"started_at": self.started_at, "jobs_done": self.jobs_done}})
+            elif op in ("column_posts", "full_content"):
+                with self._job_slots:
+                    for item in self._run_job(op, request):
+                        send({"item": item})
+                # 每个连接在独立的处理线程中运行
+                with self._jobs_lock:
+                    self.jobs_done += 1
+            else:
+                raise BrowserServiceError(f"未知操作: {op}")
+            send({"done": True})
+        except (BrokenPipeError, ConnectionResetError):
+            logger.warning("客户端已断开")
+        except Exception as e:
+            logger.error(f"任务失败: {e}")
+            try:
+                send({"error": str(e)})
+            except OSError:
+                pass
+    
+    def _run_job(self, op: str, request: dict) -> Iterator:
+        """在对应浏览器线程中执行任务，结果经队列逐条流回当前连接"""
+        items: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+        user_id = str(request["user_id"])
+        
+        if op == "column_posts":
+            def job(browser: XueqiuBrowser):
+                for post in browser.iter_column_posts(user_id, request.get("max_pages")):
+                    if cancelled.is_set():
+                        break
+                    items.put(post)
+            future = self._playwright.submit(job)
+        else:
+            async def job():
+                async for post_id, text in iter_posts_full_content(
+                    user_id, request["post_ids"], request.get("concurrency"), browser=self._nodriver
+                ):
+                    if cancelled.is_set():
+                        break
+                    items.put([post_id, text])
+            future = self._run_async(job())
+        
+        future.add_done_callback(lambda _: items.put(_DONE))
+        try:
+            while True:
+                item = items.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # 客户端提前停止（如到达已抓取位置）时让浏览器线程尽快结束任务
+            cancelled.set()
+        future.result()
+
+
+class BrowserServiceClient:
+    """常驻浏览器服务客户端（同步）"""
+    
+    def __init__(self, host: str = None, port: int = None, timeout: float = None):
+        """
+        Args:
+            timeout: 等待服务端下一条结果的超时秒数，None=从配置 browser_service.timeout 读取
+        """
+        cfg = _service_settings()
+        self.host = host or cfg["host"]
+        self.port = port or cfg["port"]
+        self.timeout = timeout or cfg["timeout"]
+    
+    @classmethod
+    def connect_if_running(
+        cls, host: str = None, port: int = None, timeout: float = None,
+    ) -> "BrowserServiceClient | None":
+        """服务在运行时返回客户端，否则返回 None
+        
+        探测超时、端口被其他程序占用（连接被关闭或应答不是本服务的协议）时同样返回 None，
+        调用方回退到本地浏览器。
+        """
+        client = cls(host, port, timeout)
+        try:
+            client.ping()
+        except (OSError, ValueError, IndexError, BrowserServiceError):
+            return None
+        return client
+    
+    def _request(self, request: dict, timeout: float = None) -> Iterator:
+        """发送请求并逐条产出结果，timeout 秒内没有收到下一条时抛出 socket.timeout（OSError）"""
+        timeout = timeout or self.timeout
+        with socket.create_connection((self.host, self.port), timeout=min(timeout, PROBE_TIMEOUT)) as sock:
+            sock.settimeout(timeout)
+            sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as reader:
+                for line in reader:
+                    message = json.loads(line.decode("utf-8"))
+                    if "item" in message:
+                        yield message["item"]
+                    elif "error" in message:
+                        raise BrowserServiceError(message["error"])
+                    elif message.get("done"):
+                        return
+        raise BrowserServiceError("浏览器服务连接意外中断")
+    
+    def ping(self) -> dict:
+        return list(self._request({"op": "ping"}, timeout=PROBE_TIMEOUT))[0]
+    
+    def iter_column_posts(self, user_id: str, max_pages: int = None) -> Iterator[dict]:
+        """在服务端已预热的浏览器中迭代专栏文章"""
+        yield from self._request({"op": "column_posts", "user_id": user_id, "max_pages": max_pages})
+    
+    def get_posts_full_content(
+        self,
+        user_id: str,
+        post_ids: list[str],
+        on_result: Callable[[str, str], None] = None,
+        concurrency: int = None,
+    ) -> dict[str, str]:
+        """在服务端浏览器中批量获取全文，每篇完成时回调 on_result"""
+        results = {}
+        request = {"op": "full_content", "user_id": user_id, "post_ids": post_ids, "concurrency": concurrency}
+        for post_id, text in self._request(request):
+            if text:
+                results[post_id] = text
+            if on_result:
+                on_result(post_id, text)
+        return results
@@ -0,0 +1,146 @@
+"""HTTP 响应磁盘缓存"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+class CacheMissError(Exception):
+    """仅缓存模式下请求未命中"""
+    pass
+
+
+def is_cacheable(data) -> bool:
+    """判断响应是否可缓存：接口错误（error_description）和空结果（时间线无 statuses、搜索无 list）
+    可能只是暂时的，缓存后会在整个 TTL 内被重放，因此不缓存"""
+    if not isinstance(data, dict):
+        return data is not None
+    if "error_description" in data or "error_code" in data:
+        return False
+    for key in ("statuses", "list"):
+        if key in data and not data[key]:
+            return False
+    return True
+
+
+class ResponseCache:
+    """以 URL + 参数为键的 JSON 响应缓存（SQLite 存储）
+    
+    - 按接口路径前缀配置 TTL，未配置的接口不缓存
+    - 总大小超过 max_bytes 时按最近访问时间淘汰（LRU）
+    """
+    
+    def __init__(self, path: str | Path, ttl: dict[str, float] = None, max_bytes: int = 200 * 1024 * 1024):
+        self.path = Path(path)
+        self.ttl = ttl or {}
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses (accessed_at)")
+        self._conn.commit()
+    
+    @classmethod
+    def from_settings(cls, settings: dict, force: bool = False) -> "ResponseCache | None":
+        """按 settings.yaml 的 cache 段创建，未启用且未 force 时返回 None"""
+        cfg = settings.get("cache", {})
+        if not (cfg.get("enabled", False) or force):
+            return None
+        return cls(
+            cfg.get("path", "cache/http.sqlite"),
+            ttl=cfg.get("ttl", {}),
+            max_bytes=cfg.get("max_bytes", 200 * 1024 * 1024),
+        )
+    
+    def ttl_for(self, url: str) -> float | None:
+        """返回接口对应的 TTL（秒），最长前缀匹配，未配置返回 None"""
+        path = urlsplit(url).path
+        matches = [prefix for prefix in self.ttl if path.startswith(prefix)]
+        if not matches:
+            return None
+        return self.ttl[max(matches, key=len)]
+    
+    @staticmethod
+    def make_key(url: str, params: dict = None) -> str:
+        raw = url + "?" + json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, url: str, params: dict = None, ignore_ttl: bool = False):
+        """读取缓存，未命中或过期返回 None
+        
+        Args:
+            ignore_ttl: 忽略过期时间（离线重放已缓存的响应）
+        """
+        ttl = self.ttl_for(url)
+        if ttl is None and not ignore_ttl:
+            return None
+        
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (not ignore_ttl and time.time() - row[1] > ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+    
+    def set(self, url: str, params: dict, data):
+        """写入缓存，未配置 TTL 的接口和不可缓存的响应（见 is_cacheable）忽略"""
+        if not self.ttl_for(url) or not is_cacheable(data):
+            return
+        
+        body = json.dumps(data, ensure_ascii=False)
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, url, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(url, params), url, body, size, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        """超过容量时按 LRU 淘汰"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+    
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+    
+    def close(self):
+        self._conn.close()
@@ -7,12 +7,69 @@ from pathlib import Path
 import requests
 import yaml
 
+from common.profiling import span
+
+from .cache import CacheMissError, ResponseCache
+from .metrics import CrawlMetrics, endpoint_family, is_waf_response
+from .rate_limiter import AdaptiveRateLimit, parse_retry_after
+from .token_bucket import SharedTokenBucket
+
 
 class CookiesExpiredError(Exception):
     """Cookies 失效异常"""
     pass
 
 
+def _default_settings() -> dict:
+    return {
+        "http": {"user_agent": "Mozilla/5.0", "timeout": 30},
+        "rate_limit": {"min_interval": 1.0, "max_interval": 2.0},
+        "retry": {"max_attempts": 3, "base_delay": 1.0},
+    }
+
+
+def load_settings(config_dir: Path) -> dict:
+    """加载 settings.yaml，不存在时使用默认配置"""
+    settings_path = Path(config_dir) / "settings.yaml"
+    if settings_path.exists():
+        with open(settings_path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f)
+    return _default_settings()
+
+
+def load_cookies(config_dir: Path) -> dict:
+    """加载 cookies.json"""
+    cookies_path = Path(config_dir) / "cookies.json"
+    if not cookies_path.exists():
+        raise FileNotFoundError(
+            f"Cookies 文件不存在: {cookies_path}\n"
+            f"请复制 cookies.json.example 为 cookies.json 并填入有效的 cookies"
+        )
+    
+    with open(cookies_path, "r", encoding="utf-8") as f:
+        cookies = json.load(f)
+    
+    # 移除说明字段
+    cookies.pop("cookies_说明", None)
+    return cookies
+
+
+def api_base_url(settings: dict) -> str:
+    """接口根地址，settings.yaml 的 http.base_url 可指向本地假服务（benchmarks/fake_xueqiu.py）"""
+    return settings.get("http", {}).get("base_url", XueqiuClient.BASE_URL).rstrip("/")
+
+
+def default_headers(settings: dict, base_url: str) -> dict:
+    """构造请求头"""
+    return {
+        "User-Agent": settings.get("http", {}).get("user_agent", ""),
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "zh-CN,zh;q=0.9",
+        "Referer": base_url,
+        "Origin": base_url,
+    }
+
+
 class XueqiuClient:
     """雪球 HTTP 客户端，封装 requests.Session"""
     
@@ -37,62 +94,45 @@ class XueqiuClient:
         self._last_request_time = 0
         
         self._load_config()
+        self.cache = ResponseCache.from_settings(self.settings)
+        self.cache_only = False
+        self.metrics = CrawlMetrics()
+        self.adaptive = AdaptiveRateLimit.from_settings(self.settings)
+        self.bucket = SharedTokenBucket.from_settings(self.settings)
     
     def _load_config(self):
         """加载配置文件"""
-        # 加载 settings.yaml
-        settings_path = self.config_dir / "settings.yaml"
-        if settings_path.exists():
-            with open(settings_path, "r", encoding="utf-8") as f:
-                self.settings = yaml.safe_load(f)
-        else:
-            self.settings = self._default_settings()
-        
-        # 加载 cookies.json
-        cookies_path = self.config_dir / "cookies.json"
-        if not cookies_path.exists():
-            raise FileNotFoundError(
-                f"Cookies 文件不存在: {cookies_path}\n"
-                f"请复制 cookies.json.example 为 cookies.json 并填入有效的 cookies"
-            )
-        
-        with open(cookies_path, "r", encoding="utf-8") as f:
-            cookies = json.load(f)
-        
-        # 移除说明字段
-        cookies.pop("cookies_说明", None)
+        self.settings = load_settings(self.config_dir)
         
         # 设置 cookies 和 headers
-        for name, value in cookies.items():
+        for name, value in load_cookies(self.config_dir).items():
             self._session.cookies.set(name, value, domain=".xueqiu.com")
         
-        self._session.headers.update({
-            "User-Agent": self.settings.get("http", {}).get("user_agent", ""),
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "zh-CN,zh;q=0.9",
-            "Referer": self.BASE_URL,
-            "Origin": self.BASE_URL,
-        })
-    
-    @staticmethod
-    def _default_settings():
-        return {
-            "http": {"user_agent": "Mozilla/5.0", "timeout": 30},
-            "rate_limit": {"min_interval": 1.0, "max_interval": 2.0},
-            "retry": {"max_attempts": 3, "base_delay": 1.0},
-        }
+        self.base_url = api_base_url(self.settings)
+        self._session.headers.update(default_headers(self.settings, self.base_url))
     
-    def _wait_for_rate_limit(self):
-        """等待限速间隔"""
-        rl = self.settings.get("rate_limit", {})
-        min_interval = rl.get("min_interval", 1.0)
-        max_interval = rl.get("max_interval", 2.0)
+    def _wait_for_rate_limit(self, endpoint: str = "") -> float:
+        """等待限速间隔，返回等待秒数
         
-        elapsed = time.time() - self._last_request_time
-        if elapsed < min_interval:
-            wait = random.uniform(min_interval, max_interval) - elapsed
-            if wait > 0:
-                time.sleep(wait)
+        启用自适应限速时按接口族的学习间隔等待；启用共享令牌桶时再从本机共享预算中取一个令牌。
+        """
+        wait = 0.0
+        if self.adaptive is not None:
+            wait = max(self.adaptive.reserve(endpoint), 0.0)
+        else:
+            rl = self.settings.get("rate_limit", {})
+            min_interval = rl.get("min_interval", 1.0)
+            max_interval = rl.get("max_interval", 2.0)
+            
+            elapsed = time.time() - self._last_request_time
+            if elapsed < min_interval:
+                wait = max(random.uniform(min_interval, max_interval) - elapsed, 0.0)
+        if wait > 0:
+            time.sleep(wait)
+        
+        if self.bucket is not None:
+            wait += self.bucket.acquire()
+        return wait
     
     def _check_cookies_expired(self, response: requests.Response):
         """检测 cookies 是否失效"""
@@ -109,51 +149,97 @@ class XueqiuClient:
         timeout = self.settings.get("http", {}).get("timeout", 30)
         
         kwargs.setdefault("timeout", timeout)
+        endpoint = endpoint_family(url)
         
         last_exc = None
         for attempt in range(max_attempts + 1):
-            self._wait_for_rate_limit()
+            self.metrics.observe_wait(endpoint, self._wait_for_rate_limit(endpoint))
             
             try:
-                resp = self._session.request(method, url, **kwargs)
+                resp = self._send(method, url, endpoint, **kwargs)
                 self._last_request_time = time.time()
                 
                 self._check_cookies_expired(resp)
                 
-                if resp.status_code >= 500:
-                    raise requests.HTTPError(f"Server error: {resp.status_code}")
+                if resp.status_code >= 500 or resp.status_code == 429:
+                    raise requests.HTTPError(f"Server error: {resp.status_code}", response=resp)
                 
                 return resp
             except (requests.RequestException, requests.HTTPError) as e:
                 last_exc = e
                 if attempt < max_attempts:
                     delay = base_delay * (2 ** attempt)
+                    # 429/503 带 Retry-After 时至少等到服务端给出的时间
+                    if e.response is not None:
+                        delay = max(delay, parse_retry_after(e.response.headers.get("Retry-After")) or 0.0)
+                    self.metrics.observe_retry(endpoint, delay)
                     time.sleep(delay)
         
         raise last_exc
     
-    def get_json(self, url: str, params: dict = None) -> dict | list:
-        """发送 GET 请求，返回 JSON"""
+    def _send(self, method: str, url: str, endpoint: str, **kwargs) -> requests.Response:
+        """发送单次请求并记录延迟、状态码和流量"""
+        start = time.perf_counter()
+        try:
+            with span("http.request") as s:
+                resp = self._session.request(method, url, **kwargs)
+                s.add_bytes(len(resp.content))
+        except requests.RequestException:
+            self.metrics.observe_request(endpoint, time.perf_counter() - start)
+            raise
+        waf = is_waf_response(resp.headers.get("Content-Type", ""), resp.content)
+        self.metrics.observe_request(endpoint, time.perf_counter() - start, resp.status_code, len(resp.content), waf)
+        if self.adaptive is not None:
+            login = any(path in resp.url for path in self.LOGIN_PATHS)
+            self.adaptive.on_response(
+                endpoint, resp.status_code, waf or login, parse_retry_after(resp.headers.get("Retry-After")),
+            )
+        return resp
+    
+    def get_json(self, url: str, params: dict = None, use_cache: bool = True) -> dict | list:
+        """发送 GET 请求，返回 JSON
+        
+        Args:
+            use_cache: 是否读写响应缓存（需在 settings.yaml 启用 cache）
+        """
         if not url.startswith("http"):
-            url = self.BASE_URL + url
+            url = self.base_url + url
+        
+        cache = self.cache if use_cache else None
+        if cache:
+            cached = cache.get(url, params, ignore_ttl=self.cache_only)
+            if cached is not None:
+                self.metrics.observe_cache_hit(endpoint_family(url))
+                return cached
+            if self.cache_only:
+                raise CacheMissError(f"缓存未命中: {url} {params or ''}")
         
         resp = self._request_with_retry("GET", url, params=params)
         resp.raise_for_status()
         
         try:
-            return resp.json()
+            data = resp.json()
         except json.JSONDecodeError:
             raise ValueError(f"响应不是有效 JSON: {resp.text[:200]}")
+        
+        if cache:
+            cache.set(url, params, data)
+        return data
     
     def get_html(self, url: str, params: dict = None) -> str:
         """发送 GET 请求，返回 HTML"""
         if not url.startswith("http"):
-            url = self.BASE_URL + url
+            url = self.base_url + url
         
         resp = self._request_with_retry("GET", url, params=params)
         resp.raise_for_status()
         return resp.text
     
+    def save_state(self):
+        """写出自适应限速学到的速率，抓取结束时调用，避免丢失最近未落盘的调整"""
+        if self.adaptive is not None:
+            self.adaptive.save()
+    
     @classmethod
     def reset_instance(cls):
         """重置单例（用于测试）"""
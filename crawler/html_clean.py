@@ -0,0 +1,47 @@
+"""HTML 转纯文本（各爬虫共用）"""
+import re
+from html import unescape
+
+from common.profiling import span
+
+_BLOCK_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.DOTALL | re.IGNORECASE)
+_BR_RE = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_P_END_RE = re.compile(r"</p\s*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_LINES_RE = re.compile(r"\n\n\n+")
+
+# 常见实体先用 str.replace 处理，其余交给 html.unescape
+_COMMON_ENTITIES = (("&nbsp;", " "), ("&lt;", "<"), ("&gt;", ">"), ("&quot;", '"'), ("&#39;", "'"))
+
+
+def _decode_entities(text: str) -> str:
+    for entity, char in _COMMON_ENTITIES:
+        text = text.replace(entity, char)
+    # 只剩 &amp; 时直接替换（放在最后，避免 &amp;lt; 被二次解码）
+    if text.count("&") == text.count("&amp;"):
+        return text.replace("&amp;", "&")
+    return unescape(text).replace("\xa0", " ")
+
+
+def clean_html(html: str) -> str:
+    """清洗 HTML，提取纯文本
+    
+    script/style 整段丢弃，<br> 换行，</p> 空行，其余标签删除；
+    完整解码 HTML 实体（含数字实体），&nbsp; 转为普通空格。
+    """
+    if not html:
+        return ""
+    with span("crawl.html_clean") as s:
+        if s:
+            s.add_bytes(len(html.encode("utf-8")))
+        return _clean(html)
+
+
+def _clean(html: str) -> str:
+    text = html
+    if _BLOCK_RE.search(text):
+        text = _BLOCK_RE.sub("", text)
+    text = _TAG_RE.sub("", _P_END_RE.sub("\n\n", _BR_RE.sub("\n", text)))
+    if "&" in text:
+        text = _decode_entities(text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
@@ -0,0 +1,269 @@
+"""抓取指标：按接口统计延迟、流量、重试、限速等待和状态码
+
+客户端在每次请求时写入 CrawlMetrics，抓取结束后导出 JSON 汇总和 Prometheus textfile
+（供 node_exporter 的 textfile collector 采集），据此调整 rate_limit 和 retry 配置。
+"""
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# 延迟直方图桶上限（秒），与 Prometheus 默认桶相近，覆盖雪球接口的常见耗时
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 阿里云 WAF 拦截页的特征：接口返回 HTML 验证页而不是 JSON
+_WAF_MARKERS = ("acw_sc__v2", "aliyun_waf", "滑动验证")
+_ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+METRIC_PREFIX = "xueqiu_crawl"
+
+
+def endpoint_family(url: str) -> str:
+    """接口路径，路径中的数字 ID 归一为 :id，避免每个用户一组指标"""
+    return _ID_SEGMENT_RE.sub("/:id", urlsplit(str(url)).path) or "/"
+
+
+def is_waf_response(content_type: str, body: bytes) -> bool:
+    """判断响应是否为 WAF 拦截页"""
+    if "html" not in (content_type or ""):
+        return False
+    head = body[:8192].decode("utf-8", errors="ignore")
+    return any(marker in head for marker in _WAF_MARKERS)
+
+
+class Histogram:
+    """累积桶直方图"""
+    
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+    
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+    
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.max = max(self.max, value)
+    
+    def quantile(self, q: float) -> float | None:
+        """按桶线性插值估算分位数（同 Prometheus histogram_quantile），超出最大桶时返回最大值"""
+        total = self.count
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.max
+    
+    def cumulative(self) -> list[tuple[str, int]]:
+        """(le, 累计数)，用于 Prometheus 输出"""
+        result = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            result.append((f"{bound:g}", running))
+        result.append(("+Inf", running + self.counts[-1]))
+        return result
+
+
+class EndpointStats:
+    """单个接口的计数"""
+    
+    def __init__(self):
+        self.latency = Histogram()
+        self.status = {"2xx": 0, "3xx": 0, "4xx": 0, "5xx": 0, "error": 0}
+        self.waf = 0
+        self.bytes = 0
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.rate_limit_wait = 0.0
+        self.cache_hits = 0
+    
+    def to_dict(self) -> dict:
+        quantile = lambda q: None if self.latency.quantile(q) is None else round(self.latency.quantile(q), 4)
+        return {
+            "requests": self.latency.count,
+            "status": dict(self.status),
+            "waf": self.waf,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "retry_wait_seconds": round(self.retry_wait, 3),
+            "rate_limit_wait_seconds": round(self.rate_limit_wait, 3),
+            "cache_hits": self.cache_hits,
+            "latency_seconds": {
+                "sum": round(self.latency.sum, 4),
+                "max": round(self.latency.max, 4),
+                "p50": quantile(0.5),
+                "p90": quantile(0.9),
+                "p99": quantile(0.99),
+                "buckets": dict(self.latency.cumulative()),
+            },
+        }
+
+
+class CrawlMetrics:
+    """一次抓取的请求指标，同步和异步客户端共用；加锁后可在批量抓取的多个协程或线程间共享"""
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._endpoints: dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self.posts = 0
+    
+    def _stats(self, endpoint: str) -> EndpointStats:
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = EndpointStats()
+        return stats
+    
+    def observe_request(self, endpoint: str, elapsed: float, status: int = None, nbytes: int = 0, waf: bool = False):
+        """记录一次 HTTP 往返，status=None 表示网络错误或超时"""
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.latency.observe(elapsed)
+            stats.status[f"{status // 100}xx" if status and 200 <= status < 600 else "error"] += 1
+            stats.bytes += nbytes
+            if waf:
+                stats.waf += 1
+    
+    def observe_retry(self, endpoint: str, delay: float):
+        """记录一次重试及其退避等待"""
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats.retries += 1
+            stats.retry_wait += delay
+    
+    def observe_wait(self, endpoint: str, seconds: float):
+        """记录请求发起前的限速等待"""
+        if seconds > 0:
+            with self._lock:
+                self._stats(endpoint).rate_limit_wait += seconds
+    
+    def observe_cache_hit(self, endpoint: str):
+        with self._lock:
+            self._stats(endpoint).cache_hits += 1
+    
+    def add_posts(self, count: int):
+        with self._lock:
+            self.posts += count
+    
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._start
+    
+    def summary(self) -> dict:
+        """JSON 汇总：总计 + 按接口明细"""
+        with self._lock:
+            endpoints = {name: stats.to_dict() for name, stats in sorted(self._endpoints.items())}
+        elapsed = self.elapsed
+        totals = {
+            key: sum(e[key] for e in endpoints.values())
+            for key in ("requests", "waf", "bytes", "retries", "cache_hits")
+        }
+        for key in ("retry_wait_seconds", "rate_limit_wait_seconds"):
+            totals[key] = round(sum(e[key] for e in endpoints.values()), 3)
+        totals["status"] = {
+            cls: sum(e["status"][cls] for e in endpoints.values()) for cls in ("2xx", "3xx", "4xx", "5xx", "error")
+        }
+        return {
+            "started_at": self.started_at,
+            "elapsed_seconds": round(elapsed, 3),
+            "posts": self.posts,
+            "posts_per_second": round(self.posts / elapsed, 3) if elapsed > 0 else 0.0,
+            "totals": totals,
+            "endpoints": endpoints,
+        }
+    
+    def write_json(self, path: Path, **extra):
+        """写出 JSON 汇总，extra 合并到顶层（如 user、mode）"""
+        _atomic_write(path, json.dumps({**extra, **self.summary()}, ensure_ascii=False, indent=2))
+    
+    def to_prometheus(self, labels: dict = None) -> str:
+        """Prometheus 文本格式，labels 加到每个样本上（如 user）"""
+        base = dict(labels or {})
+        lines = []
+        
+        def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]):
+            full = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for sample_labels, value in samples:
+                suffix = sample_labels.pop("__suffix", "")
+                lines.append(f"{full}{suffix}{_format_labels({**base, **sample_labels})} {_format_value(value)}")
+        
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            histogram = []
+            for name, stats in endpoints:
+                for le, count in stats.latency.cumulative():
+                    histogram.append(({"__suffix": "_bucket", "endpoint": name, "le": le}, count))
+                histogram.append(({"__suffix": "_sum", "endpoint": name}, stats.latency.sum))
+                histogram.append(({"__suffix": "_count", "endpoint": name}, stats.latency.count))
+            metric("request_duration_seconds", "histogram", "HTTP request latency.", histogram)
+            metric("requests_total", "counter", "HTTP requests by status class (error = no response).", [
+                ({"endpoint": name, "code": cls}, count)
+                for name, stats in endpoints for cls, count in stats.status.items()
+            ])
+            metric("waf_blocks_total", "counter", "Responses that were WAF challenge pages.",
+                   [({"endpoint": name}, stats.waf) for name, stats in endpoints])
+            metric("response_bytes_total", "counter", "Response body bytes received.",
+                   [({"endpoint": name}, stats.bytes) for name, stats in endpoints])
+            metric("retries_total", "counter", "Retried requests.",
+                   [({"endpoint": name}, stats.retries) for name, stats in endpoints])
+            metric("retry_wait_seconds_total", "counter", "Time spent in retry backoff.",
+                   [({"endpoint": name}, stats.retry_wait) for name, stats in endpoints])
+            metric("rate_limit_wait_seconds_total", "counter", "Time spent waiting for the rate limiter.",
+                   [({"endpoint": name}, stats.rate_limit_wait) for name, stats in endpoints])
+            metric("cache_hits_total", "counter", "Requests served from the response cache.",
+                   [({"endpoint": name}, stats.cache_hits) for name, stats in endpoints])
+            posts = self.posts
+        
+        elapsed = self.elapsed
+        metric("posts_total", "gauge", "Posts processed in the last run.", [({}, posts)])
+        metric("duration_seconds", "gauge", "Wall time of the last run.", [({}, elapsed)])
+        metric("posts_per_second", "gauge", "Post throughput of the last run.",
+               [({}, posts / elapsed if elapsed > 0 else 0.0)])
+        metric("last_run_timestamp_seconds", "gauge", "Unix time the last run finished.", [({}, time.time())])
+        return "\n".join(lines) + "\n"
+    
+    def write_prometheus(self, path: Path, labels: dict = None):
+        """写出 Prometheus textfile，先写临时文件再改名，采集方不会读到半截文件"""
+        _atomic_write(path, self.to_prometheus(labels))
+
+
+def _format_value(value) -> str:
+    # 计数保持整数，避免 :g 把大字节数截成 6 位有效数字
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _atomic_write(path: Path, text: str):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
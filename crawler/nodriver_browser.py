@@ -2,38 +2,156 @@
 import asyncio
 import json
 import re
-from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Callable
 
 import nodriver as uc
 
+from common.profiling import span
 
-async def get_posts_full_content_async(user_id: str, post_ids: list[str]) -> dict[str, str]:
-    """使用 nodriver 批量获取文章全文（绕过 WAF）"""
-    browser = await uc.start()
-    results = {}
+from .client import load_settings
+from .html_clean import clean_html
+from .rate_limiter import AsyncRateLimiter
+from .token_bucket import SharedTokenBucket
+
+
+POST_URL = "https://xueqiu.com/{user_id}/{post_id}"
+
+# 文章详情页 DOM 中的正文节点（内嵌 JSON 缺失时的兜底）
+_DOM_TEXT_JS = """(() => {
+    const el = document.querySelector('.article__bd__detail') ||
+               document.querySelector('.article__bd');
+    return el ? el.innerHTML : '';
+})()"""
+
+
+async def iter_posts_full_content(
+    user_id: str,
+    post_ids: list[str],
+    concurrency: int = None,
+    ready_timeout: float = None,
+    browser=None,
+    rate_limiter: AsyncRateLimiter = None,
+) -> AsyncIterator[tuple[str, str]]:
+    """使用 nodriver 标签页池并发获取文章全文，按完成顺序产出 (post_id, text)
     
-    try:
-        for post_id in post_ids:
-            url = f"https://xueqiu.com/{user_id}/{post_id}"
-            page = await browser.get(url)
-            await asyncio.sleep(3)
-            
-            html = await page.get_content()
-            
-            # 从 JSON 提取 text 字段
-            match = re.search(r'"text":"(.*?)"(?:,\s*"|\})', html)
-            if match:
-                text = match.group(1)
+    每个标签页加载完成后轮询内嵌 JSON / 正文 DOM，就绪即返回，不再固定等待。
+    获取失败或超时的文章产出空字符串。
+    
+    Args:
+        concurrency: 标签页数，None=从配置 browser.tab_concurrency 读取
+        ready_timeout: 单篇等待正文就绪的超时秒数，None=从配置 browser.ready_timeout 读取
+        browser: 已启动的 nodriver 浏览器，None=自动启动并在结束时关闭
+        rate_limiter: 未配置共享令牌桶时各标签页加载前排队的限速器，None=按 rate_limit 配置创建
+    """
+    settings = load_settings(Path("config"))
+    browser_cfg = settings.get("browser", {})
+    # 每个标签页加载前从本机共享令牌桶取令牌，与 HTTP 抓取共用预算
+    bucket = SharedTokenBucket.from_settings(settings)
+    # 没有令牌桶时按 rate_limit 的间隔排队，多个标签页不会连续无间隔地加载文章页
+    if bucket is None and rate_limiter is None:
+        rate_limiter = AsyncRateLimiter.from_settings(settings)
+    concurrency = max(1, min(concurrency or browser_cfg.get("tab_concurrency", 3), len(post_ids) or 1))
+    ready_timeout = ready_timeout or browser_cfg.get("ready_timeout", 15)
+    
+    own_browser = browser is None
+    if own_browser:
+        browser = await uc.start()
+    
+    queue: asyncio.Queue = asyncio.Queue()
+    for post_id in post_ids:
+        queue.put_nowait(post_id)
+    results: asyncio.Queue = asyncio.Queue()
+    
+    async def worker():
+        tab = await browser.get("about:blank", new_tab=True)
+        try:
+            while not queue.empty():
+                post_id = queue.get_nowait()
+                text = ""
                 try:
-                    text = json.loads(f'"{text}"')
-                except:
-                    pass
-                text = _clean_html(text)
-                if len(text) > 100:
-                    results[post_id] = text
+                    if bucket is not None:
+                        await bucket.acquire_async()
+                    else:
+                        await rate_limiter.acquire(family="browser.post")
+                    with span("browser.full_content"):
+                        await tab.get(POST_URL.format(user_id=user_id, post_id=post_id))
+                        text = await _wait_for_content(tab, ready_timeout)
+                except Exception as e:
+                    print(f"  [!] 获取全文失败 {post_id}: {e}")
+                await results.put((post_id, text))
+        finally:
+            await tab.close()
+    
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        for _ in range(len(post_ids)):
+            getter = asyncio.ensure_future(results.get())
+            # 所有标签页异常退出时不再等待剩余结果
+            done, _ = await asyncio.wait([getter, *workers], return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                if all(w.done() for w in workers) and results.empty():
+                    getter.cancel()
+                    for w in workers:
+                        w.result()
+                    break
+                await getter
+            yield getter.result()
     finally:
-        browser.stop()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if own_browser:
+            browser.stop()
+
+
+async def _wait_for_content(tab, timeout: float, interval: float = 0.25) -> str:
+    """轮询页面直到正文就绪，返回清洗后的正文，超时返回空字符串"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        text = _extract_text(await tab.get_content())
+        if text is None:
+            html = await tab.evaluate(_DOM_TEXT_JS, return_by_value=True)
+            if isinstance(html, str) and html:
+                text = clean_html(html)
+        if text is not None:
+            return text if len(text) > 100 else ""
+        if loop.time() >= deadline:
+            return ""
+        await asyncio.sleep(interval)
+
+
+def _extract_text(html: str) -> str | None:
+    """从页面内嵌 JSON 提取正文 text 字段，未就绪返回 None"""
+    match = re.search(r'"text":"(.*?)"(?:,\s*"|\})', html or "")
+    if not match:
+        return None
+    text = match.group(1)
+    try:
+        text = json.loads(f'"{text}"')
+    except ValueError:
+        pass
+    return clean_html(text)
+
+
+async def get_posts_full_content_async(
+    user_id: str,
+    post_ids: list[str],
+    on_result: Callable[[str, str], None] = None,
+    concurrency: int = None,
+) -> dict[str, str]:
+    """使用 nodriver 批量获取文章全文（绕过 WAF）
     
+    Args:
+        on_result: 每篇完成时回调 (post_id, text)，text 为空表示获取失败
+    """
+    results = {}
+    async for post_id, text in iter_posts_full_content(user_id, post_ids, concurrency):
+        if text:
+            results[post_id] = text
+        if on_result:
+            on_result(post_id, text)
     return results
 
 
@@ -43,21 +161,14 @@ def get_post_full_content(user_id: str, post_id: str) -> str:
     return results.get(post_id, "")
 
 
-def get_posts_full_content(user_id: str, post_ids: list[str]) -> dict[str, str]:
+def get_posts_full_content(
+    user_id: str,
+    post_ids: list[str],
+    on_result: Callable[[str, str], None] = None,
+    concurrency: int = None,
+) -> dict[str, str]:
     """同步版本：批量获取文章全文"""
-    return asyncio.run(get_posts_full_content_async(user_id, post_ids))
-
-
-def _clean_html(html: str) -> str:
-    """清理 HTML"""
-    if not html:
-        return ""
-    text = re.sub(r"<br\s*/?>", "\n", html)
-    text = re.sub(r"</p>", "\n\n", text)
-    text = re.sub(r"<[^>]+>", "", text)
-    text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">")
-    text = text.replace("&amp;", "&").replace("&quot;", '"')
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
+    return asyncio.run(get_posts_full_content_async(user_id, post_ids, on_result, concurrency))
 
 
 if __name__ == "__main__":
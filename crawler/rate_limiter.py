@@ -0,0 +1,299 @@
+"""限速器：异步请求排队 + 按接口族的 AIMD 自适应间隔"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+from .token_bucket import SharedTokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 当前请求所属的调度键（批量抓取时为用户），用于在多用户间公平轮转
+crawl_key: contextvars.ContextVar = contextvars.ContextVar("crawl_key", default=None)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回需等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class _Family:
+    """单个接口族的限速状态"""
+    
+    __slots__ = ("rate", "next_slot", "blocked_until")
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.next_slot = 0.0
+        self.blocked_until = 0.0
+
+
+class AdaptiveRateLimit:
+    """按接口族（endpoint_family）的 AIMD 自适应限速，同步与异步客户端共用
+    
+    每个接口族维护一个请求速率：干净的 2xx 响应后加性提高 increase（次/秒），
+    遇到 429、5xx、WAF 拦截页或登录跳转时乘以 decrease 降速；响应带 Retry-After 时
+    该接口族在指定时间内暂停。实际间隔在 1/速率 附近按 min_interval/max_interval 的比例抖动，
+    保持原来随机间隔的请求节奏。学到的速率写入 state 文件，下次运行从该速率开始。
+    """
+    
+    # 每累计这么多次成功保存一次状态；降速时立即保存
+    SAVE_EVERY = 20
+    
+    def __init__(
+        self,
+        min_interval: float = 1.0,
+        max_interval: float = 2.0,
+        floor: float = 0.3,
+        ceiling: float = 30.0,
+        increase: float = 0.02,
+        decrease: float = 0.5,
+        state_path: str | Path = None,
+    ):
+        """
+        Args:
+            min_interval, max_interval: 无历史状态时的初始间隔取两者中点，两者之比决定抖动幅度
+            floor: 间隔下限（秒），速率不会超过 1/floor
+            ceiling: 间隔上限（秒）
+            increase: 每次成功后速率增加的量（次/秒）
+            decrease: 被限流时速率乘以该系数（0~1）
+            state_path: 学到的速率持久化文件，None=不持久化
+        """
+        max_interval = max(max_interval, min_interval)
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.increase = increase
+        self.decrease = decrease
+        self.jitter = (max_interval - min_interval) / (max_interval + min_interval) if max_interval > 0 else 0.0
+        self.initial_rate = 1 / min(max((min_interval + max_interval) / 2, floor), self.ceiling)
+        self.state_path = Path(state_path) if state_path else None
+        self._families: dict[str, _Family] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self._load()
+    
+    @classmethod
+    def from_settings(cls, settings: dict) -> "AdaptiveRateLimit | None":
+        """按 settings.yaml 的 rate_limit 段创建，未启用 adaptive 时返回 None"""
+        rl = settings.get("rate_limit", {})
+        cfg = rl.get("adaptive", {})
+        if not cfg.get("enabled", False):
+            return None
+        return cls(
+            rl.get("min_interval", 1.0),
+            rl.get("max_interval", 2.0),
+            floor=cfg.get("floor", 0.3),
+            ceiling=cfg.get("ceiling", 30.0),
+            increase=cfg.get("increase", 0.02),
+            decrease=cfg.get("decrease", 0.5),
+            state_path=cfg.get("state"),
+        )
+    
+    def _family(self, family: str) -> _Family:
+        state = self._families.get(family)
+        if state is None:
+            state = self._families[family] = _Family(self.initial_rate)
+        return state
+    
+    def _clamp(self, rate: float) -> float:
+        return min(max(rate, 1 / self.ceiling), 1 / self.floor)
+    
+    def interval(self, family: str) -> float:
+        """当前的平均请求间隔（秒）"""
+        with self._lock:
+            return 1 / self._family(family).rate
+    
+    def reserve(self, family: str) -> float:
+        """为接口族预约下一个请求时间槽，返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._family(family)
+            slot = max(now, state.next_slot, state.blocked_until)
+            interval = 1 / state.rate
+            # 抖动后的间隔同样不低于 floor、不高于 ceiling
+            gap = random.uniform(interval * (1 - self.jitter), interval * (1 + self.jitter))
+            state.next_slot = slot + min(max(gap, self.floor), self.ceiling)
+        return slot - now
+    
+    def on_response(self, family: str, status: int, throttled: bool = False, retry_after: float = None):
+        """根据响应调整速率
+        
+        Args:
+            throttled: 响应虽非 429/5xx 但被判定为限流（WAF 拦截页、登录跳转）
+            retry_after: Retry-After 给出的暂停秒数
+        """
+        backoff = throttled or status == 429 or status >= 500
+        with self._lock:
+            state = self._family(family)
+            if retry_after:
+                state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+            if backoff:
+                old = state.rate
+                state.rate = self._clamp(state.rate * self.decrease)
+                logger.info(f"{family} 被限流（{status}），间隔 {1 / old:.2f}s -> {1 / state.rate:.2f}s")
+                self._unsaved = self.SAVE_EVERY
+            elif 200 <= status < 300:
+                state.rate = self._clamp(state.rate + self.increase)
+                self._unsaved += 1
+            save = self._unsaved >= self.SAVE_EVERY
+        if save:
+            self.save()
+    
+    def snapshot(self) -> dict[str, float]:
+        """各接口族的当前间隔（秒）"""
+        with self._lock:
+            return {family: 1 / state.rate for family, state in self._families.items()}
+    
+    def _load(self):
+        if not self.state_path or not self.state_path.exists():
+            return
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"读取限速状态失败，使用初始速率: {e}")
+            return
+        for family, entry in data.get("families", {}).items():
+            interval = entry.get("interval")
+            if interval:
+                self._families[family] = _Family(self._clamp(1 / interval))
+    
+    def save(self):
+        """写出学到的速率（先写临时文件再替换）"""
+        if not self.state_path:
+            return
+        with self._lock:
+            self._unsaved = 0
+            data = {
+                "updated_at": datetime.now().isoformat(),
+                "families": {family: {"interval": round(1 / state.rate, 4)} for family, state in self._families.items()},
+            }
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+
+class AsyncRateLimiter:
+    """按请求发起时间排队的限速器
+    
+    每次 acquire 预约下一个时间槽，槽与槽之间相隔 uniform(min_interval, max_interval)。
+    请求只在发起时排队，响应可以并发等待，因此吞吐由限速预算决定而不是由往返延迟决定。
+    
+    多个调度键（crawl_key）同时排队时按键轮转分配时间槽，
+    预取窗口大的用户不会挤占其他用户的预算。
+    
+    提供 adaptive 时时间槽按请求所属接口族的自适应间隔预约（见 AdaptiveRateLimit）；
+    提供 bucket 时轮到的请求还要从本机多进程共享的令牌桶取得令牌才发起。
+    """
+    
+    def __init__(
+        self,
+        min_interval: float = 1.0,
+        max_interval: float = 2.0,
+        adaptive: AdaptiveRateLimit = None,
+        bucket: SharedTokenBucket = None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.adaptive = adaptive
+        self.bucket = bucket
+        self._next_slot = 0.0
+        self._queues: dict = {}
+        self._order: deque = deque()
+        self._dispatcher: asyncio.Task | None = None
+    
+    @classmethod
+    def from_settings(cls, settings: dict) -> "AsyncRateLimiter":
+        rl = settings.get("rate_limit", {})
+        return cls(
+            rl.get("min_interval", 1.0),
+            rl.get("max_interval", 2.0),
+            AdaptiveRateLimit.from_settings(settings),
+            SharedTokenBucket.from_settings(settings),
+        )
+    
+    def _reserve(self, family: str = None) -> float:
+        """预约时间槽，返回需要等待的秒数"""
+        if self.adaptive is not None:
+            return self.adaptive.reserve(family or "")
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + random.uniform(self.min_interval, self.max_interval)
+        return slot - now
+    
+    async def acquire(self, key=None, family: str = None) -> float:
+        """等待轮到自己发起请求，返回实际等待秒数
+        
+        Args:
+            key: 调度键，None=使用上下文中的 crawl_key
+            family: 请求的接口族，启用自适应限速时按它预约时间槽
+        """
+        if key is None:
+            key = crawl_key.get()
+        
+        start = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        waiter.family = family
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._order.append(key)
+        self._queues[key].append(waiter)
+        
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        
+        await waiter
+        return time.monotonic() - start
+    
+    def _next_waiter(self) -> asyncio.Future | None:
+        """按键轮转取出下一个仍在等待的请求"""
+        while self._order:
+            key = self._order.popleft()
+            queue = self._queues[key]
+            while queue and queue[0].done():
+                queue.popleft()
+            if not queue:
+                del self._queues[key]
+                continue
+            waiter = queue.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._queues[key]
+            return waiter
+        return None
+    
+    async def _dispatch(self):
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            wait = self._reserve(waiter.family)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if waiter.done():
+                continue
+            # 在调度协程里取令牌，请求仍按轮转顺序发起
+            if self.bucket is not None:
+                await self.bucket.acquire_async()
+            if not waiter.done():
+                waiter.set_result(None)
@@ -0,0 +1,200 @@
+"""股票代码提取：基于本地代码/名称词典的 Aho-Corasick 多模式匹配
+
+词典为 CSV（config/symbols.csv）：code,name,aliases,cashtags，别名以 | 分隔。
+名称、别名和代码在一次扫描中全部匹配，统一归一为雪球代码（SH600519、00700、AAPL）。
+cashtags 列是日常用语中有歧义的简称（美的、苹果、伊利），只在 $美的$ 这样的雪球股票标签内识别，
+避免“很美的一天”“伊利诺伊州”被打上代码。
+词典之外的代码仍按 $名称(代码)$ 和 SH/SZ/HK 前缀格式识别；没有代码的 $名称$ 不在词典中时忽略。
+"""
+import csv
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable
+
+from .client import load_settings
+
+DEFAULT_DICTIONARY = Path("config") / "symbols.csv"
+
+# $名称(代码)$ 中的代码，以及正文中带交易所前缀的代码
+_CODE_RE = re.compile(
+    r"\$[^$()]+\(([A-Z0-9.]+)\)\$"
+    r"|(?<![A-Z0-9])((?:SH|SZ)\d{6}|HK\d{5})(?![A-Z0-9])"
+)
+# 不带代码的 $名称$ 标签
+_CASHTAG_RE = re.compile(r"\$([^$()\s]{1,20})\$")
+
+
+def _is_ascii_word(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+def normalize_code(code: str) -> str:
+    """归一为雪球代码：大写，港股去掉 HK 前缀"""
+    code = code.strip().upper()
+    if code.startswith("HK") and code[2:].isdigit():
+        return code[2:]
+    return code
+
+
+class _Automaton:
+    """Aho-Corasick 自动机，键为大写文本，值为规范代码"""
+    
+    def __init__(self, keywords: dict[str, str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, str, bool, bool]]] = [[]]
+        
+        for keyword, value in keywords.items():
+            state = 0
+            for ch in keyword:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            # 首尾为英文/数字的键需要词边界，避免 AAPL 命中 AAPLX
+            self._out[state].append((len(keyword), value, _is_ascii_word(keyword[0]), _is_ascii_word(keyword[-1])))
+        
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+    
+    def find_all(self, text: str) -> list[tuple[int, int, str]]:
+        """返回所有命中 (start, end, value)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        size = len(text)
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            for length, value, left_word, right_word in out[state]:
+                start = end - length
+                if left_word and start > 0 and _is_ascii_word(text[start - 1]):
+                    continue
+                if right_word and end < size and _is_ascii_word(text[end]):
+                    continue
+                matches.append((start, end, value))
+        return matches
+
+
+class SymbolExtractor:
+    """股票代码提取器"""
+    
+    def __init__(self, entries: dict[str, list[str]] = None, cashtags: dict[str, list[str]] = None):
+        """
+        Args:
+            entries: {代码: [名称, 别名...]}，在正文中直接匹配
+            cashtags: {代码: [简称...]}，有歧义的简称，只在 $简称$ 标签内匹配
+        """
+        self._cashtags = {
+            name.strip().upper(): normalize_code(code)
+            for code, names in (cashtags or {}).items() for name in names if name.strip()
+        }
+        keywords = {}
+        self.names: dict[str, str] = {}
+        for code, names in (entries or {}).items():
+            code = normalize_code(code)
+            keys = [code, *names]
+            if code.isdigit() and len(code) == 5:
+                keys.append("HK" + code)
+            if names:
+                self.names[code] = names[0]
+            for key in keys:
+                key = key.strip().upper()
+                if key:
+                    keywords[key] = code
+        self._automaton = _Automaton(keywords)
+    
+    @classmethod
+    def from_csv(cls, path: str | Path) -> "SymbolExtractor":
+        """从 CSV 词典加载，文件不存在时返回空词典的提取器"""
+        path = Path(path)
+        entries = {}
+        cashtags = {}
+        if path.exists():
+            with open(path, encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    code = (row.get("code") or "").strip()
+                    if not code:
+                        continue
+                    names = [row.get("name") or ""]
+                    names += (row.get("aliases") or "").split("|")
+                    entries[code] = [n.strip() for n in names if n and n.strip()]
+                    cashtags[code] = [n.strip() for n in (row.get("cashtags") or "").split("|") if n.strip()]
+        return cls(entries, cashtags)
+    
+    def extract(self, text: str) -> list[str]:
+        """提取文本中的股票代码，返回排序后的规范代码列表"""
+        if not text:
+            return []
+        upper = text.upper()
+        matches = self._automaton.find_all(upper)
+        if "$" in upper or "SH" in upper or "SZ" in upper or "HK" in upper:
+            for match in _CODE_RE.finditer(upper):
+                group = 1 if match.group(1) else 2
+                matches.append((match.start(group), match.end(group), normalize_code(match.group(group))))
+            if self._cashtags and "$" in upper:
+                for match in _CASHTAG_RE.finditer(upper):
+                    code = self._cashtags.get(match.group(1))
+                    if code:
+                        matches.append((match.start(1), match.end(1), code))
+        
+        # 重叠命中取最左最长，如“中国平安银行”只算中国平安
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        symbols = set()
+        covered = 0
+        for start, end, code in matches:
+            if start >= covered:
+                symbols.add(code)
+                covered = end
+        return sorted(symbols)
+    
+    def extract_batch(self, texts: Iterable[str], workers: int = 1, chunksize: int = 256) -> list[list[str]]:
+        """批量提取，workers > 1 时使用多进程"""
+        if workers <= 1:
+            return [self.extract(text) for text in texts]
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self,)) as executor:
+            return list(executor.map(_extract_in_worker, texts, chunksize=chunksize))
+
+
+_worker_extractor: SymbolExtractor = None
+
+
+def _init_worker(extractor: SymbolExtractor):
+    global _worker_extractor
+    _worker_extractor = extractor
+
+
+def _extract_in_worker(text: str) -> list[str]:
+    return _worker_extractor.extract(text)
+
+
+@lru_cache(maxsize=None)
+def default_extractor() -> SymbolExtractor:
+    """按 settings.yaml 的 symbols.dictionary 加载的共享提取器"""
+    settings = load_settings(Path("config"))
+    path = settings.get("symbols", {}).get("dictionary", DEFAULT_DICTIONARY)
+    return SymbolExtractor.from_csv(path)
+
+
+def extract_symbols(text: str) -> list[str]:
+    """使用默认词典提取股票代码"""
+    return default_extractor().extract(text)
@@ -1,15 +1,27 @@
 """抓取任务入口"""
+import asyncio
 import json
 import logging
+import os
 import re
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Callable
 
+from common.profiling import span
+from storage.post_index import PostIndex, content_hash
+from storage.search_index import SearchIndex
+from storage.segment_store import SegmentStore
+
+from .async_client import AsyncXueqiuClient
 from .browser import XueqiuBrowser
+from .browser_service import BrowserServiceClient
 from .client import CookiesExpiredError, XueqiuClient
+from .rate_limiter import crawl_key
+from .symbols import extract_symbols
 from .nodriver_browser import get_posts_full_content as nodriver_batch_get
-from .user_api import get_user_profile, iter_user_posts
+from .user_api import aget_user_profile, aiter_user_posts, get_user_profile, iter_user_posts
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +31,20 @@ def crawl_user_to_markdown(
     out_root: str = "./data",
     on_progress: Callable[[int, dict], None] = None,
     mode: str = None,
+    resume: bool = False,
+    backend: str = None,
 ) -> dict:
-    """将用户文章保存为 Markdown
+    """将用户文章保存为 Markdown（或分段存储）
+    
+    每处理完一页即把分页游标写入 crawl_state.json，中断后可从该页继续。
     
     Args:
         mode: 抓取模式，None=从配置读取，column=专栏，timeline=全部
+        resume: 从上次中断的页继续，而不是从第 1 页重新遍历
+        backend: 存储后端，None=从配置 storage.backend 读取，markdown=每篇一个文件，segments=分段压缩存储
     """
     out_root = Path(out_root)
-    stats = {"new_count": 0, "skip_count": 0, "error_count": 0}
+    stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
     
     profile = get_user_profile(nickname_or_id)
     user_id = profile["id"]
@@ -36,54 +54,252 @@ def crawl_user_to_markdown(
     posts_dir = user_dir / "posts"
     posts_dir.mkdir(parents=True, exist_ok=True)
     
+    _save_profile(user_dir, profile)
+    
+    client = XueqiuClient()
+    settings = client.settings
+    if mode is None:
+        mode = settings.get("crawl", {}).get("mode", "column")
+    
     state = _read_state(user_dir)
-    last_id = state.get("last_crawled_post_id")
+    start_page, stop_id = _begin_run(state, mode, resume)
+    store = _open_store(user_dir, settings, backend)
+    
+    try:
+        with PostIndex(user_dir) as index, SearchIndex(out_root) as search:
+            posts = iter_user_posts(
+                user_id, mode=mode, start_page=start_page,
+                on_page=lambda page: _record_page(user_dir, state, page),
+            )
+            for post in posts:
+                if stop_id and int(post["id"]) <= int(stop_id):
+                    logger.info("到达已抓取位置，停止")
+                    break
+                _write_post(post, posts_dir, index, state, stats, on_progress, search, store)
+    
+    except CookiesExpiredError:
+        logger.error("Cookies 已失效，保存当前进度")
+        _save_state(user_dir, state)
+        raise
+    except BaseException:
+        _save_state(user_dir, state)
+        raise
+    finally:
+        if store:
+            store.close()
+        client.save_state()
+    
+    _finish_run(user_dir, state)
+    return stats
+
+
+async def crawl_user_to_markdown_async(
+    nickname_or_id: str | int,
+    out_root: str = "./data",
+    on_progress: Callable[[int, dict], None] = None,
+    mode: str = None,
+    client: AsyncXueqiuClient = None,
+    concurrency: int = None,
+    resume: bool = False,
+    backend: str = None,
+) -> dict:
+    """crawl_user_to_markdown 的异步版本，时间线分页并发预取
+    
+    Args:
+        client: 共享的 AsyncXueqiuClient，None=自动创建并在结束时关闭
+        concurrency: 同时在途的页数，None=从配置 crawl.concurrency 读取
+        resume: 从上次中断的页继续
+        backend: 存储后端，None=从配置 storage.backend 读取
+    """
+    if client is None:
+        async with AsyncXueqiuClient() as client:
+            return await crawl_user_to_markdown_async(
+                nickname_or_id, out_root, on_progress, mode, client, concurrency, resume, backend
+            )
+    
+    out_root = Path(out_root)
+    stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
+    
+    profile = await aget_user_profile(client, nickname_or_id)
+    user_id = profile["id"]
+    nickname = profile["nickname"]
+    
+    user_dir = out_root / _safe_filename(nickname)
+    posts_dir = user_dir / "posts"
+    posts_dir.mkdir(parents=True, exist_ok=True)
+    
     _save_profile(user_dir, profile)
     
     if mode is None:
-        client = XueqiuClient()
         mode = client.settings.get("crawl", {}).get("mode", "column")
     
+    state = _read_state(user_dir)
+    start_page, stop_id = _begin_run(state, mode, resume)
+    
+    posts = aiter_user_posts(
+        client, user_id, mode=mode, concurrency=concurrency, start_page=start_page,
+        on_page=lambda page: _record_page(user_dir, state, page),
+    )
+    index = PostIndex(user_dir)
+    search = SearchIndex(out_root)
+    store = _open_store(user_dir, client.settings, backend)
     try:
-        for post in iter_user_posts(user_id, mode=mode):
-            post_id = post["id"]
-            
-            if last_id and post_id <= last_id:
+        async for post in posts:
+            if stop_id and int(post["id"]) <= int(stop_id):
                 logger.info("到达已抓取位置，停止")
                 break
-            
-            try:
-                filename = _make_filename(post)
-                filepath = posts_dir / filename
-                
-                if filepath.exists():
-                    stats["skip_count"] += 1
-                    continue
-                
-                md_content = _render_markdown(post)
-                filepath.write_text(md_content, encoding="utf-8")
-                stats["new_count"] += 1
-                
-                if stats["new_count"] == 1:
-                    state["last_crawled_post_id"] = post_id
-                
-                if on_progress:
-                    on_progress(stats["new_count"], post)
-                    
-            except Exception as e:
-                logger.error(f"处理文章 {post_id} 失败: {e}")
-                stats["error_count"] += 1
-                
+            _write_post(post, posts_dir, index, state, stats, on_progress, search, store)
     except CookiesExpiredError:
         logger.error("Cookies 已失效，保存当前进度")
         _save_state(user_dir, state)
         raise
+    except BaseException:
+        _save_state(user_dir, state)
+        raise
+    finally:
+        # 提前退出时取消仍在途的预取请求
+        await posts.aclose()
+        index.close()
+        search.close()
+        if store:
+            store.close()
     
-    state["last_crawled_at"] = datetime.now().isoformat()
-    _save_state(user_dir, state)
+    _finish_run(user_dir, state)
     return stats
 
 
+async def crawl_users_batch(
+    users: list[str | int],
+    out_root: str = "./data",
+    on_progress: Callable[[str, int, dict], None] = None,
+    mode: str = None,
+    max_users: int = None,
+    concurrency: int = None,
+    client: AsyncXueqiuClient = None,
+    resume: bool = False,
+    backend: str = None,
+) -> dict[str, dict]:
+    """在同一进程内并发抓取多个用户，共享一个限速预算
+    
+    所有用户共用一个 AsyncXueqiuClient 及其限速器，限速器按用户轮转分配请求时间槽，
+    大账号的预取窗口不会饿死其他用户。
+    
+    Args:
+        max_users: 同时抓取的用户数，None=从配置 batch.max_users 读取
+        concurrency: 每个用户同时在途的页数
+        client: 共享的 AsyncXueqiuClient，None=自动创建并在结束时关闭
+        resume: 各用户从上次中断的页继续
+        backend: 存储后端，None=从配置 storage.backend 读取
+    
+    Returns:
+        {用户: stats}，stats 额外包含 elapsed 和 error 字段
+    """
+    if client is None:
+        async with AsyncXueqiuClient() as client:
+            return await crawl_users_batch(
+                users, out_root, on_progress, mode, max_users, concurrency, client, resume, backend
+            )
+    
+    results = {}
+    max_users = max_users or client.settings.get("batch", {}).get("max_users", 4)
+    semaphore = asyncio.Semaphore(max_users)
+    cookies_expired = asyncio.Event()
+    
+    async def crawl_one(user):
+        key = str(user)
+        async with semaphore:
+            if cookies_expired.is_set():
+                results[key] = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0,
+                                "elapsed": 0.0, "error": "跳过: Cookies 已失效"}
+                return
+            
+            crawl_key.set(key)
+            progress = (lambda count, post: on_progress(key, count, post)) if on_progress else None
+            start = time.monotonic()
+            try:
+                stats = await crawl_user_to_markdown_async(
+                    user, out_root, progress, mode, client, concurrency, resume, backend
+                )
+                stats["error"] = None
+            except CookiesExpiredError as e:
+                cookies_expired.set()
+                stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0, "error": str(e)}
+            except Exception as e:
+                logger.error(f"抓取用户 {key} 失败: {e}")
+                stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0, "error": str(e)}
+            stats["elapsed"] = time.monotonic() - start
+            results[key] = stats
+    
+    await asyncio.gather(*(crawl_one(user) for user in users))
+    return {str(user): results[str(user)] for user in users}
+
+
+def load_users_file(path: str | Path) -> list[str]:
+    """读取用户列表文件，每行一个用户 ID 或昵称，# 开头为注释"""
+    users = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line and line not in users:
+            users.append(line)
+    return users
+
+
+def _write_post(
+    post: dict,
+    posts_dir: Path,
+    index: PostIndex,
+    state: dict,
+    stats: dict,
+    on_progress: Callable[[int, dict], None] = None,
+    search: SearchIndex = None,
+    store: SegmentStore = None,
+):
+    """写入单篇文章并更新索引（含全文检索索引）与统计，索引中已存在且内容未变则跳过
+    
+    store 不为空时追加到分段存储，不写 .md 文件；索引中的文件名仍为导出时的 Markdown 文件名。
+    """
+    post_id = post["id"]
+    try:
+        existing = index.get(post_id)
+        hash_ = content_hash(post)
+        if existing and existing["content_hash"] == hash_:
+            stats["skip_count"] += 1
+            return
+        
+        filename = _make_filename(post)
+        if store is not None:
+            with span("crawl.write"):
+                store.put(post, filename)
+        else:
+            with span("crawl.render"):
+                text = _render_markdown(post)
+            with span("crawl.write") as s:
+                if s:
+                    s.add_bytes(len(text.encode("utf-8")))
+                (posts_dir / filename).write_text(text, encoding="utf-8")
+        
+        # 标题修改会改变文件名，删除旧文件避免重复
+        if existing and existing["filename"] != filename:
+            (posts_dir / existing["filename"]).unlink(missing_ok=True)
+        with span("crawl.index"):
+            index.upsert(post, filename, hash_)
+            if search is not None:
+                search.upsert(posts_dir.parent.name, post, filename)
+        
+        if existing:
+            stats["update_count"] += 1
+            return
+        stats["new_count"] += 1
+        _record_post(state, post_id)
+        
+        if on_progress:
+            on_progress(stats["new_count"], post)
+            
+    except Exception as e:
+        logger.error(f"处理文章 {post_id} 失败: {e}")
+        stats["error_count"] += 1
+
+
 def _safe_filename(name: str) -> str:
     name = re.sub(r'[<>:"/\\|?*]', "", name)
     return name.strip(". ") or "unnamed"
@@ -146,6 +362,13 @@ def _render_markdown(post: dict) -> str:
 
 
 def _read_state(user_dir: Path) -> dict:
+    """读取抓取状态
+    
+    - last_crawled_post_id: 已完整抓取到的最新文章，只在一次抓取正常结束时推进
+    - cursor: 进行中的抓取，page=下一页，stop_id=遇到即停止的位置，
+      newest_id / oldest_id=本次已写入文章的 ID 范围；中断后保留，供 --resume 续抓
+    - paused_cursors: 被其他模式的抓取打断的游标（按模式），再次以该模式抓取时取回
+    """
     state_file = user_dir / "crawl_state.json"
     if state_file.exists():
         return json.loads(state_file.read_text(encoding="utf-8"))
@@ -153,8 +376,100 @@ def _read_state(user_dir: Path) -> dict:
 
 
 def _save_state(user_dir: Path, state: dict):
+    """先写临时文件再原子替换，中途崩溃不会留下半截的状态文件"""
     state_file = user_dir / "crawl_state.json"
-    state_file.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_file = state_file.with_name(state_file.name + ".tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, state_file)
+
+
+def _begin_run(state: dict, mode: str, resume: bool = False) -> tuple[int, int | None]:
+    """开始一次抓取，返回 (起始页, 停止位置)
+    
+    resume 时从上次中断页的前一页继续（多抓一页抵消其间删帖造成的分页前移），
+    停止位置沿用中断那次的，新写入的 ID 范围累加。
+    """
+    paused = state.pop("paused_cursors", {})
+    cursor = state.get("cursor")
+    if cursor and cursor.get("mode") != mode:
+        # 其他模式中断的游标暂存起来，不被本次抓取覆盖，之后仍可用该模式 --resume 续抓
+        if cursor.get("page", 1) > 1:
+            logger.warning(f"上次 {cursor['mode']} 抓取在第 {cursor['page']} 页中断，游标已保留")
+            paused[cursor["mode"]] = cursor
+        cursor = None
+    cursor = cursor or paused.pop(mode, None)
+    if paused:
+        state["paused_cursors"] = paused
+    
+    if resume and cursor:
+        state["cursor"] = cursor
+        start_page = max(1, cursor.get("page", 1) - 1)
+        logger.info(f"从第 {start_page} 页继续上次中断的抓取")
+        return start_page, cursor.get("stop_id")
+    
+    if cursor and cursor.get("page", 1) > 1:
+        logger.warning(f"上次抓取在第 {cursor['page']} 页中断，可使用 --resume 继续")
+    stop_id = state.get("last_crawled_post_id")
+    state["cursor"] = {"mode": mode, "page": 1, "stop_id": stop_id, "newest_id": None, "oldest_id": None}
+    return 1, stop_id
+
+
+def _record_post(state: dict, post_id):
+    """记录本次抓取写入的文章 ID 范围"""
+    cursor = state.setdefault("cursor", {})
+    post_id = int(post_id)
+    if post_id > int(cursor.get("newest_id") or 0):
+        cursor["newest_id"] = post_id
+    if not cursor.get("oldest_id") or post_id < int(cursor["oldest_id"]):
+        cursor["oldest_id"] = post_id
+
+
+def _record_page(user_dir: Path, state: dict, page: int):
+    """一页处理完毕，推进分页游标并落盘"""
+    cursor = state.setdefault("cursor", {})
+    cursor["page"] = page + 1
+    cursor["updated_at"] = datetime.now().isoformat()
+    _save_state(user_dir, state)
+
+
+def _finish_run(user_dir: Path, state: dict):
+    """抓取正常结束：推进已完成位置并清除游标"""
+    cursor = state.pop("cursor", None) or {}
+    newest = cursor.get("newest_id")
+    if newest and int(newest) > int(state.get("last_crawled_post_id") or 0):
+        state["last_crawled_post_id"] = newest
+    state["last_crawled_at"] = datetime.now().isoformat()
+    _save_state(user_dir, state)
+
+
+def _open_store(user_dir: Path, settings: dict, backend: str = None) -> SegmentStore | None:
+    """按存储后端打开分段存储，markdown 后端返回 None
+    
+    Args:
+        backend: markdown / segments，None=从配置 storage.backend 读取
+    """
+    backend = backend or settings.get("storage", {}).get("backend", "markdown")
+    if backend == "markdown":
+        return None
+    if backend != "segments":
+        raise ValueError(f"未知的存储后端: {backend}")
+    return SegmentStore.from_settings(user_dir, settings)
+
+
+def export_markdown(user_dir: Path, out_dir: Path = None) -> int:
+    """将分段存储导出为每篇一个 .md 的布局（默认导出到用户的 posts 目录），返回文章数"""
+    user_dir = Path(user_dir)
+    out_dir = Path(out_dir) if out_dir else user_dir / "posts"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with SegmentStore(user_dir) as store:
+        for filename, post in store.iter_records():
+            (out_dir / filename).write_text(_render_markdown(post), encoding="utf-8")
+            count += 1
+    return count
 
 
 def _save_profile(user_dir: Path, profile: dict):
@@ -166,10 +481,17 @@ def crawl_user_column_browser(
     nickname_or_id: str | int,
     out_root: str = "./data",
     on_progress: Callable[[int, dict], None] = None,
+    use_service: bool = True,
+    backend: str = None,
 ) -> dict:
-    """使用浏览器抓取用户专栏（绕过 WAF）"""
+    """使用浏览器抓取用户专栏（绕过 WAF）
+    
+    Args:
+        use_service: 常驻浏览器服务（scripts/browser_service.py）在运行时交由其执行
+        backend: 存储后端，None=从配置 storage.backend 读取
+    """
     out_root = Path(out_root)
-    stats = {"new_count": 0, "skip_count": 0, "error_count": 0}
+    stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
     
     profile = get_user_profile(nickname_or_id)
     user_id = str(profile["id"])
@@ -180,54 +502,66 @@ def crawl_user_column_browser(
     posts_dir.mkdir(parents=True, exist_ok=True)
     
     state = _read_state(user_dir)
-    last_id = state.get("last_crawled_post_id")
+    # 专栏列表由浏览器翻页，没有分页游标；停止位置只在正常结束后推进
+    _, last_id = _begin_run(state, "browser")
     _save_profile(user_dir, profile)
     
-    with XueqiuBrowser(headless=False) as browser:
-        # 先收集文章列表（会访问专栏页面）
-        posts_to_fetch = []
-        for post in browser.iter_column_posts(user_id):
+    index = PostIndex(user_dir)
+    search = SearchIndex(out_root)
+    client = XueqiuClient()
+    store = _open_store(user_dir, client.settings, backend)
+    
+    def collect(column_posts) -> dict:
+        """收集需要获取全文的文章（会访问专栏页面）"""
+        posts_to_fetch = {}
+        for post in column_posts:
             post_id = post["id"]
             
             if last_id and int(post_id) <= int(last_id):
                 logger.info("到达已抓取位置，停止")
                 break
             
-            filename = _make_filename(post)
-            filepath = posts_dir / filename
-            
-            if filepath.exists():
+            existing = index.get(post_id)
+            if existing and existing["title"] == (post.get("title") or None):
                 stats["skip_count"] += 1
                 continue
             
-            posts_to_fetch.append((post, filepath))
-        
-    # 使用 nodriver 批量获取全文（绕过 WAF 滑动验证）
-    if posts_to_fetch:
-        post_ids = [post["id"] for post, _ in posts_to_fetch]
-        logger.info(f"使用 nodriver 获取 {len(post_ids)} 篇文章全文...")
-        full_contents = nodriver_batch_get(user_id, post_ids)
-        
-        for post, filepath in posts_to_fetch:
-            post_id = post["id"]
-            try:
-                if post_id in full_contents:
-                    post["content_text"] = full_contents[post_id]
-                
-                md_content = _render_markdown(post)
-                filepath.write_text(md_content, encoding="utf-8")
-                stats["new_count"] += 1
-                
-                if stats["new_count"] == 1:
-                    state["last_crawled_post_id"] = post_id
-                
-                if on_progress:
-                    on_progress(stats["new_count"], post)
-                    
-            except Exception as e:
-                logger.error(f"处理文章 {post_id} 失败: {e}")
-                stats["error_count"] += 1
+            posts_to_fetch[post_id] = post
+        return posts_to_fetch
     
-    state["last_crawled_at"] = datetime.now().isoformat()
-    _save_state(user_dir, state)
+    def on_result(post_id: str, text: str):
+        post = posts_to_fetch[post_id]
+        if text:
+            post["content_text"] = text
+        post["symbols"] = extract_symbols(f"{post.get('title') or ''}\n{post.get('content_text', '')}")
+        _write_post(post, posts_dir, index, state, stats, on_progress, search, store)
+    
+    try:
+        # 常驻浏览器服务在运行时复用其已预热的会话，省去启动浏览器和重新验证
+        service = BrowserServiceClient.connect_if_running() if use_service else None
+        if service:
+            logger.info("使用常驻浏览器服务")
+            posts_to_fetch = collect(service.iter_column_posts(user_id))
+            if posts_to_fetch:
+                logger.info(f"获取 {len(posts_to_fetch)} 篇文章全文...")
+                service.get_posts_full_content(user_id, list(posts_to_fetch), on_result=on_result)
+        else:
+            with XueqiuBrowser(headless=False) as browser:
+                posts_to_fetch = collect(browser.iter_column_posts(user_id))
+            
+            # 使用 nodriver 标签页池并发获取全文（绕过 WAF 滑动验证），每篇完成即落盘
+            if posts_to_fetch:
+                logger.info(f"使用 nodriver 获取 {len(posts_to_fetch)} 篇文章全文...")
+                nodriver_batch_get(user_id, list(posts_to_fetch), on_result=on_result)
+    except BaseException:
+        _save_state(user_dir, state)
+        raise
+    finally:
+        index.close()
+        search.close()
+        if store:
+            store.close()
+        client.save_state()
+    
+    _finish_run(user_dir, state)
     return stats
@@ -0,0 +1,135 @@
+"""本机多进程共享的令牌桶
+
+桶状态保存在一个 JSON 文件中，取令牌时用文件锁（POSIX flock / Windows msvcrt）保护读-改-写，
+不依赖外部服务。cron 重叠或并行运行的多个 crawl_user.py、浏览器爬虫从同一个桶取令牌，
+合计请求速率不超过 rate。状态文件同时记录每个进程消耗的令牌数和等待时间，
+scripts/token_bucket.py 可查看。
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from common.filelock import file_lock
+
+# 超过这么久没有取过令牌的进程从统计中移除
+STATS_TTL = 7 * 24 * 3600
+
+# 区分 PID 复用的不同进程；同一进程内的多个桶实例（HTTP 客户端、浏览器）合并统计
+_PROCESS_STARTED_AT = time.time()
+
+
+class SharedTokenBucket:
+    """文件锁保护的令牌桶，每个令牌对应一次请求（或一次浏览器页面加载）"""
+    
+    def __init__(self, path: str | Path, rate: float = 1.0, burst: float = 2.0):
+        """
+        Args:
+            path: 状态文件，同一台机器上的进程指向同一个文件即共享预算
+            rate: 每秒补充的令牌数
+            burst: 桶容量，空闲后最多可连续发起的请求数
+        """
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.pid = os.getpid()
+    
+    @classmethod
+    def from_settings(cls, settings: dict) -> "SharedTokenBucket | None":
+        """按 settings.yaml 的 rate_limit.shared 段创建，未启用时返回 None"""
+        cfg = settings.get("rate_limit", {}).get("shared", {})
+        if not cfg.get("enabled", False):
+            return None
+        return cls(cfg.get("path", "cache/token_bucket.json"), cfg.get("rate", 1.0), cfg.get("burst", 2.0))
+    
+    def _locked(self):
+        return file_lock(self.lock_path)
+    
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            # 首次运行或文件损坏：从满桶开始
+            return {}
+    
+    def _write(self, state: dict):
+        tmp = self.path.with_name(f"{self.path.name}.{self.pid}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path)
+    
+    def try_acquire(self, waited: float = 0.0) -> float:
+        """尝试取一个令牌，成功返回 0，否则返回还需等待的秒数
+        
+        Args:
+            waited: 本次取令牌已等待的秒数，成功时计入本进程的统计
+        """
+        with self._locked():
+            state = self._read()
+            now = time.time()
+            last = state.get("updated_at", now)
+            # 时钟回拨时不补充也不扣减
+            tokens = min(self.burst, state.get("tokens", self.burst) + max(0.0, now - last) * self.rate)
+            if tokens < 1:
+                state.update(tokens=tokens, updated_at=now)
+                self._write(state)
+                return (1 - tokens) / self.rate
+            
+            processes = {
+                pid: entry for pid, entry in state.get("processes", {}).items()
+                if now - entry.get("last_seen", 0) < STATS_TTL
+            }
+            entry = processes.get(str(self.pid))
+            if entry is None or entry.get("started_at") != _PROCESS_STARTED_AT:
+                entry = processes[str(self.pid)] = {
+                    "command": " ".join(Path(arg).name if i == 0 else arg for i, arg in enumerate(sys.argv)),
+                    "started_at": _PROCESS_STARTED_AT,
+                    "tokens": 0,
+                    "wait_seconds": 0.0,
+                }
+            entry["tokens"] += 1
+            entry["wait_seconds"] = round(entry["wait_seconds"] + waited, 3)
+            entry["last_seen"] = now
+            state.update(tokens=tokens - 1, updated_at=now, rate=self.rate, burst=self.burst, processes=processes)
+            self._write(state)
+            return 0.0
+    
+    def acquire(self) -> float:
+        """阻塞直到取得令牌，返回等待秒数"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(waited)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+    
+    async def acquire_async(self) -> float:
+        """acquire 的协程版本，等待期间不阻塞事件循环"""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(waited)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+    
+    def stats(self) -> dict:
+        """桶的当前状态和每个进程的消耗（按 PID）"""
+        with self._locked():
+            state = self._read()
+        now = time.time()
+        tokens = state.get("tokens", self.burst) + max(0.0, now - state.get("updated_at", now)) * self.rate
+        return {
+            "rate": state.get("rate", self.rate),
+            "burst": state.get("burst", self.burst),
+            "tokens": min(self.burst, tokens),
+            "processes": state.get("processes", {}),
+        }
+    
+    def reset(self):
+        """清空统计并重新装满令牌"""
+        with self._locked():
+            self._write({})
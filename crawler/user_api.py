@@ -1,9 +1,11 @@
 """雪球用户 API 封装"""
-import re
+import asyncio
 from datetime import datetime
-from typing import Iterator
+from typing import AsyncIterator, Callable, Iterator
 
 from .client import XueqiuClient
+from .html_clean import clean_html
+from .symbols import extract_symbols
 
 
 class UserNotFoundError(Exception):
@@ -24,6 +26,25 @@ def get_user_profile(user_id_or_nick):
     else:
         user = _search_user_by_nick(client, user_id_or_nick)
     
+    return _parse_profile(user)
+
+
+async def aget_user_profile(client, user_id_or_nick):
+    """异步获取用户基本信息，client 为 AsyncXueqiuClient"""
+    if isinstance(user_id_or_nick, int) or str(user_id_or_nick).isdigit():
+        user_id = str(user_id_or_nick)
+        data = await client.get_json(f"/v4/user/profile/{user_id}")
+        if not data or "error_description" in data:
+            raise UserNotFoundError(f"用户不存在: {user_id_or_nick}")
+        user = data.get("user", data)
+    else:
+        data = await client.get_json("/query/v1/search/user.json", {"q": user_id_or_nick, "page": 1, "size": 10})
+        user = _match_user_by_nick(data, user_id_or_nick)
+    
+    return _parse_profile(user)
+
+
+def _parse_profile(user):
     return {
         "id": user.get("id"),
         "nickname": user.get("screen_name", ""),
@@ -36,6 +57,10 @@ def get_user_profile(user_id_or_nick):
 def _search_user_by_nick(client, nick):
     """通过昵称搜索用户，返回完整用户信息"""
     data = client.get_json("/query/v1/search/user.json", {"q": nick, "page": 1, "size": 10})
+    return _match_user_by_nick(data, nick)
+
+
+def _match_user_by_nick(data, nick):
     users = data.get("list", [])
     for user in users:
         if user.get("screen_name") == nick:
@@ -43,17 +68,25 @@ def _search_user_by_nick(client, nick):
     raise UserNotFoundError(f"找不到昵称为 '{nick}' 的用户")
 
 
-def iter_user_posts(user_id, max_pages=None, mode="column"):
+def iter_user_posts(
+    user_id,
+    max_pages=None,
+    mode="column",
+    start_page: int = 1,
+    on_page: Callable[[int], None] = None,
+):
     """迭代用户文章列表
     
     Args:
         user_id: 用户 ID
         max_pages: 最大页数限制
         mode: 抓取模式，column=仅专栏长文，timeline=全部动态
+        start_page: 起始页（断点续抓）
+        on_page: 一页的文章全部被取走后回调页码，用于记录分页断点
     """
     client = XueqiuClient()
     page_size = client.settings.get("crawl", {}).get("page_size", 20)
-    page = 1
+    page = start_page
     filter_long_only = (mode == "column")
     
     while True:
@@ -74,12 +107,92 @@ def iter_user_posts(user_id, max_pages=None, mode="column"):
                 if filter_long_only and post["type"] != "long_post":
                     continue
                 yield post
+        if on_page:
+            on_page(page)
         
         if len(statuses) < page_size:
             break
         page += 1
 
 
+async def aiter_user_posts(
+    client,
+    user_id,
+    max_pages=None,
+    mode="column",
+    concurrency=None,
+    start_page: int = 1,
+    on_page: Callable[[int], None] = None,
+) -> AsyncIterator[dict]:
+    """异步迭代用户文章列表，client 为 AsyncXueqiuClient
+    
+    首页返回后根据 maxPage 得知总页数，随后并发预取后续 concurrency 页，
+    按页序产出结果。请求发起仍受 client 的限速器约束。
+    
+    Args:
+        concurrency: 同时在途的页数，None=从配置 crawl.concurrency 读取
+        start_page: 起始页（断点续抓）
+        on_page: 一页的文章全部被取走后回调页码，用于记录分页断点
+    """
+    crawl_cfg = client.settings.get("crawl", {})
+    page_size = crawl_cfg.get("page_size", 20)
+    concurrency = max(1, concurrency or crawl_cfg.get("concurrency", 4))
+    filter_long_only = (mode == "column")
+    
+    async for page, statuses in _aiter_timeline_pages(client, user_id, page_size, max_pages, concurrency, start_page):
+        for status in statuses:
+            post = _parse_post(status)
+            if post:
+                if filter_long_only and post["type"] != "long_post":
+                    continue
+                yield post
+        if on_page:
+            on_page(page)
+
+
+async def _aiter_timeline_pages(client, user_id, page_size, max_pages, concurrency, start_page=1):
+    """从 start_page 起按页序产出 (page, statuses)，后续页以滑动窗口并发预取"""
+    async def fetch(page):
+        params = {"user_id": user_id, "page": page, "count": page_size}
+        return await client.get_json("/statuses/user_timeline.json", params)
+    
+    if max_pages and start_page > max_pages:
+        return
+    data = await fetch(start_page)
+    statuses = data.get("statuses", [])
+    if not statuses:
+        return
+    yield start_page, statuses
+    if len(statuses) < page_size:
+        return
+    
+    # maxPage 未知时按窗口投机预取，遇到空页或不满页即停止
+    last_page = data.get("maxPage") or None
+    if max_pages:
+        last_page = min(last_page or max_pages, max_pages)
+    
+    pending = {}
+    next_page = page = start_page + 1
+    try:
+        while last_page is None or page <= last_page:
+            while len(pending) < concurrency and (last_page is None or next_page <= last_page):
+                pending[next_page] = asyncio.ensure_future(fetch(next_page))
+                next_page += 1
+            
+            data = await pending.pop(page)
+            statuses = data.get("statuses", [])
+            if not statuses:
+                break
+            yield page, statuses
+            if len(statuses) < page_size:
+                break
+            page += 1
+    finally:
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+
+
 def _parse_post(status):
     """解析文章数据（兼容 timeline 和 column API）"""
     if not status:
@@ -96,10 +209,10 @@ def _parse_post(status):
         created_at = datetime.fromtimestamp(created_at / 1000).isoformat()
     
     text = status.get("text", "") or status.get("description", "")
-    content_text = _clean_html(text)
+    content_text = clean_html(text)
     title = status.get("title", "")
     is_long = status.get("mark", 0) >= 1 or bool(title)
-    symbols = _extract_symbols(text)
+    symbols = extract_symbols(f"{title}\n{content_text}")
     
     return {
         "id": post_id,
@@ -116,33 +229,3 @@ def _parse_post(status):
         "view_count": status.get("view_count", 0),
         "symbols": symbols,
     }
-
-
-def _clean_html(html):
-    """清洗 HTML，提取纯文本"""
-    if not html:
-        return ""
-    text = re.sub(r"<script[^>]*>.*?</script>", "", html, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r"<style[^>]*>.*?</style>", "", text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.IGNORECASE)
-    text = re.sub(r"</p>", "\n\n", text, flags=re.IGNORECASE)
-    text = re.sub(r"<[^>]+>", "", text)
-    text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">")
-    text = text.replace("&amp;", "&").replace('"', '"')
-    return re.sub(r"\n{3,}", "\n\n", text).strip()
-
-
-def _extract_symbols(text):
-    """提取股票代码"""
-    if not text:
-        return []
-    symbols = set()
-    for match in re.finditer(r"\$([^$]+)\(([A-Za-z0-9]+)\)\$", text):
-        symbols.add(match.group(2))
-    for match in re.finditer(r"\$([^$()]+)\$", text):
-        name = match.group(1).strip()
-        if name:
-            symbols.add(name)
-    for match in re.finditer(r"\b(SH|SZ|HK)\d{5,6}\b", text, re.IGNORECASE):
-        symbols.add(match.group(0).upper())
-    return sorted(symbols)
@@ -2,52 +2,165 @@
 """用户投资画像分析 CLI"""
 import argparse
 import sys
+import time
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from analysis.loader import load_user_posts, build_context
-from analysis.analyser import analyse_user
-from analysis.report_builder import save_report
+from analysis.analyser import load_config
+from analysis.context_builder import build_budgeted_context
+from analysis.dedup import duplicate_paths, find_duplicates, write_cluster_report
+from analysis.loader import iter_user_posts, load_user_posts, write_context
+from analysis.pipeline import analyse_posts
+from analysis.report_builder import ReportWriter, save_report
+from analysis.tokens import estimate_tokens
+from common import profiling
 
 
-def main():
-    parser = argparse.ArgumentParser(description="分析雪球用户投资画像")
-    parser.add_argument("nickname", help="用户昵称")
-    parser.add_argument("--data-dir", default="data", help="数据目录 (default: data)")
-    args = parser.parse_args()
+def print_progress(stage: str, done: int, total: int | None):
+    """打印分析进度，流式分块时总数未知"""
+    if stage == "map" and total is None:
+        print(f"      分块总结 {done}", end="\r", flush=True)
+    elif stage == "map":
+        print(f"      分块总结 {done}/{total}", end="\r" if done < total else "\n", flush=True)
+    elif stage == "reduce":
+        print("      汇总完成")
+
+
+class StreamProgress:
+    """统计流式输出的首 token 时间和生成速度"""
+    
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self.tokens = 0
+        self._last_print = 0.0
+    
+    def __call__(self, delta: str):
+        now = time.monotonic()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            print(f"      首 token: {now - self.started_at:.1f}s")
+        self.tokens += estimate_tokens(delta)
+        if now - self._last_print >= 1:
+            self._last_print = now
+            print(f"      已生成 ~{self.tokens} tokens, {self.rate():.1f} tok/s", end="\r", flush=True)
+    
+    def rate(self) -> float:
+        if self.first_token_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.first_token_at
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+
+def run(args):
+    tmp_dir = Path("tmp")
+    tmp_dir.mkdir(exist_ok=True)
+    context_file = tmp_dir / f"{args.nickname}_context.md"
+    context_tokens = None
+    data_dir = Path(args.data_dir)
+    analysis_cfg = load_config().get("analysis", {})
+    dedup_cfg = analysis_cfg.get("dedup", {})
+    dropped_paths = set()
+    
+    def stream_posts():
+        # 逐篇从磁盘读取，每一遍都重新读，不把全部文章留在内存
+        return (post for post in iter_user_posts(args.nickname, data_dir) if post.path not in dropped_paths)
     
     print(f"[1/4] 加载 {args.nickname} 的文章...")
     try:
-        posts = load_user_posts(args.nickname, Path(args.data_dir))
+        posts = load_user_posts(args.nickname, data_dir) if args.budget is not None else stream_posts
+        first_pass = posts if args.budget is not None else stream_posts()
     except FileNotFoundError as e:
         print(f"错误: {e}")
         sys.exit(1)
     
-    print(f"[2/4] 发现 {len(posts)} 篇文章，拼接上下文...")
-    context = build_context(posts)
+    if dedup_cfg.get("enabled", True) and not args.no_dedup:
+        clusters = find_duplicates(first_pass, dedup_cfg.get("max_distance", 3), dedup_cfg.get("min_length", 20))
+        dropped_paths.update(duplicate_paths(clusters))
+        if clusters:
+            clusters_file = tmp_dir / f"{args.nickname}_duplicates.md"
+            write_cluster_report(clusters, clusters_file)
+            print(f"      合并 {len(dropped_paths)} 篇近似重复文章（{len(clusters)} 簇）: {clusters_file}")
+        if args.budget is not None:
+            posts = [post for post in posts if post.path not in dropped_paths]
+        else:
+            first_pass = stream_posts()
     
-    # 保存中间上下文
-    tmp_dir = Path("tmp")
-    tmp_dir.mkdir(exist_ok=True)
-    context_file = tmp_dir / f"{args.nickname}_context.md"
-    context_file.write_text(context, encoding="utf-8")
+    if args.budget is not None:
+        print(f"[2/4] 发现 {len(posts)} 篇文章，拼接上下文...")
+        priority = analysis_cfg.get("priority", {})
+        budget = args.budget or analysis_cfg.get("single_call_tokens", 100000)
+        selection = build_budgeted_context(
+            posts, budget, priority.get("weights"), priority.get("half_life_days", 180)
+        )
+        print(f"      按优先级保留 {len(selection.selected)} 篇（约 {selection.tokens} tokens），"
+              f"丢弃 {len(selection.dropped)} 篇")
+        if selection.dropped:
+            dropped_file = tmp_dir / f"{args.nickname}_dropped.txt"
+            dropped_file.write_text("\n".join(post.path.name for post in selection.dropped), encoding="utf-8")
+            print(f"      丢弃列表: {dropped_file}")
+        posts = selection.selected
+        context_file.write_text(selection.context, encoding="utf-8")
+    else:
+        print("[2/4] 逐篇拼接上下文...")
+        count, context_tokens = write_context(first_pass, context_file)
+        print(f"      共 {count} 篇文章，约 {context_tokens} tokens")
     print(f"      上下文已保存: {context_file}")
     
     print(f"[3/4] 调用 OpenAI 分析中...")
+    options = {
+        "concurrency": args.concurrency,
+        "on_progress": print_progress,
+        "use_cache": not args.no_cache,
+        "context_file": context_file,
+        "context_tokens": context_tokens,
+    }
+    writer = None if args.no_stream else ReportWriter(args.nickname)
     try:
-        report_content = analyse_user(context)
+        if writer is None:
+            report_content = analyse_posts(posts, **options)
+            print("[4/4] 保存报告...")
+            report_path = save_report(args.nickname, report_content)
+        else:
+            progress = StreamProgress()
+            with writer:
+                def on_delta(delta: str):
+                    writer.write(delta)
+                    progress(delta)
+                
+                analyse_posts(posts, on_delta=on_delta, **options)
+            print(f"\n[4/4] 生成完成: ~{progress.tokens} tokens, {progress.rate():.1f} tok/s")
+            report_path = writer.path
     except ValueError as e:
         print(f"错误: {e}")
         sys.exit(1)
     except Exception as e:
         print(f"API 调用失败: {e}")
+        if writer is not None and writer.tmp_path.exists():
+            print(f"已生成的部分保存在: {writer.tmp_path}")
         sys.exit(1)
     
-    print("[4/4] 保存报告...")
-    report_path = save_report(args.nickname, report_content)
     print(f"完成! 报告已保存到: {report_path}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="分析雪球用户投资画像")
+    parser.add_argument("nickname", help="用户昵称")
+    parser.add_argument("--data-dir", default="data", help="数据目录 (default: data)")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 LLM 输出缓存")
+    parser.add_argument("--budget", type=int, nargs="?", const=0,
+                        help="按优先级挑选文章装入 token 预算后单次分析（不带值时使用 analysis.single_call_tokens）")
+    parser.add_argument("--no-dedup", action="store_true", help="不合并近似重复的文章")
+    parser.add_argument("--no-stream", action="store_true", help="等待完整结果后再写入报告")
+    parser.add_argument("-c", "--concurrency", type=int, help="同时进行的分块总结请求数 (default: 配置 analysis.concurrency)")
+    parser.add_argument("--profile", action="store_true", help="打印分阶段耗时（加载、去重、上下文、LLM 调用、写报告）")
+    parser.add_argument("--profile-out", help="写出剖析文件：.json 为 speedscope 时间线，其他扩展名为 cProfile 统计")
+    args = parser.parse_args()
+    
+    with profiling.session(args.profile, args.profile_out, f"analyse {args.nickname}"):
+        run(args)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""常驻浏览器服务 - 启动一次并保持 WAF 会话预热，crawl_user.py -b 会自动复用"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.browser_service import BrowserService, BrowserServiceClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动常驻浏览器服务")
+    parser.add_argument("--host", help="监听地址，默认读取 browser_service.host")
+    parser.add_argument("--port", type=int, help="监听端口，默认读取 browser_service.port")
+    parser.add_argument("--headless", action="store_true", help="无头模式（首次验证建议关闭）")
+    parser.add_argument("--status", action="store_true", help="查看服务状态后退出")
+    args = parser.parse_args()
+    
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        datefmt="%H:%M:%S",
+    )
+    
+    if args.status:
+        client = BrowserServiceClient(args.host, args.port)
+        try:
+            info = client.ping()
+        except OSError:
+            print("浏览器服务未运行")
+            sys.exit(1)
+        print(f"浏览器服务运行中，已完成任务: {info['jobs_done']}")
+        return
+    
+    service = BrowserService(args.host, args.port, headless=args.headless)
+    print("启动浏览器并预热会话...")
+    service.start()
+    print(f"浏览器服务已就绪: {service.host}:{service.port} (Ctrl-C 退出)")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,89 @@
 #!/usr/bin/env python
 """抓取雪球用户内容的命令行工具"""
 import argparse
+import asyncio
 import logging
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from crawler.client import CookiesExpiredError
+from common import profiling
+from crawler.async_client import AsyncXueqiuClient
+from crawler.cache import CacheMissError, ResponseCache
+from crawler.client import CookiesExpiredError, XueqiuClient, load_settings
+from crawler.metrics import CrawlMetrics
 from crawler.user_api import UserNotFoundError
-from crawler.tasks import crawl_user_to_markdown, crawl_user_column_browser
+from crawler.tasks import (
+    crawl_user_to_markdown,
+    crawl_user_to_markdown_async,
+    crawl_user_column_browser,
+    crawl_users_batch,
+    load_users_file,
+)
 
 
-def main():
-    parser = argparse.ArgumentParser(description="抓取雪球用户文章到 Markdown")
-    parser.add_argument("user", help="用户 ID 或昵称")
-    parser.add_argument("-o", "--output", default="./data", help="输出目录")
-    parser.add_argument("-m", "--mode", choices=["column", "timeline"], help="抓取模式: column=专栏, timeline=全部")
-    parser.add_argument("-b", "--browser", action="store_true", help="使用浏览器模式（绕过 WAF）")
-    parser.add_argument("-v", "--verbose", action="store_true", help="详细输出")
-    args = parser.parse_args()
+def print_batch_summary(results: dict[str, dict]):
+    """打印批量抓取的逐用户统计"""
+    print(f"\n{'用户':<20} {'新增':>6} {'更新':>6} {'跳过':>6} {'错误':>6} {'耗时(s)':>8}  状态")
+    for user, stats in results.items():
+        status = stats["error"] or "OK"
+        print(f"{user:<20} {stats['new_count']:>6} {stats['update_count']:>6} {stats['skip_count']:>6} "
+              f"{stats['error_count']:>6} {stats['elapsed']:>8.1f}  {status}")
+    total_new = sum(s["new_count"] for s in results.values())
+    failed = sum(1 for s in results.values() if s["error"])
+    print(f"\n完成! 用户: {len(results)}, 新增: {total_new}, 失败: {failed}")
+
+
+def configure_cache(client, args):
+    """按命令行参数调整客户端的响应缓存"""
+    if args.no_cache:
+        client.cache = None
+    elif args.cache_only:
+        client.cache = client.cache or ResponseCache.from_settings(client.settings, force=True)
+        client.cache_only = True
+
+
+def print_metrics_summary(summary: dict):
+    """打印按接口的请求指标"""
+    if summary["endpoints"]:
+        print(f"\n{'接口':<36} {'请求':>6} {'p50(s)':>7} {'p90(s)':>7} {'4xx':>5} {'5xx':>5} {'WAF':>5} {'重试':>5} {'限速等待(s)':>11}")
+        for endpoint, stats in summary["endpoints"].items():
+            latency = stats["latency_seconds"]
+            fmt = lambda v: f"{v:>7.2f}" if v is not None else f"{'-':>7}"
+            print(f"{endpoint:<36} {stats['requests']:>6} {fmt(latency['p50'])} {fmt(latency['p90'])} "
+                  f"{stats['status']['4xx']:>5} {stats['status']['5xx']:>5} {stats['waf']:>5} {stats['retries']:>5} "
+                  f"{stats['rate_limit_wait_seconds']:>11.1f}")
+    totals = summary["totals"]
+    print(f"共 {totals['requests']} 次请求, {totals['bytes'] / 1024 / 1024:.1f} MB, "
+          f"{summary['posts']} 篇, {summary['posts_per_second']:.2f} 篇/秒, 耗时 {summary['elapsed_seconds']:.1f}s")
+
+
+def export_metrics(metrics: CrawlMetrics, args, label: str):
+    """打印并导出抓取指标，路径中的 {user} 替换为用户名（批量模式为列表文件名）"""
+    cfg = load_settings(Path("config")).get("metrics", {})
+    json_path = args.metrics_json or cfg.get("json")
+    prom_path = args.metrics_prom or cfg.get("textfile")
     
+    print_metrics_summary(metrics.summary())
+    if json_path:
+        json_path = Path(json_path.format(user=label))
+        metrics.write_json(json_path, user=label)
+        print(f"指标: {json_path}")
+    if prom_path:
+        prom_path = Path(prom_path.format(user=label))
+        metrics.write_prometheus(prom_path, {"user": label})
+        print(f"Prometheus: {prom_path}")
+
+
+async def run_async(args, crawl, *crawl_args, metrics: CrawlMetrics = None, **crawl_kwargs):
+    """创建共享的异步客户端并执行抓取协程"""
+    async with AsyncXueqiuClient(metrics=metrics) as client:
+        configure_cache(client, args)
+        return await crawl(*crawl_args, client=client, **crawl_kwargs)
+
+
+def run(args):
     logging.basicConfig(
         level=logging.DEBUG if args.verbose else logging.INFO,
         format="%(asctime)s [%(levelname)s] %(message)s",
@@ -31,16 +94,52 @@ def main():
         title = post.get("title") or post.get("content_text", "")[:30]
         print(f"[{count}] {title}")
     
+    def on_batch_progress(user: str, count: int, post: dict):
+        title = post.get("title") or post.get("content_text", "")[:30]
+        print(f"[{user} {count}] {title}")
+    
+    metrics = CrawlMetrics()
+    label = args.user or Path(args.users_file).stem
     try:
         mode_desc = args.mode or "配置默认"
+        if args.users_file:
+            users = load_users_file(args.users_file)
+            print(f"开始批量抓取 {len(users)} 个用户 (模式: {mode_desc})")
+            results = asyncio.run(run_async(
+                args, crawl_users_batch, users, out_root=args.output, on_progress=on_batch_progress,
+                mode=args.mode, max_users=args.max_users, concurrency=args.concurrency, resume=args.resume,
+                backend=args.backend, metrics=metrics,
+            ))
+            metrics.add_posts(sum(stats["new_count"] + stats["update_count"] + stats["skip_count"] for stats in results.values()))
+            print_batch_summary(results)
+            if any(stats["error"] for stats in results.values()):
+                sys.exit(1)
+            return
+        if not args.concurrency:
+            client = XueqiuClient()
+            client.metrics = metrics
+            configure_cache(client, args)
         if args.browser:
             mode_desc = "浏览器专栏"
             print(f"开始抓取用户: {args.user} (模式: {mode_desc})")
-            stats = crawl_user_column_browser(args.user, out_root=args.output, on_progress=on_progress)
+            stats = crawl_user_column_browser(
+                args.user, out_root=args.output, on_progress=on_progress, backend=args.backend,
+            )
+        elif args.concurrency:
+            print(f"开始抓取用户: {args.user} (模式: {mode_desc}, 并发: {args.concurrency})")
+            stats = asyncio.run(run_async(
+                args, crawl_user_to_markdown_async, args.user, out_root=args.output, on_progress=on_progress,
+                mode=args.mode, concurrency=args.concurrency, resume=args.resume, backend=args.backend,
+                metrics=metrics,
+            ))
         else:
             print(f"开始抓取用户: {args.user} (模式: {mode_desc})")
-            stats = crawl_user_to_markdown(args.user, out_root=args.output, on_progress=on_progress, mode=args.mode)
-        print(f"\n完成! 新增: {stats['new_count']}, 跳过: {stats['skip_count']}, 错误: {stats['error_count']}")
+            stats = crawl_user_to_markdown(
+                args.user, out_root=args.output, on_progress=on_progress, mode=args.mode, resume=args.resume,
+                backend=args.backend,
+            )
+        metrics.add_posts(stats["new_count"] + stats["update_count"] + stats["skip_count"])
+        print(f"\n完成! 新增: {stats['new_count']}, 更新: {stats['update_count']}, 跳过: {stats['skip_count']}, 错误: {stats['error_count']}")
     except FileNotFoundError as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
@@ -50,9 +149,42 @@ def main():
     except CookiesExpiredError as e:
         print(f"错误: {e}", file=sys.stderr)
         sys.exit(1)
+    except CacheMissError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
     except KeyboardInterrupt:
         print("\n中断")
         sys.exit(130)
+    finally:
+        # 失败或中断时也导出，便于排查限速和重试
+        export_metrics(metrics, args, label)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取雪球用户文章到 Markdown")
+    parser.add_argument("user", nargs="?", help="用户 ID 或昵称")
+    parser.add_argument("-f", "--users-file", help="批量模式：用户列表文件，每行一个用户 ID 或昵称")
+    parser.add_argument("--max-users", type=int, help="批量模式同时抓取的用户数")
+    parser.add_argument("-o", "--output", default="./data", help="输出目录")
+    parser.add_argument("-m", "--mode", choices=["column", "timeline"], help="抓取模式: column=专栏, timeline=全部")
+    parser.add_argument("-b", "--browser", action="store_true", help="使用浏览器模式（绕过 WAF）")
+    parser.add_argument("-c", "--concurrency", type=int, help="异步并发预取页数（启用异步抓取引擎）")
+    parser.add_argument("--backend", choices=["markdown", "segments"], help="存储后端 (default: 配置 storage.backend)")
+    parser.add_argument("--resume", action="store_true", help="从上次中断的页继续抓取（不适用于浏览器模式）")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="不读写 HTTP 响应缓存")
+    cache_group.add_argument("--cache-only", action="store_true", help="仅使用缓存响应（忽略过期时间，未命中即报错）")
+    parser.add_argument("--metrics-json", help="请求指标 JSON 汇总路径 (default: 配置 metrics.json)")
+    parser.add_argument("--metrics-prom", help="Prometheus textfile 路径 (default: 配置 metrics.textfile)")
+    parser.add_argument("--profile", action="store_true", help="打印分阶段耗时（HTTP、HTML 清洗、渲染、写文件、浏览器等待）")
+    parser.add_argument("--profile-out", help="写出剖析文件：.json 为 speedscope 时间线，其他扩展名为 cProfile 统计")
+    parser.add_argument("-v", "--verbose", action="store_true", help="详细输出")
+    args = parser.parse_args()
+    if not args.user and not args.users_file:
+        parser.error("需要指定用户或 --users-file")
+    
+    with profiling.session(args.profile, args.profile_out, f"crawl {args.user or args.users_file}"):
+        run(args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""将分段存储的文章导出为每篇一个 Markdown 文件"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.tasks import export_markdown
+from storage.segment_store import SegmentStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出分段存储为 Markdown 文件")
+    parser.add_argument("nickname", help="用户昵称（data 下的目录名）")
+    parser.add_argument("-d", "--data-dir", default="data", help="数据目录 (default: data)")
+    parser.add_argument("-o", "--output", help="输出目录 (default: data/<用户名>/posts)")
+    parser.add_argument("--compact", action="store_true", help="导出前回收分段中被覆盖的旧记录")
+    args = parser.parse_args()
+    
+    user_dir = Path(args.data_dir) / args.nickname
+    if not SegmentStore.exists(user_dir):
+        print(f"错误: {user_dir} 下没有分段存储", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.compact:
+        with SegmentStore(user_dir) as store:
+            try:
+                print(f"回收 {store.compact() / 1024 / 1024:.1f} MB")
+            except RuntimeError as e:
+                print(f"错误: {e}", file=sys.stderr)
+                sys.exit(1)
+    
+    count = export_markdown(user_dir, Path(args.output) if args.output else None)
+    print(f"完成! 导出 {count} 篇到 {args.output or user_dir / 'posts'}")
+
+
+if __name__ == "__main__":
+    main()
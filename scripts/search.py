@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+"""全文检索已抓取文章的命令行工具"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from storage.search_index import SearchIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索已抓取的雪球文章")
+    parser.add_argument("query", nargs="*", help="查询词，多个词需同时出现")
+    parser.add_argument("-d", "--data-dir", default="data", help="数据目录 (default: data)")
+    parser.add_argument("-u", "--user", help="只检索该用户（data 下的目录名）")
+    parser.add_argument("-n", "--limit", type=int, default=20, help="返回条数 (default: 20)")
+    parser.add_argument("--since", help="起始日期（含），如 2024-01-01")
+    parser.add_argument("--until", help="截止日期（不含）")
+    parser.add_argument("--rebuild", action="store_true", help="扫描数据目录重建索引")
+    args = parser.parse_args()
+    
+    if not args.query and not args.rebuild:
+        parser.error("请提供查询词")
+    
+    with SearchIndex(Path(args.data_dir)) as index:
+        if args.rebuild:
+            start = time.perf_counter()
+            count = index.rebuild()
+            print(f"索引重建完成: {count} 篇, 耗时 {time.perf_counter() - start:.1f}s")
+            if not args.query:
+                return
+        
+        start = time.perf_counter()
+        hits = index.search(" ".join(args.query), args.limit, args.user, args.since, args.until)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    for hit in hits:
+        date = (hit.created_at or "")[:10]
+        print(f"{hit.score:6.2f}  {hit.user}  {date}  {hit.title or hit.filename}")
+        print(f"        {hit.snippet}")
+        print(f"        {hit.path}")
+    print(f"\n共 {len(hits)} 条结果（{elapsed_ms:.1f} ms）")
+
+
+if __name__ == "__main__":
+    main()
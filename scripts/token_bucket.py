@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""查看本机共享令牌桶的状态和各抓取进程消耗的令牌数"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from crawler.client import load_settings
+from crawler.token_bucket import SharedTokenBucket
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看本机共享令牌桶（rate_limit.shared）")
+    parser.add_argument("--reset", action="store_true", help="清空统计并重新装满令牌")
+    args = parser.parse_args()
+    
+    cfg = load_settings(Path("config")).get("rate_limit", {}).get("shared", {})
+    bucket = SharedTokenBucket(cfg.get("path", "cache/token_bucket.json"), cfg.get("rate", 1.0), cfg.get("burst", 2.0))
+    if not cfg.get("enabled", False):
+        print("提示: settings.yaml 中 rate_limit.shared 未启用，抓取进程不会使用令牌桶")
+    
+    if args.reset:
+        bucket.reset()
+        print(f"已重置: {bucket.path}")
+        return
+    
+    stats = bucket.stats()
+    print(f"速率 {stats['rate']:g} 令牌/秒, 容量 {stats['burst']:g}, 当前 {stats['tokens']:.2f} 个令牌")
+    processes = sorted(stats["processes"].items(), key=lambda item: -item[1]["last_seen"])
+    if not processes:
+        print("还没有进程取过令牌")
+        return
+    
+    fmt = lambda ts: datetime.fromtimestamp(ts).strftime("%m-%d %H:%M:%S")
+    print(f"\n{'PID':>8} {'令牌':>7} {'等待(s)':>9} {'启动':>15} {'最近':>15}  命令")
+    for pid, entry in processes:
+        print(f"{pid:>8} {entry['tokens']:>7} {entry['wait_seconds']:>9.1f} {fmt(entry['started_at']):>15} "
+              f"{fmt(entry['last_seen']):>15}  {entry['command']}")
+    print(f"共 {sum(e['tokens'] for _, e in processes)} 个令牌, {len(processes)} 个进程")
+
+
+if __name__ == "__main__":
+    main()
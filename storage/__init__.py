@@ -0,0 +1 @@
+"""本地存储模块"""
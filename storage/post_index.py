@@ -0,0 +1,182 @@
+"""用户文章索引：data/{nickname}/index.sqlite
+
+记录每篇文章的 ID、文件名、时间、类型、计数、股票代码和内容哈希，
+抓取去重和加载筛选走索引查询，不再逐篇拼文件名 stat 或全量解析 frontmatter。
+"""
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterator
+
+import frontmatter
+
+from .segment_store import SegmentStore
+
+INDEX_FILENAME = "index.sqlite"
+
+_COLUMNS = (
+    "id", "filename", "created_at", "type", "title",
+    "like_count", "comment_count", "repost_count", "symbols", "content_hash",
+)
+
+
+def content_hash(post: dict) -> str:
+    """按标题与正文计算内容哈希（不含计数，避免点赞变化触发重写）"""
+    raw = (post.get("title") or "") + "\n" + (post.get("content_text") or "")
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def read_post_file(md_file: Path) -> dict:
+    """读取已保存的文章文件为抓取时的 post 字典（含 content_text）"""
+    doc = frontmatter.load(md_file)
+    body = doc.content.strip()
+    title = doc.metadata.get("title")
+    # 正文首行为 "# 标题" 时去掉，使哈希与抓取时一致
+    if title and body.startswith(f"# {title}"):
+        body = body[len(title) + 2:].lstrip("\n")
+    return dict(doc.metadata, content_text=body)
+
+
+def iter_stored_posts(user_dir: Path) -> Iterator[tuple[str, dict]]:
+    """按文件名顺序逐篇产出用户已保存的全部文章 (文件名, post)，包括 posts 目录和分段存储，同名时以分段存储为准"""
+    user_dir = Path(user_dir)
+    store = SegmentStore(user_dir) if SegmentStore.exists(user_dir) else None
+    try:
+        stored = set(store.filenames()) if store else set()
+        names = stored | {f.name for f in (user_dir / "posts").glob("*.md")}
+        for name in sorted(names):
+            if name in stored:
+                yield name, store.get_by_filename(name)
+            else:
+                yield name, read_post_file(user_dir / "posts" / name)
+    finally:
+        if store:
+            store.close()
+
+
+class PostIndex:
+    """单个用户的文章索引"""
+    
+    def __init__(self, user_dir: Path):
+        self.user_dir = Path(user_dir)
+        self.path = self.user_dir / INDEX_FILENAME
+        is_new = not self.path.exists()
+        
+        self.user_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY,
+                filename TEXT NOT NULL,
+                created_at TEXT,
+                type TEXT,
+                title TEXT,
+                like_count INTEGER DEFAULT 0,
+                comment_count INTEGER DEFAULT 0,
+                repost_count INTEGER DEFAULT 0,
+                symbols TEXT DEFAULT '[]',
+                content_hash TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_posts_type ON posts (type)")
+        self._conn.commit()
+        
+        # 旧数据目录首次建索引
+        if is_new and ((self.user_dir / "posts").exists() or SegmentStore.exists(self.user_dir)):
+            self.rebuild()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        self._conn.close()
+    
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> dict:
+        data = dict(row)
+        data["symbols"] = json.loads(data["symbols"] or "[]")
+        return data
+    
+    def get(self, post_id) -> dict | None:
+        row = self._conn.execute("SELECT * FROM posts WHERE id = ?", (int(post_id),)).fetchone()
+        return self._row_to_dict(row) if row else None
+    
+    def __contains__(self, post_id) -> bool:
+        return self._conn.execute("SELECT 1 FROM posts WHERE id = ?", (int(post_id),)).fetchone() is not None
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+    
+    def max_id(self) -> int | None:
+        return self._conn.execute("SELECT MAX(id) FROM posts").fetchone()[0]
+    
+    def upsert(self, post: dict, filename: str, hash_: str = None, commit: bool = True):
+        """写入或更新一篇文章的索引记录"""
+        created_at = post.get("created_at")
+        values = (
+            int(post["id"]),
+            filename,
+            str(created_at) if created_at is not None else None,
+            post.get("type"),
+            post.get("title") or None,
+            post.get("like_count", 0),
+            post.get("comment_count", 0),
+            post.get("repost_count", 0),
+            json.dumps(post.get("symbols", []), ensure_ascii=False),
+            hash_ or content_hash(post),
+        )
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO posts ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            values,
+        )
+        if commit:
+            self._conn.commit()
+    
+    def filenames(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT filename FROM posts")]
+    
+    def commit(self):
+        self._conn.commit()
+    
+    def remove(self, post_id):
+        self._conn.execute("DELETE FROM posts WHERE id = ?", (int(post_id),))
+        self._conn.commit()
+    
+    def query(self, since: str = None, until: str = None, types: list[str] = None) -> list[dict]:
+        """按时间范围和类型筛选，结果按文件名排序（与目录 glob 顺序一致）
+        
+        Args:
+            since: 起始时间（含），ISO 格式字符串前缀，如 "2024-01-01"
+            until: 截止时间（不含），ISO 格式字符串前缀
+            types: 文章类型列表，如 ["long_post"]
+        """
+        sql = "SELECT * FROM posts WHERE 1=1"
+        params = []
+        if since:
+            sql += " AND created_at >= ?"
+            params.append(since)
+        if until:
+            sql += " AND created_at < ?"
+            params.append(until)
+        if types:
+            sql += f" AND type IN ({', '.join('?' * len(types))})"
+            params.extend(types)
+        sql += " ORDER BY filename"
+        return [self._row_to_dict(row) for row in self._conn.execute(sql, params)]
+    
+    def rebuild(self):
+        """扫描 posts 目录和分段存储重建索引（一次性迁移或手动修复）"""
+        self._conn.execute("DELETE FROM posts")
+        for filename, post in iter_stored_posts(self.user_dir):
+            if not post.get("id"):
+                continue
+            self.upsert(post, filename, commit=False)
+        self._conn.commit()
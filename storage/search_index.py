@@ -0,0 +1,246 @@
+"""全文检索索引：data/search.sqlite
+
+基于 SQLite FTS5 的倒排索引，覆盖 data/ 下所有用户的文章。
+中文按连续汉字切为二元组（每段末字额外作为单字词），英文和数字按词，
+查询词按同样方式切分后以短语匹配，按 BM25 排序（标题权重加倍）。
+FTS 表不存原文，正文以 zlib 压缩存入 docs 表，用于生成摘要片段和删除旧词条。
+"""
+import re
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from .post_index import iter_stored_posts
+from .segment_store import SegmentStore
+
+SEARCH_INDEX_FILENAME = "search.sqlite"
+
+_TOKEN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+
+# bm25 列权重：title, body
+_BM25_WEIGHTS = (2.0, 1.0)
+
+
+def _is_cjk(run: str) -> bool:
+    return not run[0].isascii()
+
+
+def tokenize(text: str) -> list[str]:
+    """切分为索引词：汉字二元组 + 每段末字，英文数字按词（小写）"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if _is_cjk(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_match_query(query: str) -> str:
+    """将查询串转为 FTS5 MATCH 表达式，空格分隔的各词之间为 AND，无可检索内容时返回空串"""
+    clauses = []
+    for run in _TOKEN_RE.findall(query.lower()):
+        if not _is_cjk(run):
+            clauses.append(f'"{run}"')
+        elif len(run) == 1:
+            # 单字：前缀匹配以它开头的二元组或段末单字
+            clauses.append(f'"{run}"*')
+        else:
+            clauses.append('"' + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + '"')
+    return " AND ".join(clauses)
+
+
+@dataclass
+class SearchHit:
+    user: str
+    post_id: int
+    filename: str
+    path: Path
+    title: str | None
+    created_at: str | None
+    score: float
+    snippet: str
+
+
+class SearchIndex:
+    """全部用户文章的全文检索索引"""
+    
+    def __init__(self, data_dir: Path = Path("data")):
+        self.data_dir = Path(data_dir)
+        self.path = self.data_dir / SEARCH_INDEX_FILENAME
+        is_new = not self.path.exists()
+        
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS docs (
+                rowid INTEGER PRIMARY KEY,
+                user TEXT NOT NULL,
+                post_id INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                title TEXT,
+                created_at TEXT,
+                body BLOB,
+                UNIQUE (user, post_id)
+            )
+        """)
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(title, body, content='')")
+        self._conn.commit()
+        
+        # 已有数据目录首次建索引
+        if is_new:
+            self.rebuild()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        self._conn.close()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+    
+    def _delete(self, rowid: int, title: str | None, body: bytes):
+        # 无内容 FTS 表删除时需提供原词条
+        self._conn.execute(
+            "INSERT INTO terms (terms, rowid, title, body) VALUES ('delete', ?, ?, ?)",
+            (rowid, " ".join(tokenize(title)), " ".join(tokenize(zlib.decompress(body).decode("utf-8")))),
+        )
+        self._conn.execute("DELETE FROM docs WHERE rowid = ?", (rowid,))
+    
+    def upsert(self, user: str, post: dict, filename: str, commit: bool = True):
+        """写入或更新一篇文章（post 为抓取时的字典，需含 id、title、content_text）"""
+        post_id = int(post["id"])
+        row = self._conn.execute(
+            "SELECT rowid, title, body FROM docs WHERE user = ? AND post_id = ?", (user, post_id)
+        ).fetchone()
+        if row:
+            self._delete(*row)
+        
+        title = post.get("title") or None
+        body = post.get("content_text") or ""
+        created_at = post.get("created_at")
+        cursor = self._conn.execute(
+            "INSERT INTO docs (user, post_id, filename, title, created_at, body) VALUES (?, ?, ?, ?, ?, ?)",
+            (user, post_id, filename, title, str(created_at) if created_at is not None else None,
+             zlib.compress(body.encode("utf-8"))),
+        )
+        self._conn.execute(
+            "INSERT INTO terms (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, " ".join(tokenize(title)), " ".join(tokenize(body))),
+        )
+        if commit:
+            self._conn.commit()
+    
+    def remove_user(self, user: str):
+        for row in self._conn.execute(
+            "SELECT rowid, title, body FROM docs WHERE user = ?", (user,)
+        ).fetchall():
+            self._delete(*row)
+        self._conn.commit()
+    
+    def index_user(self, user_dir: Path, replace: bool = True) -> int:
+        """扫描用户 posts 目录和分段存储写入索引，返回文章数
+        
+        Args:
+            replace: 先删除该用户已有的索引记录
+        """
+        user_dir = Path(user_dir)
+        if replace:
+            self.remove_user(user_dir.name)
+        count = 0
+        for filename, post in iter_stored_posts(user_dir):
+            if not post.get("id"):
+                continue
+            self.upsert(user_dir.name, post, filename, commit=False)
+            count += 1
+        self._conn.commit()
+        return count
+    
+    def rebuild(self) -> int:
+        """清空后扫描 data 目录下所有用户重建索引（一次性迁移或手动修复），返回文章数"""
+        self._conn.execute("DELETE FROM docs")
+        self._conn.execute("INSERT INTO terms (terms) VALUES ('delete-all')")
+        return sum(
+            self.index_user(user_dir, replace=False)
+            for user_dir in sorted(self.data_dir.iterdir())
+            if (user_dir / "posts").is_dir() or SegmentStore.exists(user_dir)
+        )
+    
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        user: str = None,
+        since: str = None,
+        until: str = None,
+        snippet_chars: int = 80,
+    ) -> list[SearchHit]:
+        """检索文章，按相关度从高到低返回
+        
+        Args:
+            query: 查询词，空格分隔的多个词需同时出现
+            user: 只检索该用户（data 下的目录名）
+            since: 起始时间（含），ISO 格式字符串前缀
+            until: 截止时间（不含），ISO 格式字符串前缀
+            snippet_chars: 摘要片段长度
+        """
+        match = build_match_query(query)
+        if not match:
+            return []
+        
+        weights = ", ".join(map(str, _BM25_WEIGHTS))
+        sql = (
+            f"SELECT d.user, d.post_id, d.filename, d.title, d.created_at, d.body, bm25(terms, {weights}) AS score "
+            "FROM terms JOIN docs d ON d.rowid = terms.rowid WHERE terms MATCH ?"
+        )
+        params = [match]
+        if user:
+            sql += " AND d.user = ?"
+            params.append(user)
+        if since:
+            sql += " AND d.created_at >= ?"
+            params.append(since)
+        if until:
+            sql += " AND d.created_at < ?"
+            params.append(until)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+        
+        terms = _TOKEN_RE.findall(query.lower())
+        hits = []
+        for user_, post_id, filename, title, created_at, body, score in self._conn.execute(sql, params):
+            hits.append(SearchHit(
+                user=user_,
+                post_id=post_id,
+                filename=filename,
+                path=self.data_dir / user_ / "posts" / filename,
+                title=title,
+                created_at=created_at,
+                # bm25 越小越相关，取反使分数越大越相关
+                score=-score,
+                snippet=make_snippet(zlib.decompress(body).decode("utf-8"), terms, snippet_chars),
+            ))
+        return hits
+
+
+def make_snippet(text: str, terms: list[str], width: int = 80) -> str:
+    """截取首个命中词附近的片段，命中词以【】标出"""
+    text = " ".join(text.split())
+    lower = text.lower()
+    positions = [pos for pos in (lower.find(term) for term in terms) if pos >= 0]
+    start = max(0, min(positions, default=0) - width // 4)
+    end = min(len(text), start + width)
+    snippet = text[start:end]
+    
+    if terms:
+        pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+        snippet = pattern.sub(lambda m: f"【{m.group(0)}】", snippet)
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
@@ -0,0 +1,277 @@
+"""分段压缩文章存储：data/{nickname}/segments/
+
+替代每篇一个 .md 文件的布局。文章追加写入分段文件 seg-000001.zst，每条记录单独压缩
+（[4 字节长度][压缩数据]），offsets.sqlite 记录每篇文章所在的分段与偏移，按 ID 随机读取只需一次 seek。
+更新文章时追加新记录并改指偏移，旧记录留作垃圾，由 compact 回收。
+写入方（抓取）和 compact 持有 segments/writer.lock，compact 不会删除其他进程正在追加的分段。
+
+安装 zstandard 时使用 zstd 压缩，否则退回 zlib；扩展名标明压缩方式，两种分段可混合读取。
+"""
+import json
+import os
+import sqlite3
+import struct
+import zlib
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Iterator
+
+from common.filelock import file_lock
+from common.profiling import span
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SEGMENTS_DIRNAME = "segments"
+OFFSETS_FILENAME = "offsets.sqlite"
+LOCK_FILENAME = "writer.lock"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+_HEADER = struct.Struct("<I")
+
+
+def _codec(ext: str):
+    """返回 (compress, decompress)"""
+    if ext == "zst":
+        if zstandard is None:
+            raise RuntimeError("读写 .zst 分段需要安装 zstandard")
+        return zstandard.ZstdCompressor(level=3).compress, zstandard.ZstdDecompressor().decompress
+    if ext == "zz":
+        return (lambda data: zlib.compress(data, 6)), zlib.decompress
+    raise ValueError(f"未知的分段压缩方式: {ext}")
+
+
+def default_compression() -> str:
+    return "zst" if zstandard is not None else "zz"
+
+
+class SegmentStore:
+    """单个用户的分段文章存储"""
+    
+    def __init__(self, user_dir: Path, segment_bytes: int = DEFAULT_SEGMENT_BYTES, compression: str = None):
+        """
+        Args:
+            segment_bytes: 分段大小上限，超过后新建分段
+            compression: zst / zz，None=有 zstandard 时用 zst
+        """
+        self.dir = Path(user_dir) / SEGMENTS_DIRNAME
+        self.segment_bytes = segment_bytes
+        self.compression = compression or default_compression()
+        self._compress = _codec(self.compression)[0]
+        self._decompressors = {}
+        self._readers = {}
+        self._writer = None
+        self._writer_name = None
+        self._writer_lock: ExitStack = None
+        
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.dir / OFFSETS_FILENAME)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                id INTEGER PRIMARY KEY,
+                filename TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_filename ON records (filename)")
+        self._conn.commit()
+    
+    @classmethod
+    def from_settings(cls, user_dir: Path, settings: dict) -> "SegmentStore":
+        """按 settings.yaml 的 storage 段创建"""
+        cfg = settings.get("storage", {})
+        return cls(user_dir, int(cfg.get("segment_mb", 64) * 1024 * 1024), cfg.get("compression"))
+    
+    @staticmethod
+    def exists(user_dir: Path) -> bool:
+        return (Path(user_dir) / SEGMENTS_DIRNAME / OFFSETS_FILENAME).exists()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+    
+    def close(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        if self._writer_lock:
+            self._writer_lock.close()
+            self._writer_lock = None
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+        self._conn.close()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    
+    def __contains__(self, post_id) -> bool:
+        return self._conn.execute("SELECT 1 FROM records WHERE id = ?", (int(post_id),)).fetchone() is not None
+    
+    def _segments(self) -> list[Path]:
+        return sorted(self.dir.glob("seg-*.*"))
+    
+    def _lock_writer(self, blocking: bool = True):
+        """取得写入锁并持有到 close，同一时间只有一个写入方或 compact"""
+        if self._writer_lock is None:
+            stack = ExitStack()
+            stack.enter_context(file_lock(self.dir / LOCK_FILENAME, blocking))
+            self._writer_lock = stack
+    
+    def _open_writer(self, size: int):
+        """返回当前可追加的分段，放不下 size 字节时新建"""
+        if self._writer is None:
+            self._lock_writer()
+            current = [p for p in self._segments() if p.suffix == f".{self.compression}"]
+            if current and current[-1].stat().st_size + size <= self.segment_bytes:
+                self._writer_name = current[-1].name
+                self._truncate_tail(current[-1])
+            else:
+                self._writer_name = self._new_segment_name()
+            self._writer = open(self.dir / self._writer_name, "ab")
+        elif self._writer.tell() and self._writer.tell() + size > self.segment_bytes:
+            self._writer.close()
+            self._writer_name = self._new_segment_name()
+            self._writer = open(self.dir / self._writer_name, "ab")
+        return self._writer
+    
+    def _truncate_tail(self, segment: Path):
+        """截掉末尾未登记的字节（上次写入中途崩溃），避免续写在半截记录之后"""
+        end = self._conn.execute(
+            f"SELECT MAX(offset + length + {_HEADER.size}) FROM records WHERE segment = ?", (segment.name,)
+        ).fetchone()[0]
+        if end is not None and segment.stat().st_size > end:
+            with open(segment, "r+b") as f:
+                f.truncate(end)
+    
+    def _new_segment_name(self) -> str:
+        segments = self._segments()
+        number = int(segments[-1].name[4:10]) + 1 if segments else 1
+        return f"seg-{number:06d}.{self.compression}"
+    
+    def put(self, post: dict, filename: str, commit: bool = True):
+        """追加一篇文章（post 为抓取时的字典），filename 为导出为 Markdown 时的文件名"""
+        record = json.dumps({"filename": filename, "post": post}, ensure_ascii=False, default=str)
+        payload = self._compress(record.encode("utf-8"))
+        writer = self._open_writer(_HEADER.size + len(payload))
+        offset = writer.tell()
+        writer.write(_HEADER.pack(len(payload)) + payload)
+        writer.flush()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO records (id, filename, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+            (int(post["id"]), filename, self._writer_name, offset, len(payload)),
+        )
+        if commit:
+            self._conn.commit()
+    
+    def commit(self):
+        self._conn.commit()
+    
+    def _read(self, segment: str, offset: int, length: int) -> tuple[str, dict]:
+        reader = self._readers.get(segment)
+        if reader is None:
+            reader = self._readers[segment] = open(self.dir / segment, "rb")
+        with span("storage.segment_read", length):
+            reader.seek(offset + _HEADER.size)
+            return self._decode(segment, reader.read(length))
+    
+    def _decode(self, segment: str, payload: bytes) -> tuple[str, dict]:
+        ext = segment.rsplit(".", 1)[-1]
+        decompress = self._decompressors.get(ext)
+        if decompress is None:
+            decompress = self._decompressors[ext] = _codec(ext)[1]
+        record = json.loads(decompress(payload))
+        return record["filename"], record["post"]
+    
+    def get(self, post_id) -> tuple[str, dict] | None:
+        """按 ID 读取，返回 (文件名, post)"""
+        row = self._conn.execute(
+            "SELECT segment, offset, length FROM records WHERE id = ?", (int(post_id),)
+        ).fetchone()
+        return self._read(*row) if row else None
+    
+    def filenames(self) -> list[str]:
+        return [row[0] for row in self._conn.execute("SELECT filename FROM records ORDER BY filename")]
+    
+    def get_by_filename(self, filename: str) -> dict | None:
+        row = self._conn.execute(
+            "SELECT segment, offset, length FROM records WHERE filename = ?", (filename,)
+        ).fetchone()
+        return self._read(*row)[1] if row else None
+    
+    def iter_records(self) -> Iterator[tuple[str, dict]]:
+        """按文件名顺序（与 posts 目录 glob 顺序一致）产出 (文件名, post)"""
+        rows = self._conn.execute("SELECT segment, offset, length FROM records ORDER BY filename").fetchall()
+        for row in rows:
+            yield self._read(*row)
+    
+    def _scan(self, segment: Path) -> Iterator[tuple[int, int, bytes]]:
+        """顺序读取分段中的 (偏移, 长度, 压缩数据)，末尾不完整的记录（写入中途崩溃）忽略"""
+        with open(segment, "rb") as f:
+            while True:
+                offset = f.tell()
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    return
+                (length,) = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield offset, length, payload
+    
+    def rebuild_index(self) -> int:
+        """顺序扫描所有分段重建偏移索引，同一 ID 以最后写入的为准，返回文章数"""
+        self._conn.execute("DELETE FROM records")
+        for segment in self._segments():
+            for offset, length, payload in self._scan(segment):
+                filename, post = self._decode(segment.name, payload)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO records (id, filename, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                    (int(post["id"]), filename, segment.name, offset, length),
+                )
+        self._conn.commit()
+        return len(self)
+    
+    def garbage_bytes(self) -> int:
+        """被覆盖的旧记录占用的字节数"""
+        total = sum(p.stat().st_size for p in self._segments())
+        live = self._conn.execute(f"SELECT COALESCE(SUM(length + {_HEADER.size}), 0) FROM records").fetchone()[0]
+        return total - live
+    
+    def compact(self) -> int:
+        """把存活记录重写到新分段并删除旧分段，返回回收的字节数
+        
+        其他进程持有写入锁（正在抓取）时抛出 RuntimeError，不等待也不压缩。
+        """
+        try:
+            self._lock_writer(blocking=False)
+        except BlockingIOError:
+            raise RuntimeError(f"{self.dir} 正在被其他进程写入，请在抓取结束后再压缩") from None
+        old_segments = self._segments()
+        before = sum(p.stat().st_size for p in old_segments)
+        # 新分段从现有编号之后开始，全部写完并提交后才删除旧分段
+        if self._writer:
+            self._writer.close()
+        self._writer_name = self._new_segment_name()
+        self._writer = open(self.dir / self._writer_name, "ab")
+        
+        rows = self._conn.execute("SELECT segment, offset, length FROM records ORDER BY filename").fetchall()
+        for segment, offset, length in rows:
+            filename, post = self._read(segment, offset, length)
+            self.put(post, filename, commit=False)
+        self._conn.commit()
+        
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
+        for segment in old_segments:
+            os.remove(segment)
+        return before - sum(p.stat().st_size for p in self._segments())
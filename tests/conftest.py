@@ -0,0 +1,16 @@
+"""测试共用的 fixture"""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    (tmp_path / "cookies.json").write_text(json.dumps({"xq_a_token": "test"}), encoding="utf-8")
+    (tmp_path / "settings.yaml").write_text(
+        "rate_limit:\n  min_interval: 0\n  max_interval: 0\n"
+        "retry:\n  max_attempts: 1\n  base_delay: 0\n"
+        "crawl:\n  page_size: 2\n",
+        encoding="utf-8",
+    )
+    return tmp_path
@@ -0,0 +1,43 @@
+"""测试共用的假浏览器"""
+import json
+
+LONG_TEXT = "<p>" + "价值投资" * 40 + "</p>"
+
+
+class FakeTab:
+    def __init__(self, browser):
+        self.browser = browser
+        self.url = None
+        self.polls = 0
+    
+    async def get(self, url):
+        self.url = url
+        self.polls = 0
+        self.browser.in_flight += 1
+        self.browser.max_in_flight = max(self.browser.max_in_flight, self.browser.in_flight)
+        return self
+    
+    async def get_content(self):
+        self.polls += 1
+        post_id = self.url.rsplit("/", 1)[1]
+        # 第二次轮询时内嵌 JSON 才出现
+        if self.polls < 2 or post_id == "missing":
+            return "<html></html>"
+        self.browser.in_flight -= 1
+        return f'<script>{{"id":{post_id},"text":{json.dumps(LONG_TEXT)},"title":""}}</script>'
+    
+    async def evaluate(self, expression, return_by_value=False):
+        return ""
+    
+    async def close(self):
+        self.browser.closed += 1
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = 0
+    
+    async def get(self, url, new_tab=False):
+        return FakeTab(self)
@@ -0,0 +1,119 @@
+"""自适应限速单元测试"""
+import asyncio
+import json
+import time
+from email.utils import formatdate
+
+import httpx
+
+from crawler.async_client import AsyncXueqiuClient
+from crawler.client import XueqiuClient
+from crawler.rate_limiter import AdaptiveRateLimit, AsyncRateLimiter, parse_retry_after
+
+
+def make_limiter(tmp_path=None, **kwargs):
+    params = dict(min_interval=1.0, max_interval=1.0, floor=0.1, ceiling=10.0, increase=0.5, decrease=0.5)
+    params.update(kwargs)
+    return AdaptiveRateLimit(state_path=tmp_path / "rate_limits.json" if tmp_path else None, **params)
+
+
+def test_additive_increase_multiplicative_decrease():
+    limiter = make_limiter()
+    limiter.on_response("/a", 200)
+    limiter.on_response("/a", 200)
+    assert abs(limiter.interval("/a") - 0.5) < 1e-9  # 1 -> 1.5 -> 2 次/秒
+    
+    limiter.on_response("/a", 429)
+    assert abs(limiter.interval("/a") - 1.0) < 1e-9
+    limiter.on_response("/a", 200, throttled=True)  # WAF 页或登录跳转
+    assert abs(limiter.interval("/a") - 2.0) < 1e-9
+    # 网络错误（无响应）和 4xx 不调整，其他接口族不受影响
+    limiter.on_response("/a", 404)
+    assert abs(limiter.interval("/a") - 2.0) < 1e-9
+    assert limiter.interval("/b") == 1.0
+
+
+def test_rate_is_clamped_to_floor_and_ceiling():
+    limiter = make_limiter()
+    for _ in range(100):
+        limiter.on_response("/a", 200)
+    for _ in range(100):
+        limiter.on_response("/b", 503)
+    assert abs(limiter.interval("/a") - 0.1) < 1e-9
+    assert abs(limiter.interval("/b") - 10.0) < 1e-9
+
+
+def test_reserve_spaces_slots_and_honors_retry_after():
+    limiter = make_limiter(min_interval=0.2, max_interval=0.2)
+    assert limiter.reserve("/a") <= 0
+    assert 0.19 < limiter.reserve("/a") <= 0.2
+    assert limiter.reserve("/b") <= 0
+    
+    limiter.on_response("/b", 429, retry_after=5)
+    assert 4.9 < limiter.reserve("/b") <= 5
+
+
+def test_jittered_gap_stays_within_floor(monkeypatch):
+    # 发布配置：floor 0.5、min/max 1.0/2.0（抖动 1/3），速率升到上限后抖动不再低于 floor
+    limiter = make_limiter(min_interval=1.0, max_interval=2.0, floor=0.5)
+    for _ in range(100):
+        limiter.on_response("/a", 200)
+    monkeypatch.setattr("crawler.rate_limiter.random.uniform", lambda a, b: a)
+    limiter.reserve("/a")
+    assert abs(limiter.reserve("/a") - 0.5) < 0.01
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert 25 < parse_retry_after(formatdate(time.time() + 30, usegmt=True)) <= 30
+
+
+def test_learned_rate_persists(tmp_path):
+    limiter = make_limiter(tmp_path)
+    limiter.on_response("/a", 503)
+    limiter.on_response("/a", 503)
+    data = json.loads((tmp_path / "rate_limits.json").read_text(encoding="utf-8"))
+    assert data["families"]["/a"]["interval"] == 4.0
+    
+    assert make_limiter(tmp_path).interval("/a") == 4.0
+    # 新的上下限之外的历史值被夹回范围内
+    assert make_limiter(tmp_path, ceiling=3.0).interval("/a") == 3.0
+
+
+def test_async_client_feeds_limiter(config_dir):
+    calls = {"n": 0}
+    
+    async def handler(request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        return httpx.Response(200, json={"user": {"id": 1}})
+    
+    adaptive = make_limiter(min_interval=0.01, max_interval=0.01, floor=0.001)
+    
+    async def run():
+        limiter = AsyncRateLimiter(adaptive=adaptive)
+        transport = httpx.MockTransport(handler)
+        async with AsyncXueqiuClient(config_dir, rate_limiter=limiter, transport=transport) as client:
+            return await client.get_json("/v4/user/profile/1", use_cache=False)
+    
+    assert asyncio.run(run()) == {"user": {"id": 1}}
+    # 429 后减半、成功后加 0.5：100 -> 50 -> 50.5 次/秒
+    assert abs(adaptive.interval("/v4/user/profile/:id") - 1 / 50.5) < 1e-9
+
+
+def test_sync_client_saves_state(config_dir, tmp_path):
+    XueqiuClient.reset_instance()
+    try:
+        client = XueqiuClient(config_dir)
+        client.adaptive = make_limiter(tmp_path)
+        client.adaptive.on_response("/a", 200)
+        assert not (tmp_path / "rate_limits.json").exists()  # 未满 SAVE_EVERY 不落盘
+        
+        client.save_state()
+        data = json.loads((tmp_path / "rate_limits.json").read_text(encoding="utf-8"))
+        assert data["families"]["/a"]["interval"] == round(1 / 1.5, 4)
+    finally:
+        XueqiuClient.reset_instance()
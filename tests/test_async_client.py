@@ -0,0 +1,138 @@
+"""异步抓取引擎单元测试"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from crawler.async_client import AsyncXueqiuClient
+from crawler.client import CookiesExpiredError
+from crawler.rate_limiter import AsyncRateLimiter
+from crawler.user_api import aiter_user_posts
+
+
+def make_timeline_handler(total_pages, page_size=2, delay=0.0, in_flight=None):
+    async def handler(request):
+        if in_flight is not None:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(delay)
+        if in_flight is not None:
+            in_flight["now"] -= 1
+        page = int(request.url.params["page"])
+        statuses = []
+        if page <= total_pages:
+            statuses = [
+                {"id": page * 100 + i, "user": {"id": 1}, "title": f"p{page}-{i}", "text": "x"}
+                for i in range(page_size)
+            ]
+        return httpx.Response(200, json={"statuses": statuses, "maxPage": total_pages})
+    return handler
+
+
+def test_aiter_user_posts_keeps_page_order(config_dir):
+    async def run():
+        transport = httpx.MockTransport(make_timeline_handler(5))
+        async with AsyncXueqiuClient(config_dir, transport=transport) as client:
+            return [p["id"] async for p in aiter_user_posts(client, 1, mode="timeline", concurrency=3)]
+    
+    ids = asyncio.run(run())
+    assert ids == [page * 100 + i for page in range(1, 6) for i in range(2)]
+
+
+def test_aiter_user_posts_prefetches_concurrently(config_dir):
+    in_flight = {"now": 0, "max": 0}
+    
+    async def run():
+        transport = httpx.MockTransport(make_timeline_handler(7, delay=0.05, in_flight=in_flight))
+        async with AsyncXueqiuClient(config_dir, transport=transport) as client:
+            return [p async for p in aiter_user_posts(client, 1, mode="timeline", concurrency=3)]
+    
+    posts = asyncio.run(run())
+    assert len(posts) == 14
+    assert in_flight["max"] == 3
+
+
+def test_aiter_user_posts_respects_max_pages(config_dir):
+    async def run():
+        transport = httpx.MockTransport(make_timeline_handler(10))
+        async with AsyncXueqiuClient(config_dir, transport=transport) as client:
+            return [p async for p in aiter_user_posts(client, 1, max_pages=2, mode="timeline")]
+    
+    assert len(asyncio.run(run())) == 4
+
+
+def test_login_redirect_raises(config_dir):
+    def handler(request):
+        if request.url.path == "/login":
+            return httpx.Response(200, text="login")
+        return httpx.Response(302, headers={"Location": "https://xueqiu.com/login"})
+    
+    async def run():
+        async with AsyncXueqiuClient(config_dir, transport=httpx.MockTransport(handler)) as client:
+            await client.get_json("/v4/user/profile/1")
+    
+    with pytest.raises(CookiesExpiredError):
+        asyncio.run(run())
+
+
+def test_rate_limiter_spaces_request_starts():
+    limiter = AsyncRateLimiter(0.05, 0.05)
+    
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+        return time.monotonic() - start
+    
+    assert asyncio.run(run()) >= 0.15
+
+
+def test_rate_limiter_round_robins_keys():
+    limiter = AsyncRateLimiter(0, 0)
+    order = []
+    
+    async def request(key):
+        await limiter.acquire(key)
+        order.append(key)
+    
+    async def run():
+        await asyncio.gather(*[request("big") for _ in range(6)], *[request("small") for _ in range(2)])
+    
+    asyncio.run(run())
+    assert order[:4] == ["big", "small", "big", "small"]
+    assert order.count("big") == 6
+
+
+def test_load_users_file(tmp_path):
+    from crawler.tasks import load_users_file
+    
+    users_file = tmp_path / "users.txt"
+    users_file.write_text("# 关注列表\nBlue7az\n\n8106514687  # 专栏作者\nBlue7az\n", encoding="utf-8")
+    assert load_users_file(users_file) == ["Blue7az", "8106514687"]
+
+
+def test_crawl_users_batch(config_dir, tmp_path):
+    from crawler.tasks import crawl_users_batch
+    
+    timeline = make_timeline_handler(3)
+    
+    async def handler(request):
+        if request.url.path.startswith("/v4/user/profile/"):
+            user_id = int(request.url.path.rsplit("/", 1)[1])
+            if user_id == 404:
+                return httpx.Response(200, json={"error_description": "not found"})
+            return httpx.Response(200, json={"user": {"id": user_id, "screen_name": f"u{user_id}"}})
+        return await timeline(request)
+    
+    async def run():
+        async with AsyncXueqiuClient(config_dir, transport=httpx.MockTransport(handler)) as client:
+            return await crawl_users_batch(
+                ["1", "2", "404"], out_root=tmp_path / "data", mode="timeline", client=client
+            )
+    
+    results = asyncio.run(run())
+    assert list(results) == ["1", "2", "404"]
+    assert results["1"]["new_count"] == 6
+    assert results["2"]["error"] is None
+    assert "不存在" in results["404"]["error"]
+    assert len(list((tmp_path / "data" / "u2" / "posts").glob("*.md"))) == 6
@@ -0,0 +1,123 @@
+"""Playwright 专栏分页单元测试（使用假页面）"""
+import json
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from crawler.browser import XueqiuBrowser, _has_next_column_page
+
+
+class FakeResponse:
+    def __init__(self, url, payload):
+        self.url = url
+        self.status = 200
+        self._body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    
+    def body(self):
+        return self._body
+
+
+class FakeExpectation:
+    def __init__(self, page, predicate):
+        self.page = page
+        self.predicate = predicate
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            # 触发动作后服务端依次返回的响应中找第一条匹配的
+            matches = [r for r in self.page.pending if self.predicate(r)]
+            self.page.pending.clear()
+            if not matches:
+                raise PlaywrightTimeoutError("timeout")
+            self.value = matches[0]
+        return False
+
+
+class FakeColumnPage:
+    """goto/滚动时按页返回 original/timeline.json 响应"""
+    
+    def __init__(self, pages, max_page=None, size=2, raw=None):
+        self.pages = pages
+        self.max_page = max_page
+        self.size = size
+        self.raw = raw or {}
+        self.requested = 0
+        self.pending = []
+    
+    def expect_response(self, predicate, timeout=None):
+        return FakeExpectation(self, predicate)
+    
+    def _serve_next(self):
+        self.requested += 1
+        page = self.requested
+        if page > len(self.pages):
+            return  # 没有更多数据时滚动不再触发请求
+        url = f"https://xueqiu.com/statuses/original/timeline.json?user_id=1&page={page}&size={self.size}"
+        payload = self.raw.get(page) or {"list": self.pages[page - 1], "page": page}
+        if self.max_page is not None and isinstance(payload, dict):
+            payload["maxPage"] = self.max_page
+        # 其他接口的响应和重复的上一页响应都应被忽略
+        self.pending.append(FakeResponse("https://xueqiu.com/v4/statuses/public_timeline.json", {}))
+        if page > 1:
+            self.pending.append(FakeResponse(url.replace(f"page={page}", f"page={page - 1}"), {"list": []}))
+        self.pending.append(FakeResponse(url, payload))
+    
+    def goto(self, url, timeout=None):
+        self._serve_next()
+    
+    def evaluate(self, expression):
+        self._serve_next()
+
+
+def make_items(page, count):
+    return [{"id": page * 100 + i, "title": f"p{page}-{i}", "description": "x", "created_at": 0} for i in range(count)]
+
+
+def run_column(page, max_pages=None):
+    browser = XueqiuBrowser()
+    browser._page = page
+    browser.column_timeout = 0.1
+    return [post["id"] for post in browser.iter_column_posts("1", max_pages)]
+
+
+def test_column_pagination_follows_max_page():
+    page = FakeColumnPage([make_items(p, 2) for p in range(1, 5)], max_page=3)
+    start = time.monotonic()
+    ids = run_column(page)
+    
+    assert ids == [str(p * 100 + i) for p in range(1, 4) for i in range(2)]
+    assert page.requested == 3  # 到达 maxPage 后不再滚动
+    assert time.monotonic() - start < 1  # 不再固定等待
+
+
+def test_column_pagination_stops_on_short_page_without_max_page():
+    # 页大小取自请求参数，不假定 20
+    page = FakeColumnPage([make_items(1, 2), make_items(2, 2), make_items(3, 1)], size=2)
+    assert len(run_column(page)) == 5
+    assert page.requested == 3
+
+
+def test_column_pagination_stops_on_timeout_and_max_pages():
+    page = FakeColumnPage([make_items(1, 2), make_items(2, 2)], size=2)
+    assert len(run_column(page)) == 4
+    assert page.requested == 3  # 第 3 页等待超时后停止
+    
+    page = FakeColumnPage([make_items(p, 2) for p in range(1, 5)], size=2)
+    assert len(run_column(page, max_pages=2)) == 4
+    assert page.requested == 2
+
+
+def test_column_pagination_stops_on_waf_page():
+    page = FakeColumnPage([make_items(1, 2), make_items(2, 2)], size=2, raw={2: "<html>滑动验证</html>".encode()})
+    assert len(run_column(page)) == 2
+
+
+def test_has_next_column_page():
+    assert _has_next_column_page({"maxPage": 3}, 2, 20, 20)
+    assert not _has_next_column_page({"maxPage": 3}, 3, 20, 20)
+    assert _has_next_column_page({}, 1, 10, None)
+    assert not _has_next_column_page({}, 1, 9, 10)
+    assert not _has_next_column_page({"maxPage": 5}, 1, 0, 10)
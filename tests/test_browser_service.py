@@ -0,0 +1,139 @@
+"""常驻浏览器服务协议测试（使用假浏览器）"""
+import asyncio
+import socket
+import socketserver
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from crawler.browser_service import BrowserService, BrowserServiceClient, BrowserServiceError, _wait_past_waf
+from tests.fakes import FakeBrowser
+
+
+class FakeColumnBrowser:
+    def iter_column_posts(self, user_id, max_pages=None):
+        for i in range(100):
+            yield {"id": str(1000 - i), "user_id": user_id, "title": f"t{i}"}
+
+
+class FakePlaywrightWorker:
+    def __init__(self):
+        self.browser = FakeColumnBrowser()
+    
+    def submit(self, fn):
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(fn(self.browser))
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, daemon=True).start()
+        return future
+    
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def service():
+    service = BrowserService("127.0.0.1", 0)
+    service._playwright = FakePlaywrightWorker()
+    service._nodriver = FakeBrowser()
+    service._loop_thread.start()
+    service.bind()
+    thread = threading.Thread(target=service._server.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service._server.shutdown()
+    service._server.server_close()
+    service._loop.call_soon_threadsafe(service._loop.stop)
+
+
+def test_ping(service):
+    client = BrowserServiceClient("127.0.0.1", service.port)
+    assert client.ping()["jobs_done"] == 0
+
+
+def test_column_posts_stream_and_stop_early(service):
+    client = BrowserServiceClient("127.0.0.1", service.port)
+    posts = []
+    for post in client.iter_column_posts("42"):
+        posts.append(post)
+        if len(posts) == 3:
+            break
+    assert [p["id"] for p in posts] == ["1000", "999", "998"]
+    assert client.ping()["jobs_done"] <= 1
+
+
+def test_full_content_streams_results(service):
+    client = BrowserServiceClient("127.0.0.1", service.port)
+    seen = []
+    results = client.get_posts_full_content("42", ["1", "2", "3"], on_result=lambda pid, _: seen.append(pid))
+    assert sorted(seen) == ["1", "2", "3"]
+    assert set(results) == {"1", "2", "3"}
+
+
+def test_unknown_op_raises(service):
+    client = BrowserServiceClient("127.0.0.1", service.port)
+    with pytest.raises(BrowserServiceError):
+        list(client._request({"op": "nope"}))
+
+
+def test_connect_if_running(service):
+    assert BrowserServiceClient.connect_if_running("127.0.0.1", service.port) is not None
+    
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        free_port = sock.getsockname()[1]
+    assert BrowserServiceClient.connect_if_running("127.0.0.1", free_port) is None
+
+
+def test_connect_if_running_times_out_on_hung_service(monkeypatch):
+    monkeypatch.setattr("crawler.browser_service.PROBE_TIMEOUT", 0.2)
+    # 只监听不应答的服务
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        assert BrowserServiceClient.connect_if_running("127.0.0.1", sock.getsockname()[1]) is None
+
+
+@pytest.mark.parametrize("reply", [b"", b"HTTP/1.1 400 Bad Request\r\n\r\n", b'{"done": true}\n', b"\xff\xfe\n"])
+def test_connect_if_running_ignores_foreign_service(reply):
+    # 端口被其他程序占用：连接后直接关闭或应答不是本服务的协议
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.rfile.readline()
+            self.wfile.write(reply)
+    
+    with socketserver.TCPServer(("127.0.0.1", 0), Handler) as server:
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        assert BrowserServiceClient.connect_if_running("127.0.0.1", server.server_address[1]) is None
+
+
+def test_bind_does_not_patch_stdlib_server(service):
+    assert service._server.allow_reuse_address
+    assert socketserver.ThreadingTCPServer.allow_reuse_address is False
+
+
+class FakeWafTab:
+    """前 passes 次轮询返回滑动验证页"""
+    
+    def __init__(self, passes):
+        self.passes = passes
+        self.polls = 0
+    
+    async def get_content(self):
+        self.polls += 1
+        if self.polls <= self.passes:
+            return "<html><title>滑动验证</title><script>var acw_sc__v2</script></html>"
+        return "<html><title>雪球</title></html>"
+
+
+def test_wait_past_waf():
+    tab = FakeWafTab(2)
+    assert asyncio.run(_wait_past_waf(tab, 5, interval=0.01))
+    assert tab.polls == 3
+    assert not asyncio.run(_wait_past_waf(FakeWafTab(1000), 0.05, interval=0.01))
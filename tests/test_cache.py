@@ -0,0 +1,97 @@
+"""HTTP 响应缓存单元测试"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from crawler.async_client import AsyncXueqiuClient
+from crawler.cache import CacheMissError, ResponseCache
+
+TTL = {"/v4/user/profile/": 60, "/statuses/user_timeline.json": 60}
+
+
+def test_ttl_and_params_key(tmp_path):
+    cache = ResponseCache(tmp_path / "http.sqlite", ttl=TTL)
+    url = "https://xueqiu.com/statuses/user_timeline.json"
+    cache.set(url, {"page": 1, "user_id": 1}, {"statuses": [1]})
+    
+    assert cache.get(url, {"user_id": 1, "page": 1}) == {"statuses": [1]}
+    assert cache.get(url, {"user_id": 1, "page": 2}) is None
+    # 未配置 TTL 的接口不缓存
+    cache.set("https://xueqiu.com/other.json", None, {"x": 1})
+    assert cache.get("https://xueqiu.com/other.json") is None
+
+
+def test_error_and_empty_payloads_not_cached(tmp_path):
+    cache = ResponseCache(tmp_path / "http.sqlite", ttl={**TTL, "/query/v1/search/user.json": 60})
+    profile = "https://xueqiu.com/v4/user/profile/1"
+    timeline = "https://xueqiu.com/statuses/user_timeline.json"
+    search = "https://xueqiu.com/query/v1/search/user.json"
+    cache.set(profile, None, {"error_description": "系统繁忙", "error_code": "22701"})
+    cache.set(timeline, {"page": 9}, {"statuses": [], "maxPage": 3})
+    cache.set(search, {"q": "x"}, {"list": []})
+    assert cache.get(profile) is None
+    assert cache.get(timeline, {"page": 9}) is None
+    assert cache.get(search, {"q": "x"}) is None
+    
+    cache.set(profile, None, {"user": {"id": 1}})
+    assert cache.get(profile) == {"user": {"id": 1}}
+
+
+def test_expired_entry(tmp_path):
+    cache = ResponseCache(tmp_path / "http.sqlite", ttl={"/a": 0.01})
+    cache.set("https://xueqiu.com/a", None, {"v": 1})
+    time.sleep(0.05)
+    assert cache.get("https://xueqiu.com/a") is None
+    assert cache.get("https://xueqiu.com/a", ignore_ttl=True) == {"v": 1}
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResponseCache(tmp_path / "http.sqlite", ttl={"/a": 60}, max_bytes=250)
+    payload = {"body": "x" * 80}
+    cache.set("https://xueqiu.com/a/1", None, payload)
+    cache.set("https://xueqiu.com/a/2", None, payload)
+    time.sleep(0.01)
+    cache.get("https://xueqiu.com/a/1")
+    cache.set("https://xueqiu.com/a/3", None, payload)
+    
+    assert cache.get("https://xueqiu.com/a/1") is not None
+    assert cache.get("https://xueqiu.com/a/2") is None
+    assert cache.get("https://xueqiu.com/a/3") is not None
+
+
+@pytest.fixture
+def cached_config_dir(tmp_path):
+    (tmp_path / "cookies.json").write_text(json.dumps({"xq_a_token": "test"}), encoding="utf-8")
+    (tmp_path / "settings.yaml").write_text(
+        "rate_limit:\n  min_interval: 0\n  max_interval: 0\n"
+        "cache:\n  enabled: true\n"
+        f"  path: {(tmp_path / 'http.sqlite').as_posix()}\n"
+        "  ttl:\n    /v4/user/profile/: 60\n",
+        encoding="utf-8",
+    )
+    return tmp_path
+
+
+def test_client_serves_from_cache(cached_config_dir):
+    calls = []
+    
+    def handler(request):
+        calls.append(request.url.path)
+        return httpx.Response(200, json={"user": {"id": 1}})
+    
+    async def run():
+        transport = httpx.MockTransport(handler)
+        async with AsyncXueqiuClient(cached_config_dir, transport=transport) as client:
+            await client.get_json("/v4/user/profile/1")
+            await client.get_json("/v4/user/profile/1")
+            await client.get_json("/v4/user/profile/1", use_cache=False)
+            client.cache_only = True
+            await client.get_json("/v4/user/profile/1")
+            with pytest.raises(CacheMissError):
+                await client.get_json("/v4/user/profile/2")
+    
+    asyncio.run(run())
+    assert len(calls) == 2
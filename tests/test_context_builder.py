@@ -0,0 +1,36 @@
+"""按预算挑选上下文单元测试"""
+from pathlib import Path
+
+from analysis.context_builder import build_budgeted_context, score_posts
+from analysis.loader import Post
+
+
+def _post(i, created_at, content="短评", type_="short_status", likes=0, symbols=None):
+    return Post(path=Path(f"{i}.md"), id=i, title=None, created_at=created_at, url="",
+                content=content, type=type_, like_count=likes, symbols=symbols or [])
+
+
+def test_score_prefers_recent_long_engaged_and_rare_symbols():
+    posts = [
+        _post(1, "2023-01-01T00:00:00"),
+        _post(2, "2024-01-01T00:00:00"),
+        _post(3, "2023-01-01T00:00:00", type_="long_post"),
+        _post(4, "2023-01-01T00:00:00", likes=100),
+        _post(5, "2023-01-01T00:00:00", symbols=["SH600519"]),
+    ]
+    scores = score_posts(posts)
+    assert all(scores[i] > scores[0] for i in range(1, 5))
+
+
+def test_budget_keeps_priority_and_time_order():
+    posts = [
+        _post(1, "2023-01-01T00:00:00", content="旧" * 200),
+        _post(2, "2024-01-01T00:00:00", content="新" * 200, likes=50),
+        _post(3, "2024-01-02T00:00:00", content="新" * 200, likes=10),
+    ]
+    selection = build_budgeted_context(posts, budget_tokens=500)
+    
+    assert [p.id for p in selection.selected] == [2, 3]
+    assert [p.id for p in selection.dropped] == [1]
+    assert selection.tokens <= 500
+    assert selection.context.index("2.md") < selection.context.index("3.md")
@@ -0,0 +1,61 @@
+"""本地替身服务上的抓取回归测试（benchmarks/fake_xueqiu.py）"""
+import json
+
+import pytest
+
+from benchmarks.bench_crawl import Scenario, run_scenario, write_config_dir
+from benchmarks.fake_xueqiu import NICKNAME, FakeConfig, FakeXueqiuServer
+from crawler.client import CookiesExpiredError, XueqiuClient
+from crawler.tasks import crawl_user_to_markdown
+
+PAGES = 5
+
+
+def test_sync_crawl_baseline(tmp_path):
+    result = run_scenario(Scenario("基线", FakeConfig(pages=PAGES)), tmp_path)
+    
+    assert result["posts"] == PAGES * 20
+    assert result["errors"] == 0
+    # 昵称搜索 + 每页一次 + 末尾确认无更多的空页
+    assert result["requests"] == PAGES + 2
+    assert result["rate_limit_wait"] == 0
+    # 宽松的下限：本机无延迟时远高于此，只拦截数量级的退化
+    assert result["posts_per_second"] > 50
+
+
+def test_async_crawl_with_latency_and_rate_limit(tmp_path):
+    scenario = Scenario("异步", FakeConfig(pages=PAGES, latency=0.01), concurrency=3, min_interval=0.01, max_interval=0.01)
+    result = run_scenario(scenario, tmp_path)
+    
+    assert result["posts"] == PAGES * 20
+    # maxPage 已知，不再请求空页
+    assert result["requests"] == PAGES + 1
+    assert result["rate_limit_wait"] > 0
+
+
+def test_5xx_is_retried(tmp_path):
+    scenario = Scenario("5xx", FakeConfig(pages=PAGES, error_rate=0.3, seed=1), base_delay=0.001)
+    result = run_scenario(scenario, tmp_path)
+    
+    assert result["injected_5xx"] > 0
+    assert result["retries"] == result["injected_5xx"]
+    assert result["posts"] == PAGES * 20
+
+
+def test_login_redirect_stops_crawl_and_keeps_progress(tmp_path):
+    config = FakeConfig(pages=PAGES, login_after=3)
+    with FakeXueqiuServer(config) as server:
+        config_dir = write_config_dir(tmp_path, server.url, Scenario("登录", config))
+        XueqiuClient.reset_instance()
+        XueqiuClient(config_dir).cache = None
+        try:
+            with pytest.raises(CookiesExpiredError):
+                crawl_user_to_markdown(NICKNAME, tmp_path / "data", mode="timeline")
+        finally:
+            XueqiuClient.reset_instance()
+    
+    user_dir = tmp_path / "data" / NICKNAME
+    assert len(list((user_dir / "posts").glob("*.md"))) == 40
+    state = json.loads((user_dir / "crawl_state.json").read_text(encoding="utf-8"))
+    # 前两页已处理，下一页为第 3 页
+    assert state["cursor"]["page"] == 3
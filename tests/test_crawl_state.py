@@ -0,0 +1,118 @@
+"""抓取断点与续抓测试"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from crawler.async_client import AsyncXueqiuClient
+from crawler.tasks import _begin_run, _finish_run, _read_state, _record_post, crawl_user_to_markdown_async
+
+TOTAL_PAGES = 6
+
+
+class Timeline:
+    """按页返回 ID 递减的时间线，fail_at 页返回 500"""
+    
+    def __init__(self):
+        self.pages = []
+        self.fail_at = None
+    
+    def __call__(self, request):
+        if request.url.path.startswith("/v4/user/profile/"):
+            return httpx.Response(200, json={"user": {"id": 1, "screen_name": "alice"}})
+        page = int(request.url.params["page"])
+        self.pages.append(page)
+        if page == self.fail_at:
+            return httpx.Response(500)
+        statuses = []
+        if page <= TOTAL_PAGES:
+            statuses = [
+                {"id": 1000 - (page - 1) * 2 - i, "user": {"id": 1}, "title": f"p{page}-{i}", "text": "x",
+                 "created_at": 1704067200000}
+                for i in range(2)
+            ]
+        return httpx.Response(200, json={"statuses": statuses, "maxPage": TOTAL_PAGES})
+
+
+def _crawl(config_dir, out_root, timeline, resume=False):
+    async def run():
+        async with AsyncXueqiuClient(config_dir, transport=httpx.MockTransport(timeline)) as client:
+            return await crawl_user_to_markdown_async(
+                1, out_root, mode="timeline", client=client, concurrency=1, resume=resume,
+            )
+    return asyncio.run(run())
+
+
+def test_resume_after_failure(config_dir, tmp_path):
+    out_root = tmp_path / "data"
+    timeline = Timeline()
+    timeline.fail_at = 4
+    with pytest.raises(httpx.HTTPStatusError):
+        _crawl(config_dir, out_root, timeline)
+    
+    state = _read_state(out_root / "alice")
+    # 中断时已完成 3 页：游标指向第 4 页，已完成位置不推进
+    assert state["cursor"]["page"] == 4
+    assert (state["cursor"]["newest_id"], state["cursor"]["oldest_id"]) == (1000, 995)
+    assert "last_crawled_post_id" not in state
+    assert not (out_root / "alice" / "crawl_state.json.tmp").exists()
+    
+    timeline.pages.clear()
+    timeline.fail_at = None
+    stats = _crawl(config_dir, out_root, timeline, resume=True)
+    assert timeline.pages[0] == 3
+    assert stats["new_count"] == 6
+    
+    state = json.loads((out_root / "alice" / "crawl_state.json").read_text(encoding="utf-8"))
+    assert state["last_crawled_post_id"] == 1000
+    assert "cursor" not in state
+    
+    # 再次增量抓取：首页即到达已抓取位置
+    timeline.pages.clear()
+    stats = _crawl(config_dir, out_root, timeline)
+    assert timeline.pages == [1]
+    assert stats["new_count"] == 0
+
+
+def test_restart_without_resume_walks_from_first_page(config_dir, tmp_path):
+    out_root = tmp_path / "data"
+    timeline = Timeline()
+    timeline.fail_at = 3
+    with pytest.raises(httpx.HTTPStatusError):
+        _crawl(config_dir, out_root, timeline)
+    
+    timeline.pages.clear()
+    timeline.fail_at = None
+    stats = _crawl(config_dir, out_root, timeline)
+    assert timeline.pages[0] == 1
+    assert (stats["new_count"], stats["skip_count"]) == (8, 4)
+
+
+def test_browser_run_keeps_pending_api_cursor(config_dir, tmp_path):
+    out_root = tmp_path / "data"
+    user_dir = out_root / "alice"
+    timeline = Timeline()
+    timeline.fail_at = 4
+    with pytest.raises(httpx.HTTPStatusError):
+        _crawl(config_dir, out_root, timeline)
+    
+    # 中断后先跑一次浏览器抓取，不应丢掉 API 的分页游标
+    state = _read_state(user_dir)
+    _begin_run(state, "browser")
+    _record_post(state, 1010)
+    _finish_run(user_dir, state)
+    state = _read_state(user_dir)
+    assert "cursor" not in state
+    assert state["paused_cursors"]["timeline"]["page"] == 4
+    assert state["last_crawled_post_id"] == 1010
+    
+    timeline.pages.clear()
+    timeline.fail_at = None
+    stats = _crawl(config_dir, out_root, timeline, resume=True)
+    assert timeline.pages[0] == 3
+    assert stats["new_count"] == 6
+    
+    state = _read_state(user_dir)
+    assert "cursor" not in state and "paused_cursors" not in state
+    assert state["last_crawled_post_id"] == 1010
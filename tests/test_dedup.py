@@ -0,0 +1,57 @@
+"""近似重复检测单元测试"""
+import random
+from pathlib import Path
+
+from analysis.dedup import SimHashIndex, dedupe_posts, hamming_distance, simhash, write_cluster_report
+from analysis.loader import Post
+
+_CHARS = "茅台估值现金流护城河长期持有分红回购周期行业景气度利润率市场情绪仓位风险收益复利安全边际"
+
+
+def _text(seed: int, length: int = 400) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(_CHARS) for _ in range(length))
+
+
+def _post(i: int, content: str, created_at: str = "2024-01-01") -> Post:
+    return Post(path=Path(f"{created_at}_{i}.md"), id=i, title=None, created_at=created_at, url="", content=content)
+
+
+def test_simhash_distance():
+    base = _text(1)
+    assert hamming_distance(simhash(base), simhash(base + "（转）")) <= 3
+    assert hamming_distance(simhash(base), simhash(base.replace("茅台", "茅 台，"))) <= 3
+    assert hamming_distance(simhash(base), simhash(_text(2))) > 10
+
+
+def test_dedupe_keeps_longest_in_order():
+    base = _text(1)
+    posts = [
+        _post(1, base, "2024-01-01"),
+        _post(2, _text(2), "2024-01-02"),
+        _post(3, base + "补充一句", "2024-01-03"),
+        _post(4, "好", "2024-01-04"),
+        _post(5, "好！", "2024-01-05"),
+        _post(6, "差", "2024-01-06"),
+    ]
+    kept, clusters = dedupe_posts(posts)
+    
+    assert [p.id for p in kept] == [2, 3, 4, 6]
+    assert len(clusters) == 2
+    assert clusters[0].representative.name == "2024-01-03_3.md"
+    assert [path.name for path, _ in clusters[0].duplicates] == ["2024-01-01_1.md"]
+
+
+def test_index_finds_duplicate_among_many(tmp_path):
+    index = SimHashIndex()
+    for i in range(2000):
+        index.add(Path(f"{i}.md"), _text(i))
+    index.add(Path("dup.md"), _text(7) + "。")
+    clusters = index.clusters()
+    
+    assert len(clusters) == 1
+    # 标点不计入长度，同样长时保留先添加的
+    assert clusters[0].representative.name == "7.md"
+    report = tmp_path / "dup.md"
+    write_cluster_report(clusters, report)
+    assert "合并: dup.md" in report.read_text(encoding="utf-8")
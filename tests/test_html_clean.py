@@ -0,0 +1,22 @@
+"""HTML 清洗单元测试"""
+from crawler.html_clean import clean_html
+
+
+def test_tags_and_line_breaks():
+    html = "<p>第一段<br>换行<BR/></p><p><b>第二段</b></p>"
+    assert clean_html(html) == "第一段\n换行\n\n第二段"
+
+
+def test_script_and_style_dropped():
+    html = '<style>.a{color:red}</style><p>正文</p><SCRIPT type="x">alert("<p>")</SCRIPT>'
+    assert clean_html(html) == "正文"
+
+
+def test_entities_fully_decoded():
+    html = "a&nbsp;&lt;b&gt; &amp; &quot;c&quot; &#39;d&#39; &#x4e2d;&yen;"
+    assert clean_html(html) == "a <b> & \"c\" 'd' 中¥"
+
+
+def test_empty():
+    assert clean_html(None) == ""
+    assert clean_html("") == ""
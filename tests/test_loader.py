@@ -4,7 +4,13 @@ from pathlib import Path
 
 import pytest
 
-from analysis.loader import load_user_posts, build_context, Post
+import frontmatter
+
+from analysis import loader
+from analysis.loader import (
+    load_user_posts, iter_user_posts, build_context, write_context, Post, _parse_frontmatter_fast,
+)
+from crawler.tasks import _render_markdown
 
 
 @pytest.fixture
@@ -57,3 +63,62 @@ def test_build_context(sample_posts_dir):
     assert "测试内容" in context
     assert "第二篇内容" in context
     assert "---" in context
+
+
+def test_stream_context_matches_build_context(sample_posts_dir, tmp_path):
+    posts = load_user_posts("test_user", sample_posts_dir, use_cache=False)
+    streamed = list(iter_user_posts("test_user", sample_posts_dir))
+    assert [p.id for p in streamed] == [p.id for p in posts]
+    
+    context_file = tmp_path / "context.md"
+    count, tokens = write_context(streamed, context_file)
+    assert count == 2
+    assert tokens > 0
+    assert context_file.read_text(encoding="utf-8") == build_context(posts)
+
+
+def test_iter_user_posts_not_found():
+    # 目录检查在调用时立即进行，而不是推迟到首次迭代
+    with pytest.raises(FileNotFoundError):
+        iter_user_posts("nonexistent", Path("/tmp"))
+
+
+def test_parse_cache_reuses_unchanged_files(sample_posts_dir, monkeypatch):
+    load_user_posts("test_user", sample_posts_dir)
+    assert (sample_posts_dir / "test_user" / "posts.cache.pkl").exists()
+    
+    parsed = []
+    original_parse = loader.parse_post_file
+    monkeypatch.setattr(loader, "parse_post_file", lambda f: parsed.append(f.name) or original_parse(f))
+    
+    md_file = sample_posts_dir / "test_user" / "posts" / "2024-01-02_456_test.md"
+    md_file.write_text(md_file.read_text(encoding="utf-8").replace("第二篇内容", "第二篇新内容"), encoding="utf-8")
+    posts = load_user_posts("test_user", sample_posts_dir)
+    
+    assert parsed == ["2024-01-02_456_test.md"]
+    assert posts[1].content == "第二篇新内容。"
+    assert posts[0].title == "测试标题"
+
+
+@pytest.mark.parametrize("post", [
+    {"id": 1, "user_id": 42, "nickname": "测试", "created_at": "2024-01-01T10:00:00",
+     "url": "https://xueqiu.com/42/1", "type": "long_post", "title": '标题 "引号" #1',
+     "like_count": 3, "symbols": ["SH600519", "$茅台$"], "content_text": "正文\n---\n第二段"},
+    {"id": 2, "user_id": "42", "created_at": "2024-01-02T10:00:00", "type": "status",
+     "title": None, "symbols": [], "content_text": "无标题 key: value"},
+])
+def test_fast_frontmatter_round_trip(post):
+    text = _render_markdown(post)
+    doc = frontmatter.loads(text)
+    
+    assert _parse_frontmatter_fast(text) == (doc.metadata, doc.content.strip())
+
+
+def test_fast_frontmatter_falls_back(tmp_path):
+    text = _render_markdown({"id": 3, "title": "a\\tb", "content_text": "x"})
+    assert _parse_frontmatter_fast(text) is None
+    assert _parse_frontmatter_fast("---\nflag: true\n---\n\nx") is None
+    
+    md_file = tmp_path / "a.md"
+    md_file.write_text(text, encoding="utf-8")
+    assert loader.parse_post_file(md_file) == (frontmatter.loads(text).metadata, frontmatter.loads(text).content.strip())
@@ -0,0 +1,75 @@
+"""抓取指标单元测试"""
+import asyncio
+import json
+
+import httpx
+
+from crawler.async_client import AsyncXueqiuClient
+from crawler.metrics import CrawlMetrics, Histogram, endpoint_family
+
+
+def test_endpoint_family_collapses_ids():
+    assert endpoint_family("https://xueqiu.com/v4/user/profile/12345?x=1") == "/v4/user/profile/:id"
+    assert endpoint_family("https://xueqiu.com/statuses/user_timeline.json") == "/statuses/user_timeline.json"
+    assert endpoint_family("https://xueqiu.com/123/456789") == "/:id/:id"
+
+
+def test_histogram_quantile():
+    hist = Histogram((1.0, 2.0))
+    for value in (0.5, 0.5, 1.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.count == 5
+    assert hist.quantile(0.4) == 1.0
+    assert 1.0 < hist.quantile(0.7) < 2.0
+    assert hist.quantile(1.0) == 3.0
+    assert hist.cumulative() == [("1", 2), ("2", 4), ("+Inf", 5)]
+
+
+def test_client_records_retries_errors_and_waf(config_dir, tmp_path):
+    calls = {"n": 0}
+    
+    def handler(request):
+        if request.url.path == "/waf":
+            return httpx.Response(200, text="<html>acw_sc__v2</html>", headers={"Content-Type": "text/html"})
+        if request.url.path == "/missing":
+            return httpx.Response(404, json={})
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+    
+    metrics = CrawlMetrics()
+    
+    async def run():
+        async with AsyncXueqiuClient(config_dir, transport=httpx.MockTransport(handler), metrics=metrics) as client:
+            client.cache = None
+            await client.get_json("/v4/user/profile/1")
+            await client.get_html("/waf")
+            try:
+                await client.get_json("/missing")
+            except httpx.HTTPStatusError:
+                pass
+    
+    asyncio.run(run())
+    metrics.add_posts(4)
+    summary = metrics.summary()
+    
+    profile = summary["endpoints"]["/v4/user/profile/:id"]
+    assert profile["requests"] == 2
+    assert profile["status"]["5xx"] == 1 and profile["status"]["2xx"] == 1
+    assert profile["retries"] == 1
+    assert profile["bytes"] == len(b'{"ok":true}')
+    assert summary["endpoints"]["/waf"]["waf"] == 1
+    assert summary["endpoints"]["/missing"]["status"]["4xx"] == 1
+    assert summary["totals"]["requests"] == 4
+    assert summary["posts"] == 4
+    
+    metrics.write_json(tmp_path / "m.json", user="u")
+    assert json.loads((tmp_path / "m.json").read_text(encoding="utf-8"))["user"] == "u"
+    
+    metrics.write_prometheus(tmp_path / "m.prom", {"user": "u"})
+    text = (tmp_path / "m.prom").read_text(encoding="utf-8")
+    assert 'xueqiu_crawl_requests_total{user="u",endpoint="/v4/user/profile/:id",code="5xx"} 1' in text
+    assert 'xueqiu_crawl_request_duration_seconds_bucket{user="u",endpoint="/waf",le="+Inf"} 1' in text
+    assert 'xueqiu_crawl_posts_total{user="u"} 4' in text
+    assert not (tmp_path / "m.prom.tmp").exists()
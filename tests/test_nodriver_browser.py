@@ -0,0 +1,59 @@
+"""nodriver 全文获取单元测试（使用假浏览器）"""
+import asyncio
+import time
+
+from crawler.nodriver_browser import _extract_text, _wait_for_content, iter_posts_full_content
+from crawler.rate_limiter import AsyncRateLimiter
+from tests.fakes import FakeBrowser, FakeTab
+
+def test_extract_text():
+    html = '<script>{"id":1,"text":"第一段<br/>第二段&amp;","user_id":2}</script>'
+    assert _extract_text(html) == "第一段\n第二段&"
+    assert _extract_text("<html></html>") is None
+
+
+def test_wait_for_content_returns_when_ready():
+    tab = FakeTab(FakeBrowser())
+    
+    async def run():
+        await tab.get("https://xueqiu.com/1/100")
+        return await _wait_for_content(tab, timeout=5, interval=0.01)
+    
+    assert "价值投资" in asyncio.run(run())
+    assert tab.polls == 2
+
+
+def test_iter_posts_full_content_uses_tab_pool():
+    browser = FakeBrowser()
+    post_ids = [str(i) for i in range(6)] + ["missing"]
+    
+    async def run():
+        return [
+            item async for item in iter_posts_full_content(
+                "1", post_ids, concurrency=3, ready_timeout=0.05, browser=browser,
+                rate_limiter=AsyncRateLimiter(0, 0),
+            )
+        ]
+    
+    results = dict(asyncio.run(run()))
+    assert set(results) == set(post_ids)
+    assert results["missing"] == ""
+    assert all("价值投资" in results[str(i)] for i in range(6))
+    assert browser.max_in_flight == 3
+    assert browser.closed == 3
+
+
+def test_iter_posts_full_content_is_rate_limited():
+    # 多个标签页共用限速器，文章页按 rate_limit 间隔依次加载
+    browser = FakeBrowser()
+    
+    async def run():
+        start = time.monotonic()
+        async for _ in iter_posts_full_content(
+            "1", ["1", "2", "3", "4"], concurrency=4, ready_timeout=0.05, browser=browser,
+            rate_limiter=AsyncRateLimiter(0.05, 0.05),
+        ):
+            pass
+        return time.monotonic() - start
+    
+    assert asyncio.run(run()) >= 0.15
@@ -0,0 +1,204 @@
+"""分析流水线测试（本地 OpenAI 兼容桩服务）"""
+import asyncio
+import json
+import threading
+import time
+from dataclasses import replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from openai import AsyncOpenAI
+
+from analysis.chunk_summarizer import chunk_posts, chunk_posts_by_period, merge_summaries
+from analysis.llm_cache import LLMCache
+from analysis.loader import Post
+from analysis.pipeline import analyse_posts_async
+from analysis.tokens import estimate_tokens, post_tokens, truncate_tokens
+
+
+class StubOpenAI:
+    """记录请求并返回固定内容的 /v1/chat/completions 桩服务"""
+    
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = body["messages"][0]["content"]
+                with stub._lock:
+                    stub.prompts.append(prompt)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                time.sleep(stub.delay)
+                with stub._lock:
+                    stub.active -= 1
+                
+                content = "# 报告" if "投资画像报告" in prompt else f"摘要 {len(stub.prompts)}"
+                if body.get("stream"):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for piece in (content[:1], content[1:], ""):
+                        chunk = {
+                            "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                            "choices": [{"index": 0, "delta": {"content": piece} if piece else {},
+                                         "finish_reason": None if piece else "stop"}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                payload = json.dumps({
+                    "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stub():
+    stub = StubOpenAI()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+def _posts(count: int, length: int = 300, month: str = "2024-01") -> list[Post]:
+    return [
+        Post(path=Path(f"{month}_{i:04d}.md"), id=i, title=f"标题{i}", created_at=f"{month}-01",
+             url="", content="观点" * (length // 2))
+        for i in range(count)
+    ]
+
+
+def _settings(single_call_tokens: int) -> dict:
+    return {
+        "openai": {"model": "stub"},
+        "analysis": {"single_call_tokens": single_call_tokens, "chunk_tokens": 1000, "concurrency": 3},
+    }
+
+
+async def _run(stub, posts, settings, **kwargs):
+    client = AsyncOpenAI(api_key="test", base_url=stub.base_url)
+    try:
+        return await analyse_posts_async(posts, client=client, settings=settings, **kwargs)
+    finally:
+        await client.close()
+
+
+def test_chunk_posts_respects_budget():
+    posts = _posts(10) + _posts(1, length=5000)
+    chunks = chunk_posts(posts, 1000)
+    
+    assert [p.id for chunk in chunks for p in chunk][:10] == list(range(10))
+    assert sum(len(p.content) for p in chunks[-1] + chunks[-2]) <= 5000
+    assert all(sum(len(p.content) for p in chunk) <= 1000 for chunk in chunks)
+
+
+def test_split_mixed_script_post_respects_budget():
+    post = replace(_posts(1)[0], content="观点" * 1500 + "value " * 1500)
+    chunks = chunk_posts([post], 1000)
+    
+    assert all(sum(post_tokens(p) for p in chunk) <= 1000 for chunk in chunks)
+    assert "".join(p.content for chunk in chunks for p in chunk) == post.content
+
+
+def test_unmergeable_summaries_truncated_to_budget():
+    # 每条摘要超过预算的一半，无法两两合并：不调用模型，直接截断
+    summaries = ["观点" * 40, "估值" * 40, "风险" * 40]
+    merged = asyncio.run(merge_summaries(None, summaries, {}, max_input_tokens=150))
+    
+    assert len(merged) == 3
+    assert all(summary.startswith(original[:10]) for summary, original in zip(merged, summaries))
+    assert estimate_tokens("\n\n".join(f"### 第 {i + 1} 段\n\n{s}" for i, s in enumerate(merged))) <= 150
+    assert truncate_tokens("abc", 10) == "abc"
+
+
+def test_small_context_single_call(stub):
+    report = asyncio.run(_run(stub, _posts(3), _settings(100000)))
+    assert report == "# 报告"
+    assert len(stub.prompts) == 1
+
+
+def test_map_reduce_with_concurrency_cap(stub):
+    progress = []
+    report = asyncio.run(_run(
+        stub, _posts(40), _settings(2000),
+        on_progress=lambda stage, done, total: progress.append((stage, done, total)),
+    ))
+    
+    map_calls = [p for p in stub.prompts if "段发言" in p]
+    assert report == "# 报告"
+    assert len(map_calls) > 3
+    assert 1 < stub.max_active <= 3
+    assert progress[-1] == ("reduce", 1, 1)
+    assert ("map", len(map_calls), len(map_calls)) in progress
+    assert "第 1 段" in stub.prompts[-1]
+
+
+def test_streamed_posts_bound_chunks_in_flight(stub):
+    read = []
+    
+    def source():
+        for post in _posts(40):
+            read.append(post.id)
+            yield post
+    
+    progress = []
+    report = asyncio.run(_run(
+        stub, source, _settings(2000),
+        on_progress=lambda stage, done, total: progress.append((stage, done, total)),
+    ))
+    assert report == "# 报告"
+    assert 1 < stub.max_active <= 3
+    assert ("map", 1, None) in progress
+    # 一遍估算 token，一遍分块
+    assert read == list(range(40)) * 2
+
+
+def test_chunks_split_on_period():
+    posts = _posts(2, month="2024-01") + _posts(2, month="2024-02")
+    assert [len(chunk) for chunk in chunk_posts_by_period(posts, 100000)] == [2, 2]
+    assert len(chunk_posts_by_period(posts, 100000, period="none")) == 1
+
+
+def test_cache_reuses_unchanged_chunks(stub, tmp_path):
+    cache = LLMCache(tmp_path / "llm.sqlite")
+    posts = _posts(20, month="2024-01") + _posts(20, month="2024-02")
+    asyncio.run(_run(stub, posts, _settings(2000), cache=cache))
+    first_run = len(stub.prompts)
+    
+    asyncio.run(_run(stub, posts, _settings(2000), cache=cache))
+    assert len(stub.prompts) == first_run
+    
+    # 新增一个月的文章：只总结新分块，再重新汇总
+    asyncio.run(_run(stub, posts + _posts(2, month="2024-03"), _settings(2000), cache=cache))
+    new_prompts = stub.prompts[first_run:]
+    assert [p for p in new_prompts if "段发言" in p] == [p for p in new_prompts if "2024-03" in p and "段发言" in p]
+    assert len([p for p in new_prompts if "段发言" in p]) == 1
+    assert "投资画像报告" in new_prompts[-1]
+
+
+def test_stream_final_report(stub):
+    deltas = []
+    report = asyncio.run(_run(stub, _posts(40), _settings(2000), on_delta=deltas.append))
+    assert report == "# 报告"
+    assert deltas == ["#", " 报告"]
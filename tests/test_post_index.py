@@ -0,0 +1,106 @@
+"""文章索引单元测试"""
+from analysis.loader import iter_user_posts, load_user_posts
+from crawler.tasks import _render_markdown, _write_post
+from storage.post_index import PostIndex, content_hash
+
+
+def _post(post_id, title="标题", text="正文", created_at="2024-01-01T10:00:00", type_="long_post"):
+    return {
+        "id": post_id,
+        "title": title,
+        "content_text": text,
+        "created_at": created_at,
+        "type": type_,
+        "symbols": ["SH600519"],
+    }
+
+
+def _stats():
+    return {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
+
+
+def test_upsert_and_query(tmp_path):
+    with PostIndex(tmp_path) as index:
+        index.upsert(_post(1, created_at="2024-01-01T10:00:00"), "a.md")
+        index.upsert(_post(2, created_at="2024-02-01T10:00:00", type_="status"), "b.md")
+        index.upsert(_post(3, created_at="2024-03-01T10:00:00"), "c.md")
+        
+        assert 2 in index and 4 not in index
+        assert len(index) == 3 and index.max_id() == 3
+        assert index.get(1)["symbols"] == ["SH600519"]
+        assert [r["id"] for r in index.query(since="2024-02-01")] == [2, 3]
+        assert [r["id"] for r in index.query(until="2024-02-01")] == [1]
+        assert [r["id"] for r in index.query(types=["long_post"])] == [1, 3]
+
+
+def test_rebuild_from_existing_posts(tmp_path):
+    posts_dir = tmp_path / "posts"
+    posts_dir.mkdir()
+    post = _post(7, title="旧文章")
+    (posts_dir / "2024-01-01_7_旧文章.md").write_text(_render_markdown(post), encoding="utf-8")
+    
+    with PostIndex(tmp_path) as index:
+        row = index.get(7)
+        assert row["filename"] == "2024-01-01_7_旧文章.md"
+        assert row["content_hash"] == content_hash(post)
+
+
+def test_write_post_skip_and_rename(tmp_path):
+    posts_dir = tmp_path / "posts"
+    posts_dir.mkdir()
+    state, stats = {}, _stats()
+    
+    with PostIndex(tmp_path) as index:
+        _write_post(_post(1, title="原标题"), posts_dir, index, state, stats)
+        _write_post(_post(1, title="原标题"), posts_dir, index, state, stats)
+        _write_post(_post(1, title="新标题"), posts_dir, index, state, stats)
+    
+    assert (stats["new_count"], stats["skip_count"], stats["update_count"]) == (1, 1, 1)
+    assert [f.name for f in posts_dir.glob("*.md")] == ["2024-01-01_1_新标题.md"]
+    assert state["cursor"]["newest_id"] == 1
+
+
+def test_loader_filters_with_and_without_index(tmp_path):
+    posts_dir = tmp_path / "u" / "posts"
+    posts_dir.mkdir(parents=True)
+    for post in (_post(1, created_at="2024-01-01T10:00:00"), _post(2, created_at="2024-06-01T10:00:00", type_="status")):
+        (posts_dir / f"{post['id']}.md").write_text(_render_markdown(post), encoding="utf-8")
+    
+    assert [p.id for p in load_user_posts("u", tmp_path, since="2024-03-01")] == [2]
+    assert [p.id for p in load_user_posts("u", tmp_path, types=["long_post"])] == [1]
+    
+    PostIndex(tmp_path / "u").close()
+    assert [p.id for p in load_user_posts("u", tmp_path, since="2024-03-01")] == [2]
+    assert [p.id for p in load_user_posts("u", tmp_path, types=["long_post"])] == [1]
+    assert len(load_user_posts("u", tmp_path)) == 2
+
+
+def test_loader_skips_and_prunes_deleted_files(tmp_path):
+    posts_dir = tmp_path / "u" / "posts"
+    posts_dir.mkdir(parents=True)
+    with PostIndex(tmp_path / "u") as index:
+        for post in (_post(1), _post(2)):
+            (posts_dir / f"{post['id']}.md").write_text(_render_markdown(post), encoding="utf-8")
+            index.upsert(post, f"{post['id']}.md")
+    (posts_dir / "1.md").unlink()
+    
+    assert [p.id for p in load_user_posts("u", tmp_path)] == [2]
+    assert [p.id for p in iter_user_posts("u", tmp_path)] == [2]
+    with PostIndex(tmp_path / "u") as index:
+        assert 1 not in index
+
+
+def test_loader_indexes_files_added_outside_crawler(tmp_path):
+    posts_dir = tmp_path / "u" / "posts"
+    posts_dir.mkdir(parents=True)
+    with PostIndex(tmp_path / "u") as index:
+        post = _post(1)
+        (posts_dir / "1.md").write_text(_render_markdown(post), encoding="utf-8")
+        index.upsert(post, "1.md")
+    # 从备份恢复的文件，不在索引中
+    (posts_dir / "2.md").write_text(_render_markdown(_post(2)), encoding="utf-8")
+    
+    assert [p.id for p in load_user_posts("u", tmp_path)] == [1, 2]
+    assert [p.id for p in iter_user_posts("u", tmp_path)] == [1, 2]
+    with PostIndex(tmp_path / "u") as index:
+        assert index.get(2)["filename"] == "2.md"
@@ -0,0 +1,63 @@
+"""分阶段性能剖析单元测试"""
+import asyncio
+import json
+import pstats
+
+from common import profiling
+from common.profiling import span, timed
+
+
+def test_span_is_noop_when_disabled():
+    assert not profiling.is_enabled()
+    with span("x") as s:
+        s.add_bytes(10)
+
+
+def test_spans_accumulate_and_nest(capsys, tmp_path):
+    @timed("outer")
+    def outer():
+        for _ in range(3):
+            with span("inner", 5) as s:
+                s.add_bytes(1)
+    
+    async def worker():
+        with span("task"):
+            await asyncio.sleep(0)
+    
+    async def run():
+        await asyncio.gather(worker(), worker())
+    
+    out = tmp_path / "trace.json"
+    with profiling.session(output=out) as profiler:
+        outer()
+        asyncio.run(run())
+    
+    assert not profiling.is_enabled()
+    assert profiler.stats["inner"].calls == 3
+    assert profiler.stats["inner"].bytes == 18
+    assert profiler.stats["outer"].wall >= profiler.stats["inner"].wall
+    assert profiler.stats["task"].calls == 2
+    assert "inner" in capsys.readouterr().out
+    
+    trace = json.loads(out.read_text(encoding="utf-8"))
+    names = [frame["name"] for frame in trace["shared"]["frames"]]
+    assert set(names) == {"outer", "inner", "task"}
+    # 每条轨道内开闭事件成对且按时间排序；两个协程各占一条轨道
+    assert len(trace["profiles"]) == 3
+    for profile in trace["profiles"]:
+        stack = []
+        ats = [event["at"] for event in profile["events"]]
+        assert ats == sorted(ats)
+        for event in profile["events"]:
+            if event["type"] == "O":
+                stack.append(event["frame"])
+            else:
+                assert stack.pop() == event["frame"]
+        assert not stack
+
+
+def test_session_writes_cprofile(tmp_path):
+    out = tmp_path / "crawl.prof"
+    with profiling.session(output=out):
+        sum(range(1000))
+    assert pstats.Stats(str(out)).total_calls > 0
@@ -0,0 +1,26 @@
+"""报告写入单元测试"""
+import pytest
+
+from analysis.report_builder import ReportWriter, save_report
+
+
+def test_save_report(tmp_path):
+    path = save_report("测试用户", "正文", tmp_path)
+    assert path.read_text(encoding="utf-8").endswith("正文")
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_stream_writer_atomic_and_keeps_partial(tmp_path):
+    with ReportWriter("u", tmp_path) as writer:
+        writer.write("第一段")
+        assert writer.tmp_path.exists() and not writer.path.exists()
+        assert writer.tmp_path.read_text(encoding="utf-8").endswith("第一段")
+    assert writer.path.read_text(encoding="utf-8").endswith("第一段")
+    
+    writer = ReportWriter("v", tmp_path)
+    with pytest.raises(ConnectionError):
+        with writer:
+            writer.write("半截")
+            raise ConnectionError
+    assert not writer.path.exists()
+    assert writer.tmp_path.read_text(encoding="utf-8").endswith("半截")
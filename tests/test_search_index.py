@@ -0,0 +1,59 @@
+"""全文检索索引单元测试"""
+from crawler.tasks import _render_markdown, _write_post
+from storage.post_index import PostIndex
+from storage.search_index import SearchIndex, build_match_query, tokenize
+
+
+def _post(post_id, text, title=None, created_at="2024-01-01T10:00:00"):
+    return {"id": post_id, "title": title, "content_text": text, "created_at": created_at}
+
+
+def test_tokenize_cjk_bigrams():
+    assert tokenize("买贵州茅台 AAPL") == ["买贵", "贵州", "州茅", "茅台", "台", "aapl"]
+    assert build_match_query("贵州茅台 台") == '"贵州 州茅 茅台" AND "台"*'
+    assert build_match_query("，。") == ""
+
+
+def test_search_ranks_and_filters(tmp_path):
+    with SearchIndex(tmp_path) as index:
+        index.upsert("alice", _post(1, "今天加仓贵州茅台，估值合理"), "1.md")
+        index.upsert("alice", _post(2, "茅台茅台茅台，还是茅台", title="茅台"), "2.md")
+        index.upsert("bob", _post(3, "腾讯控股的游戏业务", created_at="2024-03-01"), "3.md")
+        
+        hits = index.search("茅台")
+        assert [h.post_id for h in hits] == [2, 1]
+        assert "【茅台】" in hits[1].snippet
+        assert hits[0].path == tmp_path / "alice" / "posts" / "2.md"
+        
+        assert index.search("贵州茅台 估值")[0].post_id == 1
+        assert index.search("茅台 腾讯") == []
+        # 短语匹配：字不相邻时不命中
+        assert index.search("茅估") == []
+        assert [h.post_id for h in index.search("腾", user="bob", since="2024-02-01")] == [3]
+        assert index.search("腾", user="alice") == []
+
+
+def test_upsert_replaces_old_terms(tmp_path):
+    with SearchIndex(tmp_path) as index:
+        index.upsert("alice", _post(1, "看好宁德时代"), "1.md")
+        index.upsert("alice", _post(1, "改为看好比亚迪"), "1b.md")
+        
+        assert index.search("宁德") == []
+        assert [h.filename for h in index.search("比亚迪")] == ["1b.md"]
+        assert len(index) == 1
+
+
+def test_crawl_write_updates_index_and_rebuild(tmp_path):
+    user_dir = tmp_path / "alice"
+    posts_dir = user_dir / "posts"
+    posts_dir.mkdir(parents=True)
+    stats = {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
+    with PostIndex(user_dir) as index, SearchIndex(tmp_path) as search:
+        _write_post(_post(5, "长期持有招商银行"), posts_dir, index, {}, stats, search=search)
+        assert [h.post_id for h in search.search("招商银行")] == [5]
+    
+    # 已有文章文件（例如索引创建之前抓取的）由 rebuild 补齐
+    (posts_dir / "old.md").write_text(_render_markdown(_post(6, "旧文章提到中国平安")), encoding="utf-8")
+    with SearchIndex(tmp_path) as search:
+        assert search.rebuild() == 2
+        assert [h.post_id for h in search.search("中国平安")] == [6]
@@ -0,0 +1,85 @@
+"""分段存储单元测试"""
+import pytest
+
+from analysis.loader import iter_user_posts, load_user_posts
+from crawler.tasks import _write_post, export_markdown
+from storage.post_index import PostIndex
+from storage.segment_store import SegmentStore
+
+
+def _post(post_id, title="标题", text="正文", created_at="2024-01-01T10:00:00"):
+    return {"id": post_id, "title": title, "content_text": text, "created_at": created_at,
+            "url": f"https://xueqiu.com/1/{post_id}", "type": "long_post", "symbols": []}
+
+
+def _stats():
+    return {"new_count": 0, "update_count": 0, "skip_count": 0, "error_count": 0}
+
+
+def test_put_get_rotate_and_compact(tmp_path):
+    with SegmentStore(tmp_path, segment_bytes=200, compression="zz") as store:
+        for i in range(10):
+            store.put(_post(i, text="内容" * 20), f"{i:02d}.md")
+        store.put(_post(3, text="改过的内容"), "03.md")
+        
+        assert len(store) == 10
+        assert store.get(3) == ("03.md", _post(3, text="改过的内容"))
+        assert len(list(store.dir.glob("seg-*"))) > 1
+        assert store.garbage_bytes() > 0
+        
+        assert store.compact() > 0
+        assert store.garbage_bytes() == 0
+        assert [name for name, _ in store.iter_records()] == [f"{i:02d}.md" for i in range(10)]
+        assert store.get(3)[1]["content_text"] == "改过的内容"
+
+
+def test_compact_refuses_while_writer_active(tmp_path):
+    with SegmentStore(tmp_path, compression="zz") as writer:
+        writer.put(_post(1), "01.md")
+        writer.put(_post(1, text="改过的内容"), "01.md")
+        with SegmentStore(tmp_path, compression="zz") as other:
+            with pytest.raises(RuntimeError):
+                other.compact()
+        # 写入方的分段未被删除，仍可继续追加
+        writer.put(_post(2), "02.md")
+        assert writer.get(2)[0] == "02.md"
+    
+    with SegmentStore(tmp_path, compression="zz") as store:
+        assert store.compact() > 0
+        assert store.get(1)[1]["content_text"] == "改过的内容"
+
+
+def test_truncated_tail_is_recovered(tmp_path):
+    with SegmentStore(tmp_path, compression="zz") as store:
+        store.put(_post(1), "1.md")
+    segment = next((tmp_path / "segments").glob("seg-*"))
+    with open(segment, "ab") as f:
+        f.write(b"\x10\x00\x00\x00half")
+    
+    with SegmentStore(tmp_path, compression="zz") as store:
+        store.put(_post(2), "2.md")
+        assert store.rebuild_index() == 2
+        assert store.get(2)[0] == "2.md"
+
+
+def test_loader_and_export_match_markdown(tmp_path):
+    md_user = tmp_path / "md_user"
+    seg_user = tmp_path / "seg_user"
+    posts = [_post(1, text="第一篇\n\n第二段"), _post(2, title="", text="无标题短文", created_at="2024-01-02")]
+    for user_dir, store in ((md_user, None), (seg_user, SegmentStore(seg_user))):
+        (user_dir / "posts").mkdir(parents=True, exist_ok=True)
+        with PostIndex(user_dir) as index:
+            for post in posts:
+                _write_post(dict(post), user_dir / "posts", index, {}, _stats(), store=store)
+        if store:
+            store.close()
+    
+    assert list((seg_user / "posts").glob("*.md")) == []
+    expected = load_user_posts("md_user", tmp_path, use_cache=False)
+    for loaded in (load_user_posts("seg_user", tmp_path), list(iter_user_posts("seg_user", tmp_path))):
+        assert [(p.path.name, p.title, p.created_at, p.content) for p in loaded] == \
+            [(p.path.name, p.title, p.created_at, p.content) for p in expected]
+    
+    assert export_markdown(seg_user) == 2
+    assert sorted(f.read_text(encoding="utf-8") for f in (seg_user / "posts").glob("*.md")) == \
+        sorted(f.read_text(encoding="utf-8") for f in (md_user / "posts").glob("*.md"))
@@ -0,0 +1,64 @@
+"""股票代码提取单元测试"""
+from pathlib import Path
+
+import pytest
+
+from crawler.symbols import SymbolExtractor
+
+DICTIONARY = Path(__file__).parent.parent / "config" / "symbols.csv"
+
+ENTRIES = {
+    "SH600519": ["贵州茅台", "茅台"],
+    "SH601318": ["中国平安"],
+    "SZ000001": ["平安银行"],
+    "00700": ["腾讯控股", "腾讯"],
+    "AAPL": ["苹果"],
+}
+
+
+def test_names_and_codes_normalized():
+    extractor = SymbolExtractor(ENTRIES)
+    text = "$贵州茅台(SH600519)$ 和 茅台 都是 sh600519；$腾讯控股(00700)$ 即 HK00700"
+    assert extractor.extract(text) == ["00700", "SH600519"]
+
+
+def test_unknown_names_dropped_unknown_codes_kept():
+    extractor = SymbolExtractor(ENTRIES)
+    text = "$某某科技$ 与 $新股(SZ300999)$，另见 SH688001"
+    assert extractor.extract(text) == ["SH688001", "SZ300999"]
+
+
+def test_word_boundaries_and_longest_match():
+    extractor = SymbolExtractor(ENTRIES)
+    assert extractor.extract("AAPLX 与 SH6005190") == []
+    assert extractor.extract("看好aapl和中国平安银行") == ["AAPL", "SH601318"]
+
+
+def test_from_csv_and_batch(tmp_path):
+    path = tmp_path / "symbols.csv"
+    path.write_text("code,name,aliases\nSH600519,贵州茅台,茅台|茅子\n", encoding="utf-8")
+    extractor = SymbolExtractor.from_csv(path)
+    texts = ["茅子又涨了", "无关内容", "贵州茅台"] * 10
+    
+    assert extractor.extract_batch(texts) == [["SH600519"], [], ["SH600519"]] * 10
+    assert extractor.extract_batch(texts, workers=2, chunksize=4) == extractor.extract_batch(texts)
+    assert SymbolExtractor.from_csv(tmp_path / "missing.csv").extract("茅台") == []
+
+
+@pytest.mark.parametrize("text", [
+    "这是很美的一天",
+    "吃了一个苹果",
+    "伊利诺伊州的天气",
+    "美团外卖送来了小米粥",
+    "今天工行排队很久",
+    "格力的空调开了一夜",
+])
+def test_ambiguous_names_ignored_in_prose(text):
+    assert SymbolExtractor.from_csv(DICTIONARY).extract(text) == []
+
+
+def test_ambiguous_names_matched_as_cashtags():
+    extractor = SymbolExtractor.from_csv(DICTIONARY)
+    text = "$美的$ $苹果$ $伊利$ $美团$ $小米$ $工行$，以及 $格力电器(SZ000651)$"
+    assert extractor.extract(text) == ["01810", "03690", "AAPL", "SH600887", "SH601398", "SZ000333", "SZ000651"]
+    assert extractor.extract("美的集团和伊利股份") == ["SH600887", "SZ000333"]
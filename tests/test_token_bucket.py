@@ -0,0 +1,56 @@
+"""共享令牌桶单元测试"""
+import asyncio
+import multiprocessing
+import os
+import time
+
+from crawler.rate_limiter import AsyncRateLimiter
+from crawler.token_bucket import SharedTokenBucket
+
+
+def _drain(path, rate, count):
+    bucket = SharedTokenBucket(path, rate=rate, burst=1)
+    for _ in range(count):
+        bucket.acquire()
+
+
+def test_burst_then_refill_rate(tmp_path):
+    bucket = SharedTokenBucket(tmp_path / "bucket.json", rate=20, burst=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(4)]
+    elapsed = time.monotonic() - start
+    
+    assert waits[:2] == [0.0, 0.0]
+    assert elapsed >= 0.09  # 后两个令牌各需 1/20 秒补充
+    assert bucket.stats()["processes"][str(os.getpid())]["tokens"] == 4
+
+
+def test_processes_share_budget(tmp_path):
+    path = tmp_path / "bucket.json"
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_drain, args=(path, 20, 5)) for _ in range(2)]
+    start = time.monotonic()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(30)
+    elapsed = time.monotonic() - start
+    
+    assert all(w.exitcode == 0 for w in workers)
+    # 两个进程合计 10 个令牌，容量 1，至少需要 9/20 秒
+    assert elapsed >= 0.45
+    processes = SharedTokenBucket(path).stats()["processes"]
+    assert {pid: entry["tokens"] for pid, entry in processes.items()} == {str(w.pid): 5 for w in workers}
+
+
+def test_async_rate_limiter_draws_from_bucket(tmp_path):
+    bucket = SharedTokenBucket(tmp_path / "bucket.json", rate=20, burst=1)
+    limiter = AsyncRateLimiter(0, 0, bucket=bucket)
+    
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+        return time.monotonic() - start
+    
+    assert asyncio.run(run()) >= 0.14
+    assert bucket.stats()["processes"][str(os.getpid())]["tokens"] == 4